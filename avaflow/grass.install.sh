@@ -41,9 +41,10 @@ sudo apt install libgdal-dev python3-gdal gdal-bin -y
 sudo apt update
 sudo apt install grass-dev grass-doc grass-gui -y
 
-#Installing pillow
+#Installing pillow and SciPy (Sobol sequences of r.avaflow)
 sudo apt install python3-pip
 python3 -m pip install --upgrade pillow
+python3 -m pip install "scipy>=1.7"
 
 #Installing R statistical software
 sudo apt-key adv --keyserver keyserver.ubuntu.com --recv-keys E298A3A825C0D65DFD57CBB651716619E084DAB9
@@ -51,6 +51,7 @@
     #include <grass/glocale.h>
     #include <grass/raster.h>
     #include <grass/segment.h>
+    #include <sys/mman.h>
 
 
 #endif
@@ -64,13 +65,13 @@ struct ico { // global structure for input constants and control variables
     float CSZ; float BDWEST; float BDNORTH; float BDSOUTH; float BDEAST; float GRAVITY; float CFL[2]; float IMPTHR[3]; int CORRHEIGHT; int CURVCTRL; int SURFACE; 
     int ENTRAINMENT; int STOPPING; int NVECTMIN; int PMAX; int PHASES[3]; int DYNFRIC; int MESH; float SLOMO; float FFLOW;
     int HYDADD; int ORIGINAL; int SEPFLUX; int COLLAPSE; int AFLAG; float SLIDERAD; float SLIDEEXP; float SLIDEDEF; int LAYERS; int XREL; int YREL; float XDIST; float YDIST; int GLACIER; 
-    int NONHYDRO; int PROFILE; int IMPACTAREA; int HDEPOSIT; int CTRLPOINTS; int PBG; int TSUNAMI; int DIFFCTRL;
+    int NONHYDRO; int PROFILE; int IMPACTAREA; int HDEPOSIT; int CTRLPOINTS; int PBG; int TSUNAMI; int DIFFCTRL; int FORMAT; int SPARSE; int VTK;
 
 
     #ifdef WITHGRASS
 
 
-        float NSEGRC; float NSEGS;
+        float NSEGRC; float NSEGS; int RAST;
 
 
     #endif
@@ -196,13 +197,56 @@ void free_dmatrix3 (float ***mm,int mi,int mj) { // function for freeing 3D floa
     free(mm);
 }
 
+FILE *ptabfile = NULL; // parameter file with values overridden by parameter table (multiple model runs)
+int ptabn = 0, ptabline = 0, *ptabcol = NULL; // number of overridden lines, current line of parameter file, overridden lines
+float *ptabrow = NULL; // overriding values of model run
+
+void fitab ( char *gtabname, int gxint ) { // function for reading parameter table row of model run
+
+    int gheader[2];
+    char gmagic[4];
+    FILE *gftab = fopen( gtabname, "rb" );
+
+    if ( !gftab || fread( gmagic, 1, 4, gftab ) != 4 || strncmp( gmagic, "AVPT", 4 ) != 0 || fread( gheader, sizeof(int), 2, gftab ) != 2
+        || gxint < 1 || gxint > gheader[1] ) {
+
+        printf( "ERROR: Unable to read parameter table: '%s'\n", gtabname );
+        fflush(stdout);
+        exit( EXIT_SUCCESS );
+    }
+
+    ptabn = gheader[0]; // number of columns (overridden lines)
+    ptabcol = (int*) calloc( ptabn + 1, sizeof(int));
+    ptabrow = (float*) calloc( ptabn + 1, sizeof(float));
+    if ( fread( ptabcol, sizeof(int), ptabn, gftab ) != (size_t)ptabn
+        || fseek( gftab, (long)( gxint - 1 ) * ptabn * sizeof(float), SEEK_CUR ) != 0
+        || fread( ptabrow, sizeof(float), ptabn, gftab ) != (size_t)ptabn ) { // reading row of model run
+
+        printf( "ERROR: Unable to read parameter table: '%s'\n", gtabname );
+        fflush(stdout);
+        exit( EXIT_SUCCESS );
+    }
+    fclose( gftab );
+}
+
+float ftparam ( FILE *gfparam, float gparam ) { // function for overriding parameters by parameter table
+
+    int gl;
+    if ( gfparam != ptabfile ) return gparam;
+    for ( gl=0; gl<ptabn; gl++ ) {
+        if ( ptabcol[gl] == ptabline ) gparam = ptabrow[gl];
+    }
+    ptabline += 1;
+    return gparam;
+}
+
 int fiparam ( FILE *gfparam ) { // function for reading integer parameters
 
     int gparam;
     char gsparam[50];
     char **strtodhlp=NULL;
     if ( fgets(gsparam, 50, gfparam) == NULL ) return -1;
-    gparam=strtod(gsparam, strtodhlp);
+    gparam=ftparam( gfparam, strtod(gsparam, strtodhlp));
     return gparam;
 }
 
@@ -212,7 +256,7 @@ float fdparam ( FILE *gfparam ) { // function for reading float parameters
     char gsparam[50];
     char **strtodhlp=NULL;
     if ( fgets(gsparam, 50, gfparam) == NULL ) return -1;
-    gparam=strtod(gsparam, strtodhlp);
+    gparam=ftparam( gfparam, strtod(gsparam, strtodhlp));
     return gparam;
 }
 
@@ -221,6 +265,7 @@ char *fcparam ( FILE *gfparam ) { // function for reading character parameters
     char *gsparam = (char*) calloc ( 1000, sizeof(char));
     if ( fgets(gsparam, 1000, gfparam) == NULL ) return "-1";
     gsparam[strnlen(gsparam, 1010) - 1] = '\0';
+    ftparam( gfparam, 0 ); // character parameters are not overridden, only counting line
     return gsparam;
 }
 
@@ -2024,13 +2069,64 @@ float fconvout ( int ggi, float **gdflow, int gmaterial, int gtype, float gbetax
     return ghflowi;
 }
 
-void foutasc ( float **gparam, int *gpx, int *gpy, char *goutmaps, char *gname, float *gbetaxy, int gk, struct ico sico ) { // function for output of ascii raster maps
+float foutval ( float **gparam, int gi, float *gbetaxy, int gk, struct ico sico ) { // function for output cell value
 
-    FILE *gfascii;
-    char gpath[200];
-    int gi, gx, gy;
     float gpout;
 
+    if ( sico.MODEL <= 3 && gk == 0 ) gpout = fconvout( gi, gparam, 1, 1, gbetaxy[gi], sico ); // height-to-depth conversion where necessary
+    else if ( sico.MODEL <= 3 && gk == 3 ) gpout = fconvout( gi, gparam, 1, 2, gbetaxy[gi], sico );
+    else if ( sico.MODEL <= 3 && gk == 7 ) gpout = fconvout( gi, gparam, 1, 3, gbetaxy[gi], sico );
+
+    else if ( sico.MODEL <= 3 && gk == 1 ) gpout = fdiv( gparam[gi][gk+1], gparam[gi][0], sico.HFLOWMIN );
+    else if ( sico.MODEL <= 3 && gk == 2 ) gpout = fdiv( -gparam[gi][gk-1], gparam[gi][0], sico.HFLOWMIN );
+
+    else if ( sico.MODEL == 7 && gk == 0 ) gpout = fconvout( gi, gparam, 1, 1, gbetaxy[gi], sico );
+    else if ( sico.MODEL == 7 && gk == 3 ) gpout = fconvout( gi, gparam, 2, 1, gbetaxy[gi], sico );
+    else if ( sico.MODEL == 7 && gk == 6 ) gpout = fconvout( gi, gparam, 3, 1, gbetaxy[gi], sico );
+    else if ( sico.MODEL == 7 && gk == 9 ) gpout = fconvout( gi, gparam, 1, 2, gbetaxy[gi], sico );
+    else if ( sico.MODEL == 7 && gk == 10 ) gpout = fconvout( gi, gparam, 2, 2, gbetaxy[gi], sico );
+    else if ( sico.MODEL == 7 && gk == 11 ) gpout = fconvout( gi, gparam, 3, 2, gbetaxy[gi], sico );
+    else if ( sico.MODEL == 7 && gk == 15 ) gpout = fconvout( gi, gparam, 4, 1, gbetaxy[gi], sico );
+    else if ( sico.MODEL == 7 && gk == 24 ) gpout = fconvout( gi, gparam, 4, 2, gbetaxy[gi], sico );
+    else if ( sico.MODEL == 7 && gk == 25 ) gpout = fconvout( gi, gparam, 1, 3, gbetaxy[gi], sico );
+    else if ( sico.MODEL == 7 && gk == 27 ) gpout = fconvout( gi, gparam, 2, 3, gbetaxy[gi], sico );
+    else if ( sico.MODEL == 7 && gk == 29 ) gpout = fconvout( gi, gparam, 3, 3, gbetaxy[gi], sico );
+    else if ( sico.MODEL == 7 && gk == 31 ) gpout = fconvout( gi, gparam, 4, 3, gbetaxy[gi], sico );
+
+    else if ( sico.MODEL == 7 && gk == 1 ) gpout = fdiv( gparam[gi][gk+1], gparam[gi][0], sico.HFLOWMIN );
+    else if ( sico.MODEL == 7 && gk == 2 ) gpout = fdiv( -gparam[gi][gk-1], gparam[gi][0], sico.HFLOWMIN );
+    else if ( sico.MODEL == 7 && gk == 4 ) gpout = fdiv( gparam[gi][gk+1], gparam[gi][3], sico.HFLOWMIN );
+    else if ( sico.MODEL == 7 && gk == 5 ) gpout = fdiv( -gparam[gi][gk-1], gparam[gi][3], sico.HFLOWMIN );
+    else if ( sico.MODEL == 7 && gk == 7 ) gpout = fdiv( gparam[gi][gk+1], gparam[gi][6], sico.HFLOWMIN );
+    else if ( sico.MODEL == 7 && gk == 8 ) gpout = fdiv( -gparam[gi][gk-1], gparam[gi][6], sico.HFLOWMIN );
+
+    else gpout = gparam[gi][gk];
+
+    return gpout;
+}
+
+FILE *foutopen ( char *goutmaps, char *gname, struct ico sico ) { // function for opening output raster map and writing header
+
+    FILE *gfascii, *gfhdr;
+    char gpath[200];
+    int gone = 1;
+
+    if ( sico.FORMAT == 1 ) { // binary raster map: raw float32 in native byte order with ENVI header (readable by GDAL)
+
+        sprintf(gpath, "%s%s.hdr", goutmaps, gname );
+        gfhdr=fopen(gpath, "w");
+        fprintf( gfhdr, "ENVI\ndescription = {r.avaflow}\n" );
+        fprintf( gfhdr, "samples = %i\nlines = %i\nbands = 1\nheader offset = 0\nfile type = ENVI Standard\n", sico.N, sico.M );
+        fprintf( gfhdr, "data type = 4\ninterleave = bsq\nbyte order = %i\n", *(char*)&gone == 1 ? 0 : 1 );
+        fprintf( gfhdr, "map info = {Arbitrary, 1.5, 1.5, %.2f, %.2f, %.2f, %.2f}\n", 
+            sico.BDWEST, sico.BDSOUTH + ( sico.M - 1 ) * sico.CSZ, sico.CSZ, sico.CSZ ); // centre of upper left cell, as ascii header
+        fprintf( gfhdr, "data ignore value = %.3f\n", sico.UNDEF );
+        fclose(gfhdr);
+
+        sprintf(gpath, "%s%s.bin", goutmaps, gname );
+        return fopen(gpath, "wb");
+    }
+
     sprintf(gpath, "%s%s.asc", goutmaps, gname ); // writing name of ascii file to string
     gfascii=fopen(gpath, "w"); // opening ascii file
 
@@ -2041,48 +2137,144 @@ void foutasc ( float **gparam, int *gpx, int *gpy, char *goutmaps, char *gname,
     fprintf( gfascii, "cellsize %.2f\n", sico.CSZ );
     fprintf( gfascii, "NODATA_value %.3f\n", sico.UNDEF );
 
+    return gfascii;
+}
+
+void foutasc ( float **gparam, int *gpx, int *gpy, char *goutmaps, char *gname, float *gbetaxy, int gk, struct ico sico ) { // function for output of ascii raster maps
+
+    FILE *gfascii;
+    int gi, gx, gy;
+    float gpout;
+    float *grow = NULL;
+
+    gfascii = foutopen( goutmaps, gname, sico ); // opening ascii or binary file
+    if ( sico.FORMAT == 1 ) grow = (float*) calloc( sico.N, sizeof(float));
+
     gi = 0;
     for ( gx=0; gx<sico.M; gx++ ) { for ( gy=0; gy<sico.N; gy++ ) {
 
         if ( gpx[gi] == gx && gpy[gi] == gy ) {
 
-            if ( sico.MODEL <= 3 && gk == 0 ) gpout = fconvout( gi, gparam, 1, 1, gbetaxy[gi], sico ); // computing output cell value (height-to-depth conversion where necessary)
-            else if ( sico.MODEL <= 3 && gk == 3 ) gpout = fconvout( gi, gparam, 1, 2, gbetaxy[gi], sico );
-            else if ( sico.MODEL <= 3 && gk == 7 ) gpout = fconvout( gi, gparam, 1, 3, gbetaxy[gi], sico );
-
-            else if ( sico.MODEL <= 3 && gk == 1 ) gpout = fdiv( gparam[gi][gk+1], gparam[gi][0], sico.HFLOWMIN );
-            else if ( sico.MODEL <= 3 && gk == 2 ) gpout = fdiv( -gparam[gi][gk-1], gparam[gi][0], sico.HFLOWMIN );
-
-            else if ( sico.MODEL == 7 && gk == 0 ) gpout = fconvout( gi, gparam, 1, 1, gbetaxy[gi], sico );
-            else if ( sico.MODEL == 7 && gk == 3 ) gpout = fconvout( gi, gparam, 2, 1, gbetaxy[gi], sico );
-            else if ( sico.MODEL == 7 && gk == 6 ) gpout = fconvout( gi, gparam, 3, 1, gbetaxy[gi], sico );
-            else if ( sico.MODEL == 7 && gk == 9 ) gpout = fconvout( gi, gparam, 1, 2, gbetaxy[gi], sico );
-            else if ( sico.MODEL == 7 && gk == 10 ) gpout = fconvout( gi, gparam, 2, 2, gbetaxy[gi], sico );
-            else if ( sico.MODEL == 7 && gk == 11 ) gpout = fconvout( gi, gparam, 3, 2, gbetaxy[gi], sico );
-            else if ( sico.MODEL == 7 && gk == 15 ) gpout = fconvout( gi, gparam, 4, 1, gbetaxy[gi], sico );
-            else if ( sico.MODEL == 7 && gk == 24 ) gpout = fconvout( gi, gparam, 4, 2, gbetaxy[gi], sico );
-            else if ( sico.MODEL == 7 && gk == 25 ) gpout = fconvout( gi, gparam, 1, 3, gbetaxy[gi], sico );
-            else if ( sico.MODEL == 7 && gk == 27 ) gpout = fconvout( gi, gparam, 2, 3, gbetaxy[gi], sico );
-            else if ( sico.MODEL == 7 && gk == 29 ) gpout = fconvout( gi, gparam, 3, 3, gbetaxy[gi], sico );
-            else if ( sico.MODEL == 7 && gk == 31 ) gpout = fconvout( gi, gparam, 4, 3, gbetaxy[gi], sico );
-
-            else if ( sico.MODEL == 7 && gk == 1 ) gpout = fdiv( gparam[gi][gk+1], gparam[gi][0], sico.HFLOWMIN );
-            else if ( sico.MODEL == 7 && gk == 2 ) gpout = fdiv( -gparam[gi][gk-1], gparam[gi][0], sico.HFLOWMIN );
-            else if ( sico.MODEL == 7 && gk == 4 ) gpout = fdiv( gparam[gi][gk+1], gparam[gi][3], sico.HFLOWMIN );
-            else if ( sico.MODEL == 7 && gk == 5 ) gpout = fdiv( -gparam[gi][gk-1], gparam[gi][3], sico.HFLOWMIN );
-            else if ( sico.MODEL == 7 && gk == 7 ) gpout = fdiv( gparam[gi][gk+1], gparam[gi][6], sico.HFLOWMIN );
-            else if ( sico.MODEL == 7 && gk == 8 ) gpout = fdiv( -gparam[gi][gk-1], gparam[gi][6], sico.HFLOWMIN );
-
-            else gpout = gparam[gi][gk];
-
-            fprintf( gfascii, "%.3f ", gpout ); // writing output to ascii file
+            gpout = foutval( gparam, gi, gbetaxy, gk, sico ); // computing output cell value
+
+            if ( sico.FORMAT == 1 ) grow[gy] = gpout; // writing output to row of binary file
+            else fprintf( gfascii, "%.3f ", gpout ); // writing output to ascii file
             gi += 1;
             
-        } else fprintf( gfascii, "-9999.000 " ); // writing no data value to file if cell is not in area of interest
+        } else if ( sico.FORMAT == 1 ) grow[gy] = sico.UNDEF;
+        else fprintf( gfascii, "-9999.000 " ); // writing no data value to file if cell is not in area of interest
         
-    } fprintf(gfascii, "\n"); }
+    } if ( sico.FORMAT == 1 ) fwrite( grow, sizeof(float), sico.N, gfascii ); else fprintf(gfascii, "\n"); }
 
     fclose(gfascii);
+    free(grow);
+
+    return;
+}
+
+void foutsparse ( float **gparam, int *gpx, int *gpy, char *goutmaps, char *gname, char **gmv0, int *gk, int gnk, float *gbetaxy, struct ico sico ) { 
+    // function for output of sparse snapshot (only cells with non-zero values, all cells without variables)
+
+    FILE *gfsparse;
+    char gpath[200], gvname[32];
+    int gi, gj, gn, gactive, gheader[5], *gcell;
+    float gcoord[3], *gval;
+
+    gcell = (int*) calloc( sico.IMAX + 1, sizeof(int));
+    gval = (float*) calloc( (size_t)sico.IMAX * gnk + 1, sizeof(float));
+
+    gn = 0;
+    for ( gi=0; gi<sico.IMAX; gi++ ) {
+
+        gactive = ( gnk == 0 ); // without variables, all cells are written (domain)
+        for ( gj=0; gj<gnk; gj++ ) {
+
+            gval[(size_t)gn * gnk + gj] = foutval( gparam, gi, gbetaxy, gk[gj], sico );
+            if ( gval[(size_t)gn * gnk + gj] != 0 ) gactive = 1;
+        }
+        if ( gactive == 1 ) {
+
+            gcell[gn] = gpx[gi] * sico.N + gpy[gi]; // index of cell (row-major)
+            gn += 1;
+        }
+    }
+
+    sprintf(gpath, "%s%s.spr", goutmaps, gname );
+    gfsparse=fopen(gpath, "wb");
+
+    gheader[0] = 1; gheader[1] = sico.M; gheader[2] = sico.N; gheader[3] = gnk; gheader[4] = gn; // byte order check, rows, columns, variables, cells
+    gcoord[0] = sico.BDWEST; gcoord[1] = sico.BDSOUTH; gcoord[2] = sico.CSZ;
+    fwrite( "AVSP", 1, 4, gfsparse );
+    fwrite( gheader, sizeof(int), 5, gfsparse );
+    fwrite( gcoord, sizeof(float), 3, gfsparse );
+    for ( gj=0; gj<gnk; gj++ ) {
+
+        memset( gvname, 0, 32 );
+        strncpy( gvname, gmv0[gk[gj]], 31 );
+        fwrite( gvname, 1, 32, gfsparse ); // names of variables
+    }
+    fwrite( gcell, sizeof(int), gn, gfsparse );
+    fwrite( gval, sizeof(float), (size_t)gn * gnk, gfsparse ); // values (one row of variables per cell)
+    fclose(gfsparse);
+
+    free(gcell);
+    free(gval);
+
+    return;
+}
+
+void foutvtk ( char *gpath, float *gdata, int gnvar, char **gvname, struct ico sico ) { 
+    // function for output of vtk image data file (point arrays of size M*N, from south to north, appended as raw binary data)
+
+    FILE *gfvtk;
+    int gj, gx, gy, gone = 1;
+    unsigned long long gbytes, goffset = 0;
+    size_t gn = (size_t)sico.M * sico.N, gc;
+    unsigned char *gghost;
+
+    gghost = (unsigned char*) calloc( (size_t)( sico.M - 1 ) * ( sico.N - 1 ) + 1, sizeof(unsigned char));
+    for ( gx=0; gx<sico.M-1; gx++ ) { for ( gy=0; gy<sico.N-1; gy++ ) {
+
+        gc = (size_t)gx * sico.N + gy;
+        if ( isnan( gdata[gc] ) || isnan( gdata[gc+1] ) || isnan( gdata[gc+sico.N] ) || isnan( gdata[gc+sico.N+1] ))
+            gghost[(size_t)gx * ( sico.N - 1 ) + gy] = 32; // hiding cells outside of area of interest
+    }}
+
+    gfvtk=fopen(gpath, "wb");
+
+    fprintf(gfvtk, "<?xml version=\"1.0\"?>\n");
+    fprintf(gfvtk, "<VTKFile type=\"ImageData\" version=\"1.0\" byte_order=\"%s\" header_type=\"UInt64\">\n", 
+        *(char*)&gone == 1 ? "LittleEndian" : "BigEndian" );
+    fprintf(gfvtk, "  <ImageData WholeExtent=\"0 %i 0 %i 0 0\" Origin=\"%.3f %.3f 0\" Spacing=\"%.3f %.3f 1\">\n", 
+        sico.N - 1, sico.M - 1, sico.BDWEST, sico.BDNORTH - ( sico.M - 1 ) * sico.CSZ, sico.CSZ, sico.CSZ );
+    fprintf(gfvtk, "    <Piece Extent=\"0 %i 0 %i 0 0\">\n", sico.N - 1, sico.M - 1 );
+    fprintf(gfvtk, "      <PointData>\n");
+    for ( gj=0; gj<gnvar; gj++ ) {
+
+        fprintf(gfvtk, "        <DataArray type=\"Float32\" Name=\"%s\" format=\"appended\" offset=\"%llu\"/>\n", gvname[gj], goffset );
+        goffset += sizeof(unsigned long long) + gn * sizeof(float);
+    }
+    fprintf(gfvtk, "      </PointData>\n");
+    fprintf(gfvtk, "      <CellData>\n");
+    fprintf(gfvtk, "        <DataArray type=\"UInt8\" Name=\"vtkGhostType\" format=\"appended\" offset=\"%llu\"/>\n", goffset );
+    fprintf(gfvtk, "      </CellData>\n");
+    fprintf(gfvtk, "    </Piece>\n");
+    fprintf(gfvtk, "  </ImageData>\n");
+    fprintf(gfvtk, "  <AppendedData encoding=\"raw\">\n   _");
+    for ( gj=0; gj<gnvar; gj++ ) {
+
+        gbytes = gn * sizeof(float);
+        fwrite( &gbytes, sizeof(unsigned long long), 1, gfvtk ); // size of array, followed by values
+        fwrite( gdata + (size_t)gj * gn, sizeof(float), gn, gfvtk );
+    }
+    gbytes = (size_t)( sico.M - 1 ) * ( sico.N - 1 );
+    fwrite( &gbytes, sizeof(unsigned long long), 1, gfvtk );
+    fwrite( gghost, sizeof(unsigned char), gbytes, gfvtk );
+    fprintf(gfvtk, "\n  </AppendedData>\n");
+    fprintf(gfvtk, "</VTKFile>\n");
+    fclose(gfvtk);
+
+    free(gghost);
 
     return;
 }
@@ -2090,19 +2282,12 @@ void foutasc ( float **gparam, int *gpx, int *gpy, char *goutmaps, char *gname,
 void foutascind ( int *gparam, int *gpx, int *gpy, char *goutmaps, char *gname, struct ico sico ) { // function for output of ascii raster maps
 
     FILE *gfascii;
-    char gpath[200];
     int gi, gx, gy;
     int gpout;
+    float *grow = NULL;
 
-    sprintf(gpath, "%s%s.asc", goutmaps, gname ); // writing name of ascii file to string
-    gfascii=fopen(gpath, "w"); // opening ascii file
-
-    fprintf( gfascii, "ncols %i\n", sico.N ); // writing header to ascii file
-    fprintf( gfascii, "nrows %i\n", sico.M );
-    fprintf( gfascii, "xllcenter %.2f\n", sico.BDWEST );
-    fprintf( gfascii, "yllcenter %.2f\n", sico.BDSOUTH );
-    fprintf( gfascii, "cellsize %.2f\n", sico.CSZ );
-    fprintf( gfascii, "NODATA_value %.3f\n", sico.UNDEF );
+    gfascii = foutopen( goutmaps, gname, sico ); // opening ascii or binary file
+    if ( sico.FORMAT == 1 ) grow = (float*) calloc( sico.N, sizeof(float));
 
     gi = 0;
     for ( gx=0; gx<sico.M; gx++ ) { for ( gy=0; gy<sico.N; gy++ ) {
@@ -2110,14 +2295,17 @@ void foutascind ( int *gparam, int *gpx, int *gpy, char *goutmaps, char *gname,
         if ( gpx[gi] == gx && gpy[gi] == gy ) {
 
             gpout = gparam[gi];
-            fprintf( gfascii, "%i ", gpout ); // writing output to ascii file
+            if ( sico.FORMAT == 1 ) grow[gy] = gpout; // writing output to row of binary file
+            else fprintf( gfascii, "%i ", gpout ); // writing output to ascii file
             gi += 1;
             
-        } else fprintf( gfascii, "-9999.000 " ); // writing no data value to file if cell is not in area of interest
+        } else if ( sico.FORMAT == 1 ) grow[gy] = sico.UNDEF;
+        else fprintf( gfascii, "-9999.000 " ); // writing no data value to file if cell is not in area of interest
         
-    } fprintf(gfascii, "\n"); }
+    } if ( sico.FORMAT == 1 ) fwrite( grow, sizeof(float), sico.N, gfascii ); else fprintf(gfascii, "\n"); }
 
     fclose(gfascii);
+    free(grow);
 
     return;
 }
@@ -2125,19 +2313,12 @@ void foutascind ( int *gparam, int *gpx, int *gpy, char *goutmaps, char *gname,
 void foutascindf ( float *gparam, int *gpx, int *gpy, char *goutmaps, char *gname, struct ico sico ) { // function for output of ascii raster maps
 
     FILE *gfascii;
-    char gpath[200];
     int gi, gx, gy;
     float gpout;
+    float *grow = NULL;
 
-    sprintf(gpath, "%s%s.asc", goutmaps, gname ); // writing name of ascii file to string
-    gfascii=fopen(gpath, "w"); // opening ascii file
-
-    fprintf( gfascii, "ncols %i\n", sico.N ); // writing header to ascii file
-    fprintf( gfascii, "nrows %i\n", sico.M );
-    fprintf( gfascii, "xllcenter %.2f\n", sico.BDWEST );
-    fprintf( gfascii, "yllcenter %.2f\n", sico.BDSOUTH );
-    fprintf( gfascii, "cellsize %.2f\n", sico.CSZ );
-    fprintf( gfascii, "NODATA_value %.3f\n", sico.UNDEF );
+    gfascii = foutopen( goutmaps, gname, sico ); // opening ascii or binary file
+    if ( sico.FORMAT == 1 ) grow = (float*) calloc( sico.N, sizeof(float));
 
     gi = 0;
     for ( gx=0; gx<sico.M; gx++ ) { for ( gy=0; gy<sico.N; gy++ ) {
@@ -2145,14 +2326,17 @@ void foutascindf ( float *gparam, int *gpx, int *gpy, char *goutmaps, char *gnam
         if ( gpx[gi] == gx && gpy[gi] == gy ) {
 
             gpout = gparam[gi];
-            fprintf( gfascii, "%.2f ", gpout ); // writing output to ascii file
+            if ( sico.FORMAT == 1 ) grow[gy] = gpout; // writing output to row of binary file
+            else fprintf( gfascii, "%.2f ", gpout ); // writing output to ascii file
             gi += 1;
             
-        } else fprintf( gfascii, "-9999.000 " ); // writing no data value to file if cell is not in area of interest
+        } else if ( sico.FORMAT == 1 ) grow[gy] = sico.UNDEF;
+        else fprintf( gfascii, "-9999.000 " ); // writing no data value to file if cell is not in area of interest
         
-    } fprintf(gfascii, "\n"); }
+    } if ( sico.FORMAT == 1 ) fwrite( grow, sizeof(float), sico.N, gfascii ); else fprintf(gfascii, "\n"); }
 
     fclose(gfascii);
+    free(grow);
 
     return;
 }
@@ -2271,12 +2455,85 @@ void foutdir ( FILE *gf_directions, float **gparam, int gl, int gintmode, int *g
 #ifdef WITHGRASS
 
 
-    SEGMENT finrasti ( char *gm, struct ico sico ) { // input of integer GRASS raster maps
+    char *icache = NULL; // memory-mapped cache of input raster maps shared by multiple model runs
+    size_t icachesize = 0;
+
+    void ficache ( char *gcachename, struct ico sico ) { // function for mapping the cache of input raster maps
+
+        int gfd, *gheader;
+        struct stat gst;
+
+        gfd = open( gcachename, O_RDONLY );
+        if ( gfd < 0 ) return;
+        if ( fstat( gfd, &gst ) != 0 || gst.st_size < 16 ) { close( gfd ); return; }
+
+        icache = mmap( NULL, gst.st_size, PROT_READ, MAP_SHARED, gfd, 0 ); // pages are shared among all processes mapping the cache
+        close( gfd );
+        if ( icache == MAP_FAILED ) { icache = NULL; return; }
+        icachesize = gst.st_size;
+
+        gheader = (int*)( icache + 4 ); // number of maps, number of rows, number of columns
+        if ( strncmp( icache, "AVIC", 4 ) != 0 || gheader[1] != sico.M || gheader[2] != sico.N
+            || icachesize < 16 + (size_t)gheader[0] * ( 256 + (size_t)sico.M * sico.N * sizeof(float) )) { // cache not matching the region
+
+            munmap( icache, icachesize );
+            icache = NULL;
+        }
+    }
+
+    float *fcplane ( char *gm, struct ico sico ) { // function for locating a raster map in the cache of input raster maps
+
+        int gi, gn;
+
+        if ( icache == NULL ) return NULL;
+        gn = *(int*)( icache + 4 );
+        for ( gi=0; gi<gn; gi++ ) {
+
+            if ( strncmp( icache + 16 + (size_t)gi * 256, gm, 256 ) == 0 )
+                return (float*)( icache + 16 + (size_t)gn * 256 + (size_t)gi * sico.M * sico.N * sizeof(float) );
+        }
+        return NULL;
+    }
+
+    void fcfree ( void *garray ) { // function for freeing array (arrays referring to the cache of input raster maps are not freed)
+
+        if ( icache != NULL && (char*)garray >= icache && (char*)garray < icache + icachesize ) return;
+        free( garray );
+    }
+
+    float fsegget ( SEGMENT *gseg, float *gplane, int gx, int gy, struct ico sico ) { // function for reading cell of float input raster map
+
+        float gval;
+
+        if ( gplane != NULL ) return gplane[(size_t)gx * sico.N + gy]; // directly from cache of input raster maps
+        Segment_get( gseg, &gval, gx, gy );
+        return gval;
+    }
+
+    int fseggeti ( SEGMENT *gseg, float *gplane, int gx, int gy, struct ico sico ) { // function for reading cell of integer input raster map
+
+        int gval;
+
+        if ( gplane != NULL ) return (int)gplane[(size_t)gx * sico.N + gy]; // directly from cache of input raster maps
+        Segment_get( gseg, &gval, gx, gy );
+        return gval;
+    }
+
+    void fsegrelease ( SEGMENT *gseg, float *gplane ) { // function for releasing segment of input raster map (none for maps read from cache)
+
+        if ( gplane == NULL ) Segment_release( gseg );
+    }
+
+    SEGMENT finrasti ( char *gm, float **gplane, struct ico sico ) { // input of integer GRASS raster maps (or location in cache of input raster maps)
 
         int gf, gx, gy, gin;
         CELL *gc;
         SEGMENT gseg_in;
 
+        memset( &gseg_in, 0, sizeof(SEGMENT));
+        *gplane = fcplane( gm, sico );
+        if ( *gplane != NULL ) return gseg_in; // read directly from the shared pages, no segmentation file
+
         Segment_open ( &gseg_in, G_tempfile(), sico.M, sico.N, sico.NSEGRC, sico.NSEGRC, sizeof(int), sico.NSEGS );
 
         gc = Rast_allocate_c_buf();
@@ -2300,13 +2557,17 @@ void foutdir ( FILE *gf_directions, float **gparam, int gl, int gintmode, int *g
         return gseg_in;
     }
 
-    SEGMENT finrastd ( char *gm, struct ico sico ) { // input of float GRASS raster maps
+    SEGMENT finrastd ( char *gm, float **gplane, struct ico sico ) { // input of float GRASS raster maps (or location in cache of input raster maps)
 
         int gf, gx, gy;
         float gin;
         DCELL *gc;
         SEGMENT gseg_in;
 
+        memset( &gseg_in, 0, sizeof(SEGMENT));
+        *gplane = fcplane( gm, sico ); // no data already set to -9999 in cache
+        if ( *gplane != NULL ) return gseg_in; // read directly from the shared pages, no segmentation file
+
         Segment_open ( &gseg_in, G_tempfile(), sico.M, sico.N, sico.NSEGRC, sico.NSEGRC, sizeof(float), sico.NSEGS );
 
         gc = Rast_allocate_d_buf();
@@ -2336,7 +2597,7 @@ void foutdir ( FILE *gf_directions, float **gparam, int gl, int gintmode, int *g
         int gf, gx, gy;
         DCELL *gc;
 
-        if ( gm != NULL ) {
+        if ( gm != NULL && sico.RAST == 1 ) {
             gc = Rast_allocate_d_buf();
             gf = Rast_open_new( gm, DCELL_TYPE );
 
@@ -2363,6 +2624,11 @@ void foutdir ( FILE *gf_directions, float **gparam, int gl, int gintmode, int *g
 #else
 
 
+    void fcfree ( void *garray ) { // function for freeing array (no cache of input raster maps without GRASS)
+
+        free( garray );
+    }
+
     float *finaschdr ( char *gindir, char *gname ) { // function for input of ascii raster map header
 
         FILE *gfascii;
@@ -2666,7 +2932,7 @@ int main ( int argc, char *argv[] ) { // calling main function
     char *indir = (char*) calloc(800, sizeof(char));
 
     int x, y, *px, *py, *iin, *inn, *innn, *cin, hydrograph, adaptograph, frictiograph, transformograph, hydnum = 0, hydnin = 0, hydnout, *hydi = 0, hydj = 0, hydk = 0, *hydx = 0, *hydy = 0, hydt = 0, 
-        *hydtmax = 0, hydtmaxx = 0, *hydp0 = 0, **hydp = 0, adatmax = 0, adak, adat = 0, fritmax = 0, frik, frit = 0, tratmax = 0, trak, tratx = 0, nvect_all, nvect_red, lmax, xint, ccontinue, csuccess, 
+        *hydtmax = 0, hydtmaxx = 0, *hydp0 = 0, **hydp = 0, adatmax = 0, adak, adat = 0, fritmax = 0, frik, frit = 0, tratmax = 0, trak, tratx = 0, nvect_all, nvect_red, ksparse[100], nksparse = 0, lmax, xint, ccontinue, csuccess, 
         nsum, nout, time_start, time_stop, ctrlr, ctrlv, ctrlvv, ctrlvvv, ccfl, fj[4][2], i, j, jj, jjj, jmin = 0, k = 0, l, ll, p, z, prec_hflow, prec_vol, prec_ekin, nzones, ctrl_trelease,
         imax = 0, iloop, ctrl_hydout, ix, i2, hydcols, ctrl_noosc, ctrl_release, ctrl_basechange, cflowpre, anctr, anid, andist, cslide, cflow, iy, iz, anwin0/*, awnum*/;
 
@@ -2705,7 +2971,9 @@ int main ( int argc, char *argv[] ) { // calling main function
     int paracontourshmin = 0, paracontourshmax = 0, paracontourshint = 0, paracontourszmin = 0, paracontourszmax = 0, paracontourszint = 0, paraimp;    
     float paramin = 0, pararef = 0, paratsunref = 0, paraxmetric = 0, paraymetric = 0, paraelev = 0, parahflow = 0, parahrelease = 0, parah = 0, parahs = 0, parahmax = 0, 
         parahflow1 = 0, parahflow2 = 0, parahflow3 = 0, paraalpha = 0, paraalphamax = 0, parafactr = 0, parafactg = 0, parafactb = 0, parahtsun = 0, paracorrtsun = 0, 
-        paraaddtsun = 0, paracolfactr = 0, paracolfactb = 0, paracolfactg = 0, parar = 0, parab = 0, parag = 0, parad = 0, parared = 0, paragreen = 0, parablue = 0;
+        paraaddtsun = 0, paracolfactr = 0, paracolfactb = 0, paracolfactg = 0, parar = 0, parab = 0, parag = 0, parad = 0, parared = 0, paragreen = 0, parablue = 0, *vtkdata = NULL;
+    int vtki;
+    char *vtkname[7] = { "z", "h", "s", "r", "g", "b", "i" }; // names of virtual reality variables
 
     struct ico sico;
     struct flow sflow;
@@ -2717,6 +2985,11 @@ int main ( int argc, char *argv[] ) { // calling main function
         SEGMENT seg_elev, seg_hrelease, seg_hrelease2, seg_hrelease3, seg_vinx, seg_viny, seg_vinx2, seg_viny2, seg_vinx3, seg_viny3,
         seg_hentrmax, seg_hentrmax2, seg_hentrmax3, seg_zones, seg_centr, seg_cvshear, seg_phi, seg_phi2, seg_phi3, seg_deltab, seg_tufri, seg_delta, seg_delta2, seg_delta3, seg_nyss, seg_nyfs, 
         seg_nyff, seg_ambdrag, seg_flufri, seg_transssfs, seg_transssff, seg_transfsff, seg_trelease, seg_trelstop, seg_stoptime, seg_tslide, seg_impactarea, seg_hdeposit, seg_pbg1, seg_pbg2, seg_pbg3;
+        float *cp_elev = NULL, *cp_hrelease = NULL, *cp_hrelease2 = NULL, *cp_hrelease3 = NULL, *cp_vinx = NULL, *cp_viny = NULL, *cp_vinx2 = NULL, *cp_viny2 = NULL, *cp_vinx3 = NULL,
+        *cp_viny3 = NULL, *cp_hentrmax = NULL, *cp_hentrmax2 = NULL, *cp_hentrmax3 = NULL, *cp_zones = NULL, *cp_centr = NULL, *cp_cvshear = NULL, *cp_phi = NULL, *cp_phi2 = NULL,
+        *cp_phi3 = NULL, *cp_deltab = NULL, *cp_tufri = NULL, *cp_delta = NULL, *cp_delta2 = NULL, *cp_delta3 = NULL, *cp_nyss = NULL, *cp_nyfs = NULL, *cp_nyff = NULL, *cp_ambdrag = NULL,
+        *cp_flufri = NULL, *cp_transssfs = NULL, *cp_transssff = NULL, *cp_transfsff = NULL, *cp_trelease = NULL, *cp_trelstop = NULL, *cp_stoptime = NULL, *cp_tslide = NULL,
+        *cp_impactarea = NULL, *cp_hdeposit = NULL, *cp_pbg1 = NULL, *cp_pbg2 = NULL, *cp_pbg3 = NULL; // planes of input raster maps in cache (NULL if read through segmentation files)
         char *yint = (char*) calloc(1000, sizeof(char));
         int aoi, zones, impactarea, pbg1, pbg2, pbg3;
         float hflowi = 0, hflowi2 = 0, hflowi3 = 0, hentri = 0, hentri2 = 0, hentri3 = 0, pout, elev, hrelease2, hrelease3, vinx, viny, vinx2, viny2, vinx3, viny3,
@@ -2770,6 +3043,10 @@ int main ( int argc, char *argv[] ) { // calling main function
         xint=1;
         yint=getenv("XINT");
         if ( yint != NULL ) xint=atoi(yint);
+
+        sico.RAST=1;
+        yint=getenv("XRAST");
+        if ( yint != NULL ) sico.RAST=atoi(yint); // writing GRASS raster maps (1) or ascii raster maps only (0, model runs sharing one mapset)
         
         G_gisinit( argv[0] );
 
@@ -2800,6 +3077,13 @@ int main ( int argc, char *argv[] ) { // calling main function
 
         fparam=fopen( input_opt1->answer, "r" ); // opening parameter file
 
+        yint=getenv("XTAB");
+        if ( yint != NULL && fparam ) { // parameter file shared by multiple model runs, values of model run from parameter table
+
+            fitab( yint, xint );
+            ptabfile = fparam;
+        }
+
 
     #else
 
@@ -2823,6 +3107,13 @@ int main ( int argc, char *argv[] ) { // calling main function
 
 
     sico.PI = 3.1415926536; // pi
+
+    sico.FORMAT = 0;
+    if ( getenv("XFORMAT") != NULL ) sico.FORMAT = atoi( getenv("XFORMAT") ); // format of output raster maps (0=ascii, 1=binary)
+    sico.SPARSE = 0;
+    if ( getenv("XSPARSE") != NULL ) sico.SPARSE = atoi( getenv("XSPARSE") ); // time step snapshots as sparse files (0=no, 1=yes)
+    sico.VTK = 0;
+    if ( getenv("XVTK") != NULL ) sico.VTK = atoi( getenv("XVTK") ); // format of virtual reality output (0=csv, 1=vtk image data)
     
     sico.ELEV = 0; sico.RELM = 0; sico.RELM2 = 0; sico.RELM3 = 0; sico.RELV = 0; sico.RELV2 = 0; sico.RELV3 = 0; sico.ENTR = 0; sico.ENTR2 = 0; sico.ENTR3 = 0; 
     sico.ZONES = 0; sico.CENTR = 0; sico.CVSHEAR = 0; sico.PHI = 0; sico.PHI2 = 0; sico.PHI3 = 0; sico.DELTAB = 0; sico.TUFRI = 0; sico.DELTA = 0; sico.DELTA2 = 0; sico.DELTA3 = 0; 
@@ -3717,6 +4008,7 @@ int main ( int argc, char *argv[] ) { // calling main function
     fprintf( f_paramcomm, "Path to R packages for map plots\t%s\n", rlibs ); 
 
     fclose(fparam); // closing parameter file
+    ptabfile = NULL;
     fclose(f_paramcomm); // closing commented parameter file
    
 
@@ -3771,53 +4063,56 @@ int main ( int argc, char *argv[] ) { // calling main function
     #ifdef WITHGRASS
 
 
-        seg_elev = finrastd( elevname, sico );
+        yint=getenv("XCACHE");
+        if ( yint != NULL ) ficache( yint, sico ); // cache of input raster maps shared by multiple model runs
+
+        seg_elev = finrastd( elevname, &cp_elev, sico );
         
-        if ( sico.RELM == 1 ) seg_hrelease = finrastd( hreleasename, sico );
-        if ( sico.MODEL == 7 && sico.RELM2 == 1 ) seg_hrelease2 = finrastd( hreleasename2, sico );
-        if ( sico.MODEL == 7 && sico.RELM3 == 1 ) seg_hrelease3 = finrastd( hreleasename3, sico );
+        if ( sico.RELM == 1 ) seg_hrelease = finrastd( hreleasename, &cp_hrelease, sico );
+        if ( sico.MODEL == 7 && sico.RELM2 == 1 ) seg_hrelease2 = finrastd( hreleasename2, &cp_hrelease2, sico );
+        if ( sico.MODEL == 7 && sico.RELM3 == 1 ) seg_hrelease3 = finrastd( hreleasename3, &cp_hrelease3, sico );
         
-        if ( sico.RELV == 1 ) seg_vinx = finrastd( vinxname, sico );
-        if ( sico.MODEL == 7 && sico.RELV2 == 1 ) seg_vinx2 = finrastd( vinxname2, sico );
-        if ( sico.MODEL == 7 && sico.RELV3 == 1 ) seg_vinx3 = finrastd( vinxname3, sico );
+        if ( sico.RELV == 1 ) seg_vinx = finrastd( vinxname, &cp_vinx, sico );
+        if ( sico.MODEL == 7 && sico.RELV2 == 1 ) seg_vinx2 = finrastd( vinxname2, &cp_vinx2, sico );
+        if ( sico.MODEL == 7 && sico.RELV3 == 1 ) seg_vinx3 = finrastd( vinxname3, &cp_vinx3, sico );
         
-        if ( sico.RELV == 1 ) seg_viny = finrastd( vinyname, sico );
-        if ( sico.MODEL == 7 && sico.RELV2 == 1 ) seg_viny2 = finrastd( vinyname2, sico );
-        if ( sico.MODEL == 7 && sico.RELV3 == 1 ) seg_viny3 = finrastd( vinyname3, sico );
+        if ( sico.RELV == 1 ) seg_viny = finrastd( vinyname, &cp_viny, sico );
+        if ( sico.MODEL == 7 && sico.RELV2 == 1 ) seg_viny2 = finrastd( vinyname2, &cp_viny2, sico );
+        if ( sico.MODEL == 7 && sico.RELV3 == 1 ) seg_viny3 = finrastd( vinyname3, &cp_viny3, sico );
         
-        if ( sico.ENTR == 1 ) seg_hentrmax = finrastd( hentrmaxname, sico );
-        if ( sico.MODEL == 7 && sico.ENTR2 == 1 ) seg_hentrmax2 = finrastd( hentrmaxname2, sico );
-        if ( sico.MODEL == 7 && sico.ENTR3 == 1 ) seg_hentrmax3 = finrastd( hentrmaxname3, sico );
-
-        if ( sico.ZONES == 1 ) seg_zones = finrasti( zonesname, sico );
-        if ( sico.CENTR == 1 ) seg_centr = finrastd( centrname, sico );
-        if ( sico.CVSHEAR == 1 ) seg_cvshear = finrastd( cvshearname, sico );
-        if ( sico.PHI == 1 ) seg_phi = finrastd( phiname, sico );
-        if ( sico.PHI2 == 1 ) seg_phi2 = finrastd( phi2name, sico ); 
-        if ( sico.PHI3 == 1 ) seg_phi3 = finrastd( phi3name, sico );
-        if ( sico.DELTAB == 1 ) seg_deltab = finrastd( deltabname, sico );
-        if ( sico.TUFRI == 1 ) seg_tufri = finrastd( tufriname, sico );
-        if ( sico.DELTA == 1 ) seg_delta = finrastd( deltaname, sico );
-        if ( sico.DELTA2 == 1 ) seg_delta2 = finrastd( delta2name, sico );
-        if ( sico.DELTA3 == 1 ) seg_delta3 = finrastd( delta3name, sico );
-        if ( sico.NYSS == 1 ) seg_nyss = finrastd( nyssname, sico );
-        if ( sico.NYFS == 1 ) seg_nyfs = finrastd( nyfsname, sico );
-        if ( sico.NYFF == 1 ) seg_nyff = finrastd( nyffname, sico );
-        if ( sico.AMBDRAG == 1 ) seg_ambdrag = finrastd( ambdragname, sico );
-        if ( sico.FLUFRI == 1 ) seg_flufri = finrastd( flufriname, sico );
-        if ( sico.TRANSSSFS == 1 ) seg_transssfs = finrastd( transssfsname, sico );
-        if ( sico.TRANSSSFF == 1 ) seg_transssff = finrastd( transssffname, sico );
-        if ( sico.TRANSFSFF == 1 ) seg_transfsff = finrastd( transfsffname, sico );
-        if ( sico.TRELEASE == 1 ) seg_trelease = finrastd( treleasename, sico );
-        if ( sico.TRELSTOP == 1 ) seg_trelstop = finrastd( trelstopname, sico );
-        if ( sico.STOPTIME == 1 ) seg_stoptime = finrastd( stoptimename, sico );
-        if ( sico.TSLIDE == 1 ) seg_tslide = finrastd( tslidename, sico );
-        if ( sico.IMPACTAREA == 1 ) seg_impactarea = finrasti( impactareaname, sico );
-        if ( sico.HDEPOSIT == 1 ) seg_hdeposit = finrastd( hdepositname, sico );
+        if ( sico.ENTR == 1 ) seg_hentrmax = finrastd( hentrmaxname, &cp_hentrmax, sico );
+        if ( sico.MODEL == 7 && sico.ENTR2 == 1 ) seg_hentrmax2 = finrastd( hentrmaxname2, &cp_hentrmax2, sico );
+        if ( sico.MODEL == 7 && sico.ENTR3 == 1 ) seg_hentrmax3 = finrastd( hentrmaxname3, &cp_hentrmax3, sico );
+
+        if ( sico.ZONES == 1 ) seg_zones = finrasti( zonesname, &cp_zones, sico );
+        if ( sico.CENTR == 1 ) seg_centr = finrastd( centrname, &cp_centr, sico );
+        if ( sico.CVSHEAR == 1 ) seg_cvshear = finrastd( cvshearname, &cp_cvshear, sico );
+        if ( sico.PHI == 1 ) seg_phi = finrastd( phiname, &cp_phi, sico );
+        if ( sico.PHI2 == 1 ) seg_phi2 = finrastd( phi2name, &cp_phi2, sico ); 
+        if ( sico.PHI3 == 1 ) seg_phi3 = finrastd( phi3name, &cp_phi3, sico );
+        if ( sico.DELTAB == 1 ) seg_deltab = finrastd( deltabname, &cp_deltab, sico );
+        if ( sico.TUFRI == 1 ) seg_tufri = finrastd( tufriname, &cp_tufri, sico );
+        if ( sico.DELTA == 1 ) seg_delta = finrastd( deltaname, &cp_delta, sico );
+        if ( sico.DELTA2 == 1 ) seg_delta2 = finrastd( delta2name, &cp_delta2, sico );
+        if ( sico.DELTA3 == 1 ) seg_delta3 = finrastd( delta3name, &cp_delta3, sico );
+        if ( sico.NYSS == 1 ) seg_nyss = finrastd( nyssname, &cp_nyss, sico );
+        if ( sico.NYFS == 1 ) seg_nyfs = finrastd( nyfsname, &cp_nyfs, sico );
+        if ( sico.NYFF == 1 ) seg_nyff = finrastd( nyffname, &cp_nyff, sico );
+        if ( sico.AMBDRAG == 1 ) seg_ambdrag = finrastd( ambdragname, &cp_ambdrag, sico );
+        if ( sico.FLUFRI == 1 ) seg_flufri = finrastd( flufriname, &cp_flufri, sico );
+        if ( sico.TRANSSSFS == 1 ) seg_transssfs = finrastd( transssfsname, &cp_transssfs, sico );
+        if ( sico.TRANSSSFF == 1 ) seg_transssff = finrastd( transssffname, &cp_transssff, sico );
+        if ( sico.TRANSFSFF == 1 ) seg_transfsff = finrastd( transfsffname, &cp_transfsff, sico );
+        if ( sico.TRELEASE == 1 ) seg_trelease = finrastd( treleasename, &cp_trelease, sico );
+        if ( sico.TRELSTOP == 1 ) seg_trelstop = finrastd( trelstopname, &cp_trelstop, sico );
+        if ( sico.STOPTIME == 1 ) seg_stoptime = finrastd( stoptimename, &cp_stoptime, sico );
+        if ( sico.TSLIDE == 1 ) seg_tslide = finrastd( tslidename, &cp_tslide, sico );
+        if ( sico.IMPACTAREA == 1 ) seg_impactarea = finrasti( impactareaname, &cp_impactarea, sico );
+        if ( sico.HDEPOSIT == 1 ) seg_hdeposit = finrastd( hdepositname, &cp_hdeposit, sico );
         if ( sico.PBG == 1 ) {
-            seg_pbg1 = finrasti( pbg1name, sico );
-            seg_pbg2 = finrasti( pbg2name, sico );
-            seg_pbg3 = finrasti( pbg3name, sico );
+            seg_pbg1 = finrasti( pbg1name, &cp_pbg1, sico );
+            seg_pbg2 = finrasti( pbg2name, &cp_pbg2, sico );
+            seg_pbg3 = finrasti( pbg3name, &cp_pbg3, sico );
         }
 
         sico.IMAX = 0;
@@ -3919,8 +4214,10 @@ int main ( int argc, char *argv[] ) { // calling main function
         }
 
         if ( sico.ZONES == 1 ) pzones = (int*) calloc( sico.IMAX, sizeof(int));
-        if ( sico.CENTR == 1 ) pcentr = (float*) calloc( sico.IMAX, sizeof(float));
-        if ( sico.CVSHEAR == 1 ) pcvshear = (float*) calloc( sico.IMAX, sizeof(float));
+        if ( sico.CENTR == 1 && cp_centr != NULL ) pcentr = cp_centr; // read-only view of cache of input raster maps (values used unchanged)
+        else if ( sico.CENTR == 1 ) pcentr = (float*) calloc( sico.IMAX, sizeof(float));
+        if ( sico.CVSHEAR == 1 && cp_cvshear != NULL ) pcvshear = cp_cvshear; // read-only view of cache of input raster maps (values used unchanged)
+        else if ( sico.CVSHEAR == 1 ) pcvshear = (float*) calloc( sico.IMAX, sizeof(float));
         if ( sico.PHI == 1 ) pphi = (float*) calloc( sico.IMAX, sizeof(float));
         if ( sico.PHI2 == 1 ) pphi2 = (float*) calloc( sico.IMAX, sizeof(float));
         if ( sico.PHI3 == 1 ) pphi3 = (float*) calloc( sico.IMAX, sizeof(float));
@@ -3932,17 +4229,23 @@ int main ( int argc, char *argv[] ) { // calling main function
         if ( sico.NYSS == 1 ) pnyss = (float*) calloc( sico.IMAX, sizeof(float));
         if ( sico.NYFS == 1 ) pnyfs = (float*) calloc( sico.IMAX, sizeof(float));
         if ( sico.NYFF == 1 ) pnyff = (float*) calloc( sico.IMAX, sizeof(float));
-        if ( sico.AMBDRAG == 1 ) pambdrag = (float*) calloc( sico.IMAX, sizeof(float));
-        if ( sico.FLUFRI == 1 ) pflufri = (float*) calloc( sico.IMAX, sizeof(float));
-        if ( sico.TRANSSSFS == 1 ) ptransssfs = (float*) calloc( sico.IMAX, sizeof(float));
-        if ( sico.TRANSSSFF == 1 ) ptransssff = (float*) calloc( sico.IMAX, sizeof(float));
-        if ( sico.TRANSFSFF == 1 ) ptransfsff = (float*) calloc( sico.IMAX, sizeof(float));
+        if ( sico.AMBDRAG == 1 && cp_ambdrag != NULL ) pambdrag = cp_ambdrag; // read-only view of cache of input raster maps (values used unchanged)
+        else if ( sico.AMBDRAG == 1 ) pambdrag = (float*) calloc( sico.IMAX, sizeof(float));
+        if ( sico.FLUFRI == 1 && cp_flufri != NULL ) pflufri = cp_flufri; // read-only view of cache of input raster maps (values used unchanged)
+        else if ( sico.FLUFRI == 1 ) pflufri = (float*) calloc( sico.IMAX, sizeof(float));
+        if ( sico.TRANSSSFS == 1 && cp_transssfs != NULL ) ptransssfs = cp_transssfs; // read-only view of cache of input raster maps (values used unchanged)
+        else if ( sico.TRANSSSFS == 1 ) ptransssfs = (float*) calloc( sico.IMAX, sizeof(float));
+        if ( sico.TRANSSSFF == 1 && cp_transssff != NULL ) ptransssff = cp_transssff; // read-only view of cache of input raster maps (values used unchanged)
+        else if ( sico.TRANSSSFF == 1 ) ptransssff = (float*) calloc( sico.IMAX, sizeof(float));
+        if ( sico.TRANSFSFF == 1 && cp_transfsff != NULL ) ptransfsff = cp_transfsff; // read-only view of cache of input raster maps (values used unchanged)
+        else if ( sico.TRANSFSFF == 1 ) ptransfsff = (float*) calloc( sico.IMAX, sizeof(float));
         if ( sico.TRELEASE == 1 ) ptrelease = (float*) calloc( sico.IMAX, sizeof(float));
         if ( sico.TRELSTOP == 1 ) ptrelstop = (float*) calloc( sico.IMAX, sizeof(float));
         pstoptime = (float*) calloc( sico.IMAX, sizeof(float));
         ptslide = (float*) calloc( sico.IMAX, sizeof(float));
         if ( sico.IMPACTAREA == 1 ) pimpactarea = (int*) calloc( sico.IMAX, sizeof(int));
-        if ( sico.HDEPOSIT == 1 ) phdeposit = (float*) calloc( sico.IMAX, sizeof(float));
+        if ( sico.HDEPOSIT == 1 && cp_hdeposit != NULL ) phdeposit = cp_hdeposit; // read-only view of cache of input raster maps (values used unchanged)
+        else if ( sico.HDEPOSIT == 1 ) phdeposit = (float*) calloc( sico.IMAX, sizeof(float));
         
         ppbg1 = (int*) calloc( sico.IMAX, sizeof(int));
         ppbg2 = (int*) calloc( sico.IMAX, sizeof(int));
@@ -4137,53 +4440,53 @@ int main ( int argc, char *argv[] ) { // calling main function
           for ( y = 0; y < sico.N; y++ ) {
 
             aoi = 1;
-            Segment_get(&seg_elev, &elev, x, y); // reading data from segmentation files
+            elev = fsegget( &seg_elev, cp_elev, x, y, sico ); // reading data from segmentation files
             
-            if ( sico.RELM == 1 ) Segment_get(&seg_hrelease, &hrelease, x, y);
-            if ( sico.MODEL == 7 && sico.RELM2 == 1 ) Segment_get(&seg_hrelease2, &hrelease2, x, y);
-            if ( sico.MODEL == 7 && sico.RELM3 == 1 ) Segment_get(&seg_hrelease3, &hrelease3, x, y);
+            if ( sico.RELM == 1 ) hrelease = fsegget( &seg_hrelease, cp_hrelease, x, y, sico );
+            if ( sico.MODEL == 7 && sico.RELM2 == 1 ) hrelease2 = fsegget( &seg_hrelease2, cp_hrelease2, x, y, sico );
+            if ( sico.MODEL == 7 && sico.RELM3 == 1 ) hrelease3 = fsegget( &seg_hrelease3, cp_hrelease3, x, y, sico );
             
-            if ( sico.RELV == 1 ) Segment_get(&seg_vinx, &vinx, x, y);
-            if ( sico.MODEL == 7 && sico.RELV2 == 1 ) Segment_get(&seg_vinx2, &vinx2, x, y);
-            if ( sico.MODEL == 7 && sico.RELV3 == 1 ) Segment_get(&seg_vinx3, &vinx3, x, y);
+            if ( sico.RELV == 1 ) vinx = fsegget( &seg_vinx, cp_vinx, x, y, sico );
+            if ( sico.MODEL == 7 && sico.RELV2 == 1 ) vinx2 = fsegget( &seg_vinx2, cp_vinx2, x, y, sico );
+            if ( sico.MODEL == 7 && sico.RELV3 == 1 ) vinx3 = fsegget( &seg_vinx3, cp_vinx3, x, y, sico );
             
-            if ( sico.RELV == 1 ) Segment_get(&seg_viny, &viny, x, y);
-            if ( sico.MODEL == 7 && sico.RELV2 == 1 ) Segment_get(&seg_viny2, &viny2, x, y);
-            if ( sico.MODEL == 7 && sico.RELV3 == 1 ) Segment_get(&seg_viny3, &viny3, x, y);
+            if ( sico.RELV == 1 ) viny = fsegget( &seg_viny, cp_viny, x, y, sico );
+            if ( sico.MODEL == 7 && sico.RELV2 == 1 ) viny2 = fsegget( &seg_viny2, cp_viny2, x, y, sico );
+            if ( sico.MODEL == 7 && sico.RELV3 == 1 ) viny3 = fsegget( &seg_viny3, cp_viny3, x, y, sico );
             
-            if ( sico.ENTR == 1 ) Segment_get(&seg_hentrmax, &hentrmax, x, y);
-            if ( sico.MODEL == 7 && sico.ENTR2 == 1 ) Segment_get(&seg_hentrmax2, &hentrmax2, x, y);
-            if ( sico.MODEL == 7 && sico.ENTR3 == 1 ) Segment_get(&seg_hentrmax3, &hentrmax3, x, y);
-
-            if ( sico.ZONES == 1 ) Segment_get(&seg_zones, &zones, x, y);     
-            if ( sico.CENTR == 1 ) Segment_get(&seg_centr, &centr, x, y);
-            if ( sico.CVSHEAR == 1 ) Segment_get(&seg_cvshear, &cvshear, x, y);
-            if ( sico.PHI == 1 ) Segment_get(&seg_phi, &phi, x, y);
-            if ( sico.PHI2 == 1 ) Segment_get(&seg_phi2, &phi2, x, y);
-            if ( sico.PHI3 == 1 ) Segment_get(&seg_phi3, &phi3, x, y);
-            if ( sico.DELTAB == 1 ) Segment_get(&seg_deltab, &deltab, x, y);
-            if ( sico.TUFRI == 1 ) Segment_get(&seg_tufri, &tufri, x, y);
-            if ( sico.DELTA == 1 ) Segment_get(&seg_delta, &delta, x, y);
-            if ( sico.DELTA2 == 1 ) Segment_get(&seg_delta2, &delta2, x, y);
-            if ( sico.DELTA3 == 1 ) Segment_get(&seg_delta3, &delta3, x, y);
-            if ( sico.NYSS == 1 ) Segment_get(&seg_nyss, &nyss, x, y);
-            if ( sico.NYFS == 1 ) Segment_get(&seg_nyfs, &nyfs, x, y);
-            if ( sico.NYFF == 1 ) Segment_get(&seg_nyff, &nyff, x, y);
-            if ( sico.AMBDRAG == 1 ) Segment_get(&seg_ambdrag, &ambdrag, x, y);
-            if ( sico.FLUFRI == 1 ) Segment_get(&seg_flufri, &flufri, x, y);
-            if ( sico.TRANSSSFS == 1 ) Segment_get(&seg_transssfs, &transssfs, x, y);
-            if ( sico.TRANSSSFF == 1 ) Segment_get(&seg_transssff, &transssff, x, y);
-            if ( sico.TRANSFSFF == 1 ) Segment_get(&seg_transfsff, &transfsff, x, y);
-            if ( sico.TRELEASE == 1 ) Segment_get(&seg_trelease, &trelease, x, y);
-            if ( sico.TRELSTOP == 1 ) Segment_get(&seg_trelstop, &trelstop, x, y);
-            if ( sico.STOPTIME == 1 ) Segment_get(&seg_stoptime, &stoptime, x, y);
-            if ( sico.TSLIDE == 1 ) Segment_get(&seg_tslide, &tslide, x, y);
-            if ( sico.IMPACTAREA == 1 ) Segment_get(&seg_impactarea, &impactarea, x, y);
-            if ( sico.HDEPOSIT == 1 ) Segment_get(&seg_hdeposit, &hdeposit, x, y);
+            if ( sico.ENTR == 1 ) hentrmax = fsegget( &seg_hentrmax, cp_hentrmax, x, y, sico );
+            if ( sico.MODEL == 7 && sico.ENTR2 == 1 ) hentrmax2 = fsegget( &seg_hentrmax2, cp_hentrmax2, x, y, sico );
+            if ( sico.MODEL == 7 && sico.ENTR3 == 1 ) hentrmax3 = fsegget( &seg_hentrmax3, cp_hentrmax3, x, y, sico );
+
+            if ( sico.ZONES == 1 ) zones = fseggeti( &seg_zones, cp_zones, x, y, sico );     
+            if ( sico.CENTR == 1 ) centr = fsegget( &seg_centr, cp_centr, x, y, sico );
+            if ( sico.CVSHEAR == 1 ) cvshear = fsegget( &seg_cvshear, cp_cvshear, x, y, sico );
+            if ( sico.PHI == 1 ) phi = fsegget( &seg_phi, cp_phi, x, y, sico );
+            if ( sico.PHI2 == 1 ) phi2 = fsegget( &seg_phi2, cp_phi2, x, y, sico );
+            if ( sico.PHI3 == 1 ) phi3 = fsegget( &seg_phi3, cp_phi3, x, y, sico );
+            if ( sico.DELTAB == 1 ) deltab = fsegget( &seg_deltab, cp_deltab, x, y, sico );
+            if ( sico.TUFRI == 1 ) tufri = fsegget( &seg_tufri, cp_tufri, x, y, sico );
+            if ( sico.DELTA == 1 ) delta = fsegget( &seg_delta, cp_delta, x, y, sico );
+            if ( sico.DELTA2 == 1 ) delta2 = fsegget( &seg_delta2, cp_delta2, x, y, sico );
+            if ( sico.DELTA3 == 1 ) delta3 = fsegget( &seg_delta3, cp_delta3, x, y, sico );
+            if ( sico.NYSS == 1 ) nyss = fsegget( &seg_nyss, cp_nyss, x, y, sico );
+            if ( sico.NYFS == 1 ) nyfs = fsegget( &seg_nyfs, cp_nyfs, x, y, sico );
+            if ( sico.NYFF == 1 ) nyff = fsegget( &seg_nyff, cp_nyff, x, y, sico );
+            if ( sico.AMBDRAG == 1 ) ambdrag = fsegget( &seg_ambdrag, cp_ambdrag, x, y, sico );
+            if ( sico.FLUFRI == 1 ) flufri = fsegget( &seg_flufri, cp_flufri, x, y, sico );
+            if ( sico.TRANSSSFS == 1 ) transssfs = fsegget( &seg_transssfs, cp_transssfs, x, y, sico );
+            if ( sico.TRANSSSFF == 1 ) transssff = fsegget( &seg_transssff, cp_transssff, x, y, sico );
+            if ( sico.TRANSFSFF == 1 ) transfsff = fsegget( &seg_transfsff, cp_transfsff, x, y, sico );
+            if ( sico.TRELEASE == 1 ) trelease = fsegget( &seg_trelease, cp_trelease, x, y, sico );
+            if ( sico.TRELSTOP == 1 ) trelstop = fsegget( &seg_trelstop, cp_trelstop, x, y, sico );
+            if ( sico.STOPTIME == 1 ) stoptime = fsegget( &seg_stoptime, cp_stoptime, x, y, sico );
+            if ( sico.TSLIDE == 1 ) tslide = fsegget( &seg_tslide, cp_tslide, x, y, sico );
+            if ( sico.IMPACTAREA == 1 ) impactarea = fseggeti( &seg_impactarea, cp_impactarea, x, y, sico );
+            if ( sico.HDEPOSIT == 1 ) hdeposit = fsegget( &seg_hdeposit, cp_hdeposit, x, y, sico );
             if ( sico.PBG == 1 ) {
-                Segment_get(&seg_pbg1, &pbg1, x, y);
-                Segment_get(&seg_pbg2, &pbg2, x, y);
-                Segment_get(&seg_pbg3, &pbg3, x, y);                                          
+                pbg1 = fseggeti( &seg_pbg1, cp_pbg1, x, y, sico );
+                pbg2 = fseggeti( &seg_pbg2, cp_pbg2, x, y, sico );
+                pbg3 = fseggeti( &seg_pbg3, cp_pbg3, x, y, sico );                                          
             }
 
             if ( aoi >= 1 ) {
@@ -4220,10 +4523,10 @@ int main ( int argc, char *argv[] ) { // calling main function
                 else if ( sico.MODEL == 7 ) phentrmax3[i] = 0;
                 if ( sico.ZONES == 1 && zones != sico.UNDEF ) pzones[i] = 0;
                 else if ( sico.ZONES== 1 ) pzones[i] = 0;        
-                if ( sico.CENTR == 1 && centr != sico.UNDEF ) pcentr[i] = centr;
-                else if ( sico.CENTR == 1 ) pcentr[i] = sico.UNDEF;
-                if ( sico.CVSHEAR == 1 && cvshear != sico.UNDEF ) pcvshear[i] = cvshear;
-                else if ( sico.CVSHEAR == 1 ) pcvshear[i] = sico.UNDEF;
+                if ( sico.CENTR == 1 && cp_centr == NULL && centr != sico.UNDEF ) pcentr[i] = centr;
+                else if ( sico.CENTR == 1 && cp_centr == NULL ) pcentr[i] = sico.UNDEF;
+                if ( sico.CVSHEAR == 1 && cp_cvshear == NULL && cvshear != sico.UNDEF ) pcvshear[i] = cvshear;
+                else if ( sico.CVSHEAR == 1 && cp_cvshear == NULL ) pcvshear[i] = sico.UNDEF;
                 if ( sico.PHI == 1 && phi != sico.UNDEF ) pphi[i] = phi * sico.PI / 180;
                 else if ( sico.PHI == 1 ) pphi[i] = sico.UNDEF;
                 if ( sico.PHI2 == 1 && phi2 != sico.UNDEF ) pphi2[i] = phi2 * sico.PI / 180;
@@ -4246,16 +4549,16 @@ int main ( int argc, char *argv[] ) { // calling main function
                 else if ( sico.NYFS == 1 ) pnyfs[i] = sico.UNDEF;
                 if ( sico.NYFF == 1 && nyff != sico.UNDEF ) pnyff[i] = pow( 10, nyff );
                 else if ( sico.NYFF == 1 ) pnyff[i] = sico.UNDEF;
-                if ( sico.AMBDRAG == 1 && ambdrag != sico.UNDEF ) pambdrag[i] = ambdrag;
-                else if ( sico.AMBDRAG == 1 ) pambdrag[i] = sico.UNDEF;
-                if ( sico.FLUFRI == 1 && flufri != sico.UNDEF ) pflufri[i] = flufri;
-                else if ( sico.FLUFRI == 1 ) pflufri[i] = sico.UNDEF;
-                if ( sico.TRANSSSFS == 1 && transssfs != sico.UNDEF ) ptransssfs[i] = transssfs;
-                else if ( sico.TRANSSSFS == 1 ) ptransssfs[i] = sico.UNDEF;
-                if ( sico.TRANSSSFF == 1 && transssff != sico.UNDEF ) ptransssff[i] = transssff;
-                else if ( sico.TRANSSSFF == 1 ) ptransssff[i] = sico.UNDEF;
-                if ( sico.TRANSFSFF == 1 && transfsff != sico.UNDEF ) ptransfsff[i] = transfsff;
-                else if ( sico.TRANSFSFF == 1 ) ptransfsff[i] = sico.UNDEF;
+                if ( sico.AMBDRAG == 1 && cp_ambdrag == NULL && ambdrag != sico.UNDEF ) pambdrag[i] = ambdrag;
+                else if ( sico.AMBDRAG == 1 && cp_ambdrag == NULL ) pambdrag[i] = sico.UNDEF;
+                if ( sico.FLUFRI == 1 && cp_flufri == NULL && flufri != sico.UNDEF ) pflufri[i] = flufri;
+                else if ( sico.FLUFRI == 1 && cp_flufri == NULL ) pflufri[i] = sico.UNDEF;
+                if ( sico.TRANSSSFS == 1 && cp_transssfs == NULL && transssfs != sico.UNDEF ) ptransssfs[i] = transssfs;
+                else if ( sico.TRANSSSFS == 1 && cp_transssfs == NULL ) ptransssfs[i] = sico.UNDEF;
+                if ( sico.TRANSSSFF == 1 && cp_transssff == NULL && transssff != sico.UNDEF ) ptransssff[i] = transssff;
+                else if ( sico.TRANSSSFF == 1 && cp_transssff == NULL ) ptransssff[i] = sico.UNDEF;
+                if ( sico.TRANSFSFF == 1 && cp_transfsff == NULL && transfsff != sico.UNDEF ) ptransfsff[i] = transfsff;
+                else if ( sico.TRANSFSFF == 1 && cp_transfsff == NULL ) ptransfsff[i] = sico.UNDEF;
                 if ( sico.TRELEASE == 1 && trelease != sico.UNDEF ) ptrelease[i] = trelease;
                 else if ( sico.TRELEASE == 1 ) ptrelease[i] = sico.UNDEF;
                 if ( sico.TRELSTOP == 1 && trelstop != sico.UNDEF ) ptrelstop[i] = trelstop;
@@ -4266,8 +4569,8 @@ int main ( int argc, char *argv[] ) { // calling main function
                 else ptslide[i] = sico.UNDEF;
                 if ( sico.IMPACTAREA == 1 && impactarea != sico.UNDEF ) pimpactarea[i] = impactarea;
                 else if ( sico.IMPACTAREA == 1 ) pimpactarea[i] = sico.UNDEF;
-                if ( sico.HDEPOSIT == 1 && hdeposit != sico.UNDEF ) phdeposit[i] = hdeposit;
-                else if ( sico.HDEPOSIT == 1 ) phdeposit[i] = sico.UNDEF;
+                if ( sico.HDEPOSIT == 1 && cp_hdeposit == NULL && hdeposit != sico.UNDEF ) phdeposit[i] = hdeposit;
+                else if ( sico.HDEPOSIT == 1 && cp_hdeposit == NULL ) phdeposit[i] = sico.UNDEF;
                 
                 if ( sico.PBG == 1 && pbg1 != sico.UNDEF ) ppbg1[i] = pbg1;
                 else if ( sico.PBG == 1 ) ppbg1[i] = sico.UNDEF;
@@ -8870,10 +9173,19 @@ int main ( int argc, char *argv[] ) { // calling main function
                     else if ( nout < 100 ) sprintf( madd, "00");
                     else if ( nout < 1000 ) sprintf( madd, "0");
 
-                    sprintf(path, "%sdata/pv%s%i.csv", outvr, madd, nout+j-1);
-                    f_vr[nout+j-1]=fopen(path, "w");
+                    if ( sico.VTK == 1 ) { // vtk image data file, arrays filled cell by cell
+
+                        sprintf(path, "%sdata/pv%s%i.vti", outvr, madd, nout+j-1);
+                        vtkdata = (float*) calloc( (size_t)7 * sico.M * sico.N, sizeof(float));
+                        for ( vtki=0; vtki<7*sico.M*sico.N; vtki++ ) vtkdata[vtki] = NAN;
+
+                    } else {
+
+                        sprintf(path, "%sdata/pv%s%i.csv", outvr, madd, nout+j-1);
+                        f_vr[nout+j-1]=fopen(path, "w");
 
-                    fprintf(f_vr[nout+j-1], "x,y,z,h,s,r,g,b,i\n");
+                        fprintf(f_vr[nout+j-1], "x,y,z,h,s,r,g,b,i\n");
+                    }
 
                     if ( sico.PBG == 0 ) {
 
@@ -9031,7 +9343,18 @@ int main ( int argc, char *argv[] ) { // calling main function
 
                         if ( parahmax >= sico.IMPTHR[0] ) paraimp = 1; else paraimp = 0;
 
-                        if ( sico.TSUNAMI == 0 )
+                        if ( sico.VTK == 1 ) {
+
+                            vtki = ( sico.M - 1 - px[i] ) * sico.N + py[i]; // index of point in image data (rows from south to north)
+                            vtkdata[vtki] = parah;
+                            if ( sico.TSUNAMI == 0 ) vtkdata[sico.M*sico.N+vtki] = parahflow; else vtkdata[sico.M*sico.N+vtki] = parahtsun;
+                            vtkdata[2*sico.M*sico.N+vtki] = parahs;
+                            vtkdata[3*sico.M*sico.N+vtki] = parared;
+                            vtkdata[4*sico.M*sico.N+vtki] = paragreen;
+                            vtkdata[5*sico.M*sico.N+vtki] = parablue;
+                            vtkdata[6*sico.M*sico.N+vtki] = paraimp;
+
+                        } else if ( sico.TSUNAMI == 0 )
                             fprintf(f_vr[nout+j-1], "%.2f,%.2f,%.2f,%.2f,%.2f,%.2f,%.2f,%.2f,%i\n", paraxmetric, paraymetric, parah, 
                                 parahflow, parahs, parared, paragreen, parablue, paraimp);
                         else
@@ -9039,7 +9362,12 @@ int main ( int argc, char *argv[] ) { // calling main function
                                 parahtsun, parahs, parared, paragreen, parablue, paraimp);                     
                     }
                 
-                    fclose(f_vr[nout+j-1]);
+                    if ( sico.VTK == 1 ) {
+
+                        foutvtk( path, vtkdata, 7, vtkname, sico );
+                        free( vtkdata );
+
+                    } else fclose(f_vr[nout+j-1]);
                 }
             }
 
@@ -9199,6 +9527,7 @@ int main ( int argc, char *argv[] ) { // calling main function
                 else if ( nout < 100 ) sprintf( madd, "00");
                 else if ( nout < 1000 ) sprintf( madd, "0");
 
+                nksparse = 0;
                 for ( k=0; k<nvect_red; k++ ) {
                 
                     sprintf( mv, "%s%s%s%i", prefix, mv0[k], madd, nout ); // names of output raster maps
@@ -9215,18 +9544,31 @@ int main ( int argc, char *argv[] ) { // calling main function
                         #endif
 
 
-                        if ( sico.MODEL <= 3 ) foutasc ( aw, px, py, outmaps, mv, betaxy, k, sico ); // writing ascii raster maps (one-phase models)
+                        if ( sico.SPARSE == 1 ) { ksparse[nksparse] = k; nksparse += 1; } // variable of sparse snapshot
+                        else if ( sico.MODEL <= 3 ) foutasc ( aw, px, py, outmaps, mv, betaxy, k, sico ); // writing ascii raster maps (one-phase models)
                         else if ( sico.MODEL == 7 ) foutasc ( aw, px, py, outmaps, mv, betaxy, k, sico ); // writing ascii raster maps (multi-phase model)
                     }
                 }
 
                 if ( sico.MODEL <= 3 ) { // ascii raster maps of maximum flow height at time step
                     sprintf( mv, "%s%s%s%i", prefix, mv0[7], madd, nout );
-                    foutasc ( aw, px, py, outmaps, mv, betaxy, 7, sico );
+                    if ( sico.SPARSE == 1 ) { ksparse[nksparse] = 7; nksparse += 1; }
+                    else foutasc ( aw, px, py, outmaps, mv, betaxy, 7, sico );
                     
                 } else if ( sico.MODEL == 7 ) {
                     sprintf( mv, "%s%s%s%i", prefix, mv0[31], madd, nout );
-                    foutasc ( aw, px, py, outmaps, mv, betaxy, 31, sico );
+                    if ( sico.SPARSE == 1 ) { ksparse[nksparse] = 31; nksparse += 1; }
+                    else foutasc ( aw, px, py, outmaps, mv, betaxy, 31, sico );
+                }
+
+                if ( sico.SPARSE == 1 ) { // sparse snapshot of time step (cells with flow only)
+
+                    if ( nout == 1 ) {
+                        sprintf( mv, "%sdomain", prefix );
+                        foutsparse ( aw, px, py, outmaps, mv, mv0, ksparse, 0, betaxy, sico ); // cells of the area of interest
+                    }
+                    sprintf( mv, "%ssnapshot%s%i", prefix, madd, nout );
+                    foutsparse ( aw, px, py, outmaps, mv, mv0, ksparse, nksparse, betaxy, sico );
                 }
 
                 if ( nout == 1 && sico.MODEL <= 3 ) foutdircoord ( f_directions, 1, px, py, sico ); // file for display of flow vectors as arrows
@@ -9857,6 +10199,28 @@ int main ( int argc, char *argv[] ) { // calling main function
 // -- START -- Writing pvpython script for import to Paraview ---------------------------------------------------
 
 
+    if ( sico.MULT == 0 && sico.VTK == 1 ) {
+
+        sprintf(path, "%sdata/pv.pvd", outvr); // collection of vtk image data files
+        f_paraviewi=fopen(path, "w");
+
+        fprintf(f_paraviewi, "<?xml version=\"1.0\"?>\n");
+        fprintf(f_paraviewi, "<VTKFile type=\"Collection\" version=\"1.0\">\n");
+        fprintf(f_paraviewi, "  <Collection>\n");
+        for ( j=0; j<nout; j++ ) {
+
+            if ( j < 10 ) sprintf( madd, "000"); // fill string (as for writing the files)
+            else if ( j < 100 ) sprintf( madd, "00");
+            else sprintf( madd, "0");
+
+            fprintf(f_paraviewi, "    <DataSet timestep=\"%.2f\" file=\"pv%s%i.vti\"/>\n", j * tout, madd, j );
+        }
+        fprintf(f_paraviewi, "  </Collection>\n");
+        fprintf(f_paraviewi, "</VTKFile>\n");
+
+        fclose(f_paraviewi);
+    }
+
     if ( sico.MULT == 0 ) {
 
         sprintf(path, "%spvimport.py", outvr); // pvpython script
@@ -9893,9 +10257,17 @@ int main ( int argc, char *argv[] ) { // calling main function
         fprintf(f_paraviewi, "if os.path.exists('contoursh'): shutil.rmtree('contoursh')\n");
         fprintf(f_paraviewi, "if os.path.exists('contoursz'): shutil.rmtree('contoursz')\n");
         fprintf(f_paraviewi, "\n");
-        fprintf(f_paraviewi, "intab = paraview.simple.CSVReader(FileName=glob.glob('data/pv*.csv'))\n");
-        fprintf(f_paraviewi, "points = paraview.simple.TableToPoints(intab, XColumn='x', YColumn='y', ZColumn='z', KeepAllDataArrays=True)\n");
-        fprintf(f_paraviewi, "surface = paraview.simple.Delaunay2D(points)\n");
+        if ( sico.VTK == 1 ) { // image data time series, elevation applied by warping
+
+            fprintf(f_paraviewi, "inimg = paraview.simple.PVDReader(FileName='data/pv.pvd')\n");
+            fprintf(f_paraviewi, "surface = paraview.simple.WarpByScalar(Input=inimg, Scalars=['POINTS', 'z'])\n");
+
+        } else {
+
+            fprintf(f_paraviewi, "intab = paraview.simple.CSVReader(FileName=glob.glob('data/pv*.csv'))\n");
+            fprintf(f_paraviewi, "points = paraview.simple.TableToPoints(intab, XColumn='x', YColumn='y', ZColumn='z', KeepAllDataArrays=True)\n");
+            fprintf(f_paraviewi, "surface = paraview.simple.Delaunay2D(points)\n");
+        }
         fprintf(f_paraviewi, "surfcalc = paraview.simple.Calculator(Input=surface, ResultArrayName='rgb', Function='r * iHat + g * jHat + b * kHat')\n");
         fprintf(f_paraviewi, "contoursh = paraview.simple.Contour(Input=surface, ContourBy='h', Isosurfaces=hcont)\n");
         if ( sico.TSUNAMI == 1 ) fprintf(f_paraviewi, "contoursz = paraview.simple.Contour(Input=surface, ContourBy='s', Isosurfaces=elevcont)\n");
@@ -9932,7 +10304,7 @@ int main ( int argc, char *argv[] ) { // calling main function
 // -- START -- Writing python script for import to Blender ------------------------------------------------------
 
 
-    if ( sico.MULT == 0 ) {
+    if ( sico.MULT == 0 && sico.VTK == 0 ) { // Blender import reads the csv files of the virtual reality output
 
         sprintf(path, "%sblimport.py", outvr); // python script
         f_blenderi=fopen(path, "w");
@@ -10331,6 +10703,15 @@ int main ( int argc, char *argv[] ) { // calling main function
 
         fclose(f_blenderi);
     }
+    else if ( sico.MULT == 0 ) { // no csv files with vtk image data output
+
+        sprintf(path, "%sblimport.py", outvr); // python script
+        f_blenderi=fopen(path, "w");
+
+        fprintf(f_blenderi, "raise SystemExit('Import to Blender requires the virtual reality output as csv files, please repeat the simulation with vrformat=csv.')\n");
+
+        fclose(f_blenderi);
+    }
 
 
 // -- STOP --- Writing python script for import to Blender ------------------------------------------------------
@@ -11297,6 +11678,13 @@ int main ( int argc, char *argv[] ) { // calling main function
         fprintf(f_rprofile, "hexagg <- %.5f  #exaggeration of flow height for display\n", phexagg );
         fprintf(f_rprofile, "tint <- %.5f  #length of time step\n", tout );
         fprintf(f_rprofile, "tstop <- %.5f  #total time of simulation\n", tmax );
+        fprintf(f_rprofile, "args <- commandArgs(trailingOnly = TRUE)  #optional range of time steps to be rendered\n");
+        fprintf(f_rprofile, "tfirst <- suppressWarnings(as.integer(args[1]))\n");
+        fprintf(f_rprofile, "tlast <- suppressWarnings(as.integer(args[2]))\n");
+        fprintf(f_rprofile, "if (is.na(tfirst) || is.na(tlast)) {\n");
+        fprintf(f_rprofile, "    tfirst <- 0\n");
+        fprintf(f_rprofile, "    tlast <- Inf\n");
+        fprintf(f_rprofile, "}\n");
         fprintf(f_rprofile, "depdef <- %i  #control for observed deposit map\n", sico.HDEPOSIT );
         fprintf(f_rprofile, "\n");
         fprintf(f_rprofile, "# Defining data file name\n");
@@ -11529,6 +11917,8 @@ int main ( int argc, char *argv[] ) { // calling main function
         fprintf(f_rprofile, "\n");
         fprintf(f_rprofile, "    for (ntimesteps in 0:maxtimesteps) {\n");
         fprintf(f_rprofile, "\n");
+        fprintf(f_rprofile, "        if (ntimesteps < tfirst || ntimesteps > tlast) next  #time step rendered by other process\n");
+        fprintf(f_rprofile, "\n");
         fprintf(f_rprofile, "        if (ntimesteps<10) {\n");       
         fprintf(f_rprofile, "            fill = paste('000', ntimesteps, sep='')\n");      
         fprintf(f_rprofile, "        } else if (ntimesteps<100) {\n");       
@@ -11880,8 +12270,17 @@ int main ( int argc, char *argv[] ) { // calling main function
         fprintf(f_rmap, "ninhyd <- %i\n", hydnin );
         fprintf(f_rmap, "nouthyd <- %i\n", hydnout );
         fprintf(f_rmap, "ntimemax <- %i\n", nout - 1 );
+        fprintf(f_rmap, "args <- commandArgs(trailingOnly = TRUE)  #optional range of time steps to be rendered\n");
+        fprintf(f_rmap, "tfirst <- suppressWarnings(as.integer(args[1]))\n");
+        fprintf(f_rmap, "tlast <- suppressWarnings(as.integer(args[2]))\n");
+        fprintf(f_rmap, "if ( is.na(tfirst) || is.na(tlast) ) {\n");
+        fprintf(f_rmap, "    tfirst <- 0\n");
+        fprintf(f_rmap, "    tlast <- Inf\n");
+        fprintf(f_rmap, "}\n");
         fprintf(f_rmap, "ctrlpts <- %i\n", sico.CTRLPOINTS );
         fprintf(f_rmap, "ctrl_basechange <- %i\n", ctrl_basechange );
+        if ( sico.FORMAT == 1 ) fprintf(f_rmap, "rext <- '.bin'  #extension of output raster maps\n" );
+        else fprintf(f_rmap, "rext <- '.asc'  #extension of output raster maps\n" );
         
     #ifdef WITHGRASS
 
@@ -12136,7 +12535,7 @@ int main ( int argc, char *argv[] ) { // calling main function
         fprintf(f_rmap, "\n");
         fprintf(f_rmap, "    if (j == 0 && impdef == 1 ) {\n");
         fprintf(f_rmap, "\n");
-        fprintf(f_rmap, "        impactareaname <- paste(wkdir, prefix, 'results/', prefix, 'ascii/', prefix, 'impactarea.asc', sep = '')\n");
+        fprintf(f_rmap, "        impactareaname <- paste(wkdir, prefix, 'results/', prefix, 'ascii/', prefix, 'impactarea', rext, sep = '')\n");
         fprintf(f_rmap, "        impactarea0 <- raster(impactareaname)\n");
         fprintf(f_rmap, "        impactarea <- t(as.matrix(impactarea0))\n");
         fprintf(f_rmap, "        impactarea <- impactarea[, ncol(impactarea):1]\n");
@@ -12144,7 +12543,7 @@ int main ( int argc, char *argv[] ) { // calling main function
         fprintf(f_rmap, "\n");
         fprintf(f_rmap, "    if ( j == 3 && depdef == 1 ) {\n");
         fprintf(f_rmap, "\n");
-        fprintf(f_rmap, "        hdepositname <- paste(wkdir, prefix, 'results/', prefix, 'ascii/', prefix, 'hdeposit.asc', sep = '')\n");
+        fprintf(f_rmap, "        hdepositname <- paste(wkdir, prefix, 'results/', prefix, 'ascii/', prefix, 'hdeposit', rext, sep = '')\n");
         fprintf(f_rmap, "        hdeposit0 <- raster(hdepositname)\n");
         fprintf(f_rmap, "        hdeposit1 <- reclassify(hdeposit0,c(-Inf,as.numeric(thresholdsh),0,as.numeric(thresholdsh),Inf,1))\n");
         fprintf(f_rmap, "        hdeposit <- t(as.matrix(hdeposit1))\n");
@@ -12162,6 +12561,8 @@ int main ( int argc, char *argv[] ) { // calling main function
         fprintf(f_rmap, "\n");
         fprintf(f_rmap, "  for ( ntimesteps in ntimemin:( ntimemax+1 )) { # loop over all time steps plus one for maps of maximum values\n");
         fprintf(f_rmap, "\n");
+        fprintf(f_rmap, "    if ( ntimesteps < tfirst || ntimesteps > tlast ) next  # time step rendered by other process\n");
+        fprintf(f_rmap, "\n");
         fprintf(f_rmap, "    if ( mult != 0 ) {\n");
         fprintf(f_rmap, "        fill <- 'iscore'\n");
         fprintf(f_rmap, "    } else if ( ntimesteps < 10 ) {\n");
@@ -12561,7 +12962,7 @@ int main ( int argc, char *argv[] ) { // calling main function
         fprintf(f_rmap, "\n");
         fprintf(f_rmap, "    # Importing raster layers\n");
         fprintf(f_rmap, "    cat(paste('Plotting ', mstringt, ' ...', sep=''))\n"); 
-        fprintf(f_rmap, "    mstringtname <- paste(wkdir, prefix, 'results/', prefix, 'ascii/', mstringt, '.asc', sep = '')\n");
+        fprintf(f_rmap, "    mstringtname <- paste(wkdir, prefix, 'results/', prefix, 'ascii/', mstringt, rext, sep = '')\n");
         fprintf(f_rmap, "    mstringtr <- raster(mstringtname)  #raster of total value\n");
         fprintf(f_rmap, "\n");
         fprintf(f_rmap, "    if (ortho1 != 'None') {\n");
@@ -12572,16 +12973,16 @@ int main ( int argc, char *argv[] ) { // calling main function
         fprintf(f_rmap, "        orthogray[orthogray<153] <- 153\n");
         fprintf(f_rmap, "        orthogray[is.na(orthogray)==TRUE] <- 153\n");
         fprintf(f_rmap, "    } else if ( mult != 0 ) {\n");
-        fprintf(f_rmap, "        hillshadename <- paste(wkdir, prefix, 'results/', prefix, 'ascii/', prefix, 'hillshade0000.asc', sep = '')\n");
+        fprintf(f_rmap, "        hillshadename <- paste(wkdir, prefix, 'results/', prefix, 'ascii/', prefix, 'hillshade0000', rext, sep = '')\n");
         fprintf(f_rmap, "        hillshade <- raster(hillshadename)  #raster of hillshade\n");
         fprintf(f_rmap, "    } else if ( ntimesteps <= ntimemax ) {\n");
-        fprintf(f_rmap, "        hillshadename <- paste(wkdir, prefix, 'results/', prefix, 'ascii/', prefix, 'hillshade', fill, '.asc', sep = '')\n");
+        fprintf(f_rmap, "        hillshadename <- paste(wkdir, prefix, 'results/', prefix, 'ascii/', prefix, 'hillshade', fill, rext, sep = '')\n");
         fprintf(f_rmap, "        hillshade <- raster(hillshadename)  #raster of hillshade\n");
         fprintf(f_rmap, "    }\n");
         fprintf(f_rmap, "\n");
         fprintf(f_rmap, "    # Computing vectors\n");
         fprintf(f_rmap, "    if ( mult == 0 ) { # for single model run\n");
-        fprintf(f_rmap, "        mstringrname <- paste(wkdir, prefix, 'results/', prefix, 'ascii/', prefix, 'hflow0000.asc', sep = '')\n");
+        fprintf(f_rmap, "        mstringrname <- paste(wkdir, prefix, 'results/', prefix, 'ascii/', prefix, 'hflow0000', rext, sep = '')\n");
         fprintf(f_rmap, "        startshape0 <- raster(mstringrname)  #raster of release area\n");
         fprintf(f_rmap, "        startshape <- t(as.matrix(startshape0)) # raster map for contour creation\n");
         fprintf(f_rmap, "        startshape <- startshape[, ncol(startshape):1]\n");
@@ -12649,13 +13050,13 @@ int main ( int argc, char *argv[] ) { // calling main function
         fprintf(f_rmap, "      }\n");
         fprintf(f_rmap, "    } else if ( j != 6 ) {\n");
         fprintf(f_rmap, "\n");
-        fprintf(f_rmap, "      mstringsname <- paste(wkdir, prefix, 'results/', prefix, 'ascii/', mstrings, '.asc', sep = '')\n");
+        fprintf(f_rmap, "      mstringsname <- paste(wkdir, prefix, 'results/', prefix, 'ascii/', mstrings, rext, sep = '')\n");
         fprintf(f_rmap, "      mstringsr <- raster(mstringsname)  #raster of phase 1 value\n");
         fprintf(f_rmap, "\n");
-        fprintf(f_rmap, "      mstringfname <- paste(wkdir, prefix, 'results/', prefix, 'ascii/', mstringf, '.asc', sep = '')\n");
+        fprintf(f_rmap, "      mstringfname <- paste(wkdir, prefix, 'results/', prefix, 'ascii/', mstringf, rext, sep = '')\n");
         fprintf(f_rmap, "      mstringfr <- raster(mstringfname)  #raster of phase 2 value\n");
         fprintf(f_rmap, "\n");
-        fprintf(f_rmap, "      mstringwname <- paste(wkdir, prefix, 'results/', prefix, 'ascii/', mstringw, '.asc', sep = '')\n");
+        fprintf(f_rmap, "      mstringwname <- paste(wkdir, prefix, 'results/', prefix, 'ascii/', mstringw, rext, sep = '')\n");
         fprintf(f_rmap, "      mstringwr <- raster(mstringwname)  #raster of phase 3 value\n");
         fprintf(f_rmap, "\n");        
         fprintf(f_rmap, "      a21 <- mstringtr * as.numeric(mconv2)\n");
@@ -13198,45 +13599,45 @@ int main ( int argc, char *argv[] ) { // calling main function
     #ifdef WITHGRASS
 
 
-        Segment_release(&seg_elev); // releasing segment data (if GRASS is used)
-        if ( sico.RELM == 1 ) Segment_release(&seg_hrelease);
-        if ( sico.RELV == 1 ) { Segment_release(&seg_vinx); Segment_release(&seg_viny); }
-        if ( sico.ENTR == 1 ) Segment_release(&seg_hentrmax);
-        if ( sico.MODEL == 7 && sico.RELM2 == 1 ) Segment_release(&seg_hrelease2);
-        if ( sico.MODEL == 7 && sico.RELM3 == 1 ) Segment_release(&seg_hrelease3);
-        if ( sico.MODEL == 7 && sico.RELV2 == 1 ) { Segment_release(&seg_vinx2); Segment_release(&seg_viny2); }
-        if ( sico.MODEL == 7 && sico.RELV3 == 1 ) { Segment_release(&seg_vinx3); Segment_release(&seg_viny3); }
-        if ( sico.MODEL == 7 && sico.ENTR2 == 1 ) Segment_release(&seg_hentrmax2);
-        if ( sico.MODEL == 7 && sico.ENTR3 == 1 ) Segment_release(&seg_hentrmax3);
-        if ( sico.ZONES == 1 ) Segment_release(&seg_zones);
-        if ( sico.CENTR == 1 ) Segment_release(&seg_centr);
-        if ( sico.CVSHEAR == 1 ) Segment_release(&seg_cvshear);
-        if ( sico.PHI == 1 ) Segment_release(&seg_phi);
-        if ( sico.PHI2 == 1 ) Segment_release(&seg_phi2);
-        if ( sico.PHI3 == 1 ) Segment_release(&seg_phi3);
-        if ( sico.DELTAB == 1 ) Segment_release(&seg_deltab);
-        if ( sico.TUFRI == 1 ) Segment_release(&seg_tufri);
-        if ( sico.DELTA == 1 ) Segment_release(&seg_delta);
-        if ( sico.DELTA2 == 1 ) Segment_release(&seg_delta2);
-        if ( sico.DELTA3 == 1 ) Segment_release(&seg_delta3);
-        if ( sico.NYSS == 1 ) Segment_release(&seg_nyss);
-        if ( sico.NYFS == 1 ) Segment_release(&seg_nyfs);
-        if ( sico.NYFF == 1 ) Segment_release(&seg_nyff);
-        if ( sico.AMBDRAG == 1 ) Segment_release(&seg_ambdrag);
-        if ( sico.FLUFRI == 1 ) Segment_release(&seg_flufri);
-        if ( sico.TRANSSSFS == 1 ) Segment_release(&seg_transssfs);
-        if ( sico.TRANSSSFF == 1 ) Segment_release(&seg_transssff);
-        if ( sico.TRANSFSFF == 1 ) Segment_release(&seg_transfsff);
-        if ( sico.TRELEASE == 1 ) Segment_release(&seg_trelease);
-        if ( sico.TRELSTOP == 1 ) Segment_release(&seg_trelstop);
-        if ( sico.STOPTIME == 1 ) Segment_release(&seg_stoptime);
-        if ( sico.TSLIDE == 1 ) Segment_release(&seg_tslide);
-        if ( sico.IMPACTAREA == 1 ) Segment_release(&seg_impactarea);
-        if ( sico.HDEPOSIT == 1 ) Segment_release(&seg_hdeposit);
+        fsegrelease( &seg_elev, cp_elev ); // releasing segment data (if GRASS is used)
+        if ( sico.RELM == 1 ) fsegrelease( &seg_hrelease, cp_hrelease );
+        if ( sico.RELV == 1 ) { fsegrelease( &seg_vinx, cp_vinx ); fsegrelease( &seg_viny, cp_viny ); }
+        if ( sico.ENTR == 1 ) fsegrelease( &seg_hentrmax, cp_hentrmax );
+        if ( sico.MODEL == 7 && sico.RELM2 == 1 ) fsegrelease( &seg_hrelease2, cp_hrelease2 );
+        if ( sico.MODEL == 7 && sico.RELM3 == 1 ) fsegrelease( &seg_hrelease3, cp_hrelease3 );
+        if ( sico.MODEL == 7 && sico.RELV2 == 1 ) { fsegrelease( &seg_vinx2, cp_vinx2 ); fsegrelease( &seg_viny2, cp_viny2 ); }
+        if ( sico.MODEL == 7 && sico.RELV3 == 1 ) { fsegrelease( &seg_vinx3, cp_vinx3 ); fsegrelease( &seg_viny3, cp_viny3 ); }
+        if ( sico.MODEL == 7 && sico.ENTR2 == 1 ) fsegrelease( &seg_hentrmax2, cp_hentrmax2 );
+        if ( sico.MODEL == 7 && sico.ENTR3 == 1 ) fsegrelease( &seg_hentrmax3, cp_hentrmax3 );
+        if ( sico.ZONES == 1 ) fsegrelease( &seg_zones, cp_zones );
+        if ( sico.CENTR == 1 ) fsegrelease( &seg_centr, cp_centr );
+        if ( sico.CVSHEAR == 1 ) fsegrelease( &seg_cvshear, cp_cvshear );
+        if ( sico.PHI == 1 ) fsegrelease( &seg_phi, cp_phi );
+        if ( sico.PHI2 == 1 ) fsegrelease( &seg_phi2, cp_phi2 );
+        if ( sico.PHI3 == 1 ) fsegrelease( &seg_phi3, cp_phi3 );
+        if ( sico.DELTAB == 1 ) fsegrelease( &seg_deltab, cp_deltab );
+        if ( sico.TUFRI == 1 ) fsegrelease( &seg_tufri, cp_tufri );
+        if ( sico.DELTA == 1 ) fsegrelease( &seg_delta, cp_delta );
+        if ( sico.DELTA2 == 1 ) fsegrelease( &seg_delta2, cp_delta2 );
+        if ( sico.DELTA3 == 1 ) fsegrelease( &seg_delta3, cp_delta3 );
+        if ( sico.NYSS == 1 ) fsegrelease( &seg_nyss, cp_nyss );
+        if ( sico.NYFS == 1 ) fsegrelease( &seg_nyfs, cp_nyfs );
+        if ( sico.NYFF == 1 ) fsegrelease( &seg_nyff, cp_nyff );
+        if ( sico.AMBDRAG == 1 ) fsegrelease( &seg_ambdrag, cp_ambdrag );
+        if ( sico.FLUFRI == 1 ) fsegrelease( &seg_flufri, cp_flufri );
+        if ( sico.TRANSSSFS == 1 ) fsegrelease( &seg_transssfs, cp_transssfs );
+        if ( sico.TRANSSSFF == 1 ) fsegrelease( &seg_transssff, cp_transssff );
+        if ( sico.TRANSFSFF == 1 ) fsegrelease( &seg_transfsff, cp_transfsff );
+        if ( sico.TRELEASE == 1 ) fsegrelease( &seg_trelease, cp_trelease );
+        if ( sico.TRELSTOP == 1 ) fsegrelease( &seg_trelstop, cp_trelstop );
+        if ( sico.STOPTIME == 1 ) fsegrelease( &seg_stoptime, cp_stoptime );
+        if ( sico.TSLIDE == 1 ) fsegrelease( &seg_tslide, cp_tslide );
+        if ( sico.IMPACTAREA == 1 ) fsegrelease( &seg_impactarea, cp_impactarea );
+        if ( sico.HDEPOSIT == 1 ) fsegrelease( &seg_hdeposit, cp_hdeposit );
         if ( sico.PBG == 1 ) { 
-            Segment_release(&seg_pbg1);
-            Segment_release(&seg_pbg2);
-            Segment_release(&seg_pbg3);
+            fsegrelease( &seg_pbg1, cp_pbg1 );
+            fsegrelease( &seg_pbg2, cp_pbg2 );
+            fsegrelease( &seg_pbg3, cp_pbg3 );
         }
                 
         free( v ); free_dmatrix3(outv, sico.M, sico.N); // freeing memory
@@ -13322,8 +13723,8 @@ int main ( int argc, char *argv[] ) { // calling main function
     free(hentrmaxname);
     free(zonesname);
     free(pzones);
-    if ( sico.CENTR == 1 ) { free(pcentr); } 
-    if ( sico.CVSHEAR == 1 ) { free(pcvshear); } 
+    if ( sico.CENTR == 1 ) { fcfree(pcentr); } 
+    if ( sico.CVSHEAR == 1 ) { fcfree(pcvshear); } 
     if ( sico.DELTAB == 1 ) { free(pdeltab); }
     if ( sico.MODEL == 7 ) { free(phentrmax2); free(phentrmax3); }
     free(hentrmaxname2); 
@@ -13336,7 +13737,7 @@ int main ( int argc, char *argv[] ) { // calling main function
     free(anu); // freeing arrays for stopping and initial sliding
 
     if ( sico.IMPACTAREA != 0 ) free(pimpactarea);
-    if ( sico.HDEPOSIT != 0 ) free(phdeposit); // freeing arrays for reference data
+    if ( sico.HDEPOSIT != 0 ) fcfree(phdeposit); // freeing arrays for reference data
 
     free(ppbg1); free(ppbg2); free(ppbg3);
     if ( sico.TSUNAMI != 0 ) { free(htsun); free(htsunmax); }
@@ -13348,7 +13749,7 @@ int main ( int argc, char *argv[] ) { // calling main function
     if ( sico.PHI == 1 ) { free(pphi); }  
     if ( sico.PHI2 == 1 ) { free(pphi2); } 
     if ( sico.PHI3 == 1 ) { free(pphi3); } 
-    if ( sico.FLUFRI == 1 ) { free(pflufri); } 
+    if ( sico.FLUFRI == 1 ) { fcfree(pflufri); } 
     if ( sico.DELTA == 1 ) { free(pdelta); } 
     if ( sico.DELTA2 == 1 ) { free(pdelta2); } 
     if ( sico.DELTA3 == 1 ) { free(pdelta3); } // freeing friction arrays
@@ -13356,7 +13757,7 @@ int main ( int argc, char *argv[] ) { // calling main function
     if ( sico.NYSS == 1 ) { free(pnyss); } 
     if ( sico.NYFS == 1 ) { free(pnyfs); } 
     if ( sico.NYFF == 1 ) { free(pnyff); } 
-    if ( sico.AMBDRAG == 1 ) { free(pambdrag); } // freeing viscosity and ambient drag arrays
+    if ( sico.AMBDRAG == 1 ) { fcfree(pambdrag); } // freeing viscosity and ambient drag arrays
     
     if ( adaptograph == 1 ) { free(adaptoname); free(adaada[0]); free(adaada); } // freeing adaptograph arrays
     if ( frictiograph == 1 ) { free(frictioname); free(frifri[0]); free(frifri); } // freeing frictiograph arrays
@@ -13386,6 +13787,15 @@ int main ( int argc, char *argv[] ) { // calling main function
     free( path ); free( wkdir ); free( indir );
 
 
+    #ifdef WITHGRASS
+
+
+        if ( icache != NULL ) { munmap( icache, icachesize ); icache = NULL; } // releasing cache of input raster maps (after arrays referring to it)
+
+
+    #endif
+
+
 // -- STOP --- Cleaning system ----------------------------------------------------------------------------------
 
 
@@ -56,7 +56,10 @@ def main():
     print("Routing flow.")
     print()
 
-    grass.run_command("r.avaflow.main")  # executing r.avaflow.main
+    if "XTAB" in os.environ:  # parameter file shared by all model runs
+        grass.run_command("r.avaflow.main", input1=os.environ["rtemp"] + "/param0.txt")  # executing r.avaflow.main
+    else:
+        grass.run_command("r.avaflow.main")  # executing r.avaflow.main
 
     print()
     print("Completed.")
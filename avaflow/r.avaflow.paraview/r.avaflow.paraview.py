@@ -7,7 +7,7 @@
 # AUTHOR:       Martin Mergili
 #
 # PURPOSE:      The mass flow simulation tool
-#               Script for the export of r.avaflow results to csv files
+#               Script for the export of r.avaflow results to csv or vtk files
 #               and for the generation of an import script for Paraview
 #
 # COPYRIGHT:    (c) 2022 - 2023 by the author
@@ -149,12 +149,44 @@
 #% multiple: yes
 #%end
 
+#%option
+#% key: format
+#% type: string
+#% description: Format of exported time steps (csv = point tables, vtk = binary VTK image data with time series collection)
+#% required: no
+#% multiple: no
+#% options: csv,vtk
+#%end
+
+#%option
+#% key: cores
+#% type: string
+#% description: Number of cores for parallel export of time steps
+#% required: no
+#% multiple: no
+#%end
+
 # Importing libraries
 
 import grass.script as grass
 from grass.script import core as grasscore
+import glob
+import hashlib
+import io
+import json
+import multiprocessing
+import numpy
 import os
 import subprocess
+import sys
+
+for modpath in [os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "etc", "r.avaflow"),
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "r.avaflow")]:  # shared modules (installed addon or source tree)
+    if os.path.isdir(modpath) and not modpath in sys.path: sys.path.insert(1, modpath)
+
+from avaflowio import rastfile, readraster, densify, ResultStore
+
+exportversion = 2  # version of exported time steps (exports of earlier versions are updated)
 
 # Defining error message
 
@@ -164,6 +196,256 @@ def ErrorMessage(specify):
     grass.message(" ")
     sys.exit()
 
+def readgrid(header, data, nodatavalue=0.0):  # function for coordinates of centre of lower left cell, cell size and array of output raster (no data as 0)
+
+    data = data.astype(numpy.float64)
+    data[numpy.isnan(data)] = nodatavalue  # as if(isnull(...)==1,0,...)
+    return [float(header[2][1]), float(header[3][1]), float(header[4][1])], data
+
+def storefile(ascpath):  # function for file of result store of the model run (option store of r.avaflow)
+
+    return os.path.dirname(os.path.dirname(ascpath)) + "/" + os.path.basename(ascpath) + "_files/" + os.path.basename(ascpath) + "_store.avs"
+
+def stepfile(ascpath, name, ii):  # function for file holding output raster of time step (raster map or, with flag s or option store of r.avaflow, sparse snapshot or result store)
+
+    rastname = ascpath + "_" + name + ii
+    if os.path.exists(rastname + ".bin") or os.path.exists(rastname + ".asc"): return rastfile(rastname)
+    if os.path.exists(ascpath + "_snapshot" + ii + ".spr"): return ascpath + "_snapshot" + ii + ".spr"
+    if os.path.exists(storefile(ascpath)): return storefile(ascpath)  # raster maps of time steps removed after packing
+    return rastfile(rastname)
+
+def readstep(ascpath, name, ii, nodatavalue=0.0):  # function for reading output raster of time step into array (no data as 0)
+
+    stepname = stepfile(ascpath, name, ii)
+    if stepname.endswith(".spr"): return readgrid(*densify(stepname, ascpath + "_domain.spr", name), nodatavalue)
+    if not stepname.endswith(".avs"): return readgrid(*readraster(ascpath + "_" + name + ii), nodatavalue)
+
+    rstore = ResultStore(stepname)
+    steps, data = rstore.read(name, int(ii), int(ii))
+    rstore.close()
+    if not steps: raise KeyError("time step %s of %s not in result store %s" %(ii, name, stepname))
+    return readgrid(rstore.index["header"], data[0], nodatavalue)
+
+def readmap(mapname, binname):  # function for reading raster map of the current region into array (no data as NaN)
+
+    region = grass.region()
+    grass.run_command("r.out.bin", flags="f", input=mapname, output=binname, bytes=4, null=-9999, overwrite=True)
+    data = numpy.fromfile(binname, dtype=numpy.float32).reshape(int(region["rows"]), int(region["cols"])).astype(numpy.float64)
+    os.remove(binname)
+    data[data == -9999] = numpy.nan
+    return data
+
+def hillshade(elev, cellsize):  # function for shaded relief (as r.relief with default sun position, no data at the edges)
+
+    altitude = numpy.radians(30.0)
+    azimuth = numpy.radians(270.0)
+    c = lambda di, dj: elev[1 + di:elev.shape[0] - 1 + di, 1 + dj:elev.shape[1] - 1 + dj]  # neighbouring cells
+    dx = ((c(-1, -1) + 2 * c(0, -1) + c(1, -1)) - (c(-1, 1) + 2 * c(0, 1) + c(1, 1))) / (8 * cellsize)
+    dy = ((c(1, -1) + 2 * c(1, 0) + c(1, 1)) - (c(-1, -1) + 2 * c(-1, 0) + c(-1, 1))) / (8 * cellsize)
+    slope = numpy.pi / 2 - numpy.arctan(numpy.sqrt(dx * dx + dy * dy))
+    aspect = numpy.arctan2(dy, dx)
+    shade = numpy.full(elev.shape, numpy.nan)
+    shade[1:-1, 1:-1] = numpy.maximum(0.0, 255.0 * (numpy.sin(slope) * numpy.sin(altitude) + numpy.cos(slope) * numpy.cos(altitude) * numpy.cos(azimuth - aspect)))
+    return shade
+
+def colour(flowing, cflow, alpha, dflow, reached, cmax, alphamax, dmax, ortho):  # function for colour component of flow, maximum flow height or background
+
+    return numpy.where(flowing, cflow * alpha + ortho / dflow * (1 - alpha), numpy.where(reached, cmax * alphamax + ortho / dmax * (1 - alphamax), ortho / 254.9))
+
+def writevti(vtiname, header, arrays):  # function for writing vtk image data file with arrays appended as raw binary data
+
+    nrows, ncols = arrays[0][1].shape
+    fvti = open(vtiname, "wb")
+    fvti.write(('<?xml version="1.0"?>\n<VTKFile type="ImageData" version="1.0" byte_order="LittleEndian" header_type="UInt64">\n'
+        + '  <ImageData WholeExtent="0 %i 0 %i 0 0" Origin="%.3f %.3f 0" Spacing="%.3f %.3f 1">\n' %(ncols - 1, nrows - 1, header[0], header[1], header[2], header[2])
+        + '    <Piece Extent="0 %i 0 %i 0 0">\n      <PointData>\n' %(ncols - 1, nrows - 1)).encode())
+    for k in range(0, len(arrays)):
+        fvti.write(('        <DataArray type="Float32" Name="%s" format="appended" offset="%i"/>\n' %(arrays[k][0], k * (8 + 4 * nrows * ncols))).encode())
+    fvti.write('      </PointData>\n    </Piece>\n  </ImageData>\n  <AppendedData encoding="raw">\n   _'.encode())
+    for name, data in arrays:
+        fvti.write(numpy.uint64(4 * nrows * ncols).astype("<u8").tobytes())  # size of array, followed by values (rows from south to north)
+        fvti.write(data[::-1].astype("<f4").tobytes())
+    fvti.write('\n  </AppendedData>\n</VTKFile>\n'.encode())
+    fvti.close()
+
+def readtout(paramname):  # function for reading time interval for writing output (s) from commented parameter file of simulation
+
+    tout = 1.0  # time steps counted if parameter file is not available
+    if os.path.exists(paramname):
+        fparam = open(paramname, "r")
+        for line in fparam:
+            if line.startswith("Time interval for writing output (s)\t"): tout = float(line.split("\t")[1])
+        fparam.close()
+    return tout
+
+def writepvd(pvdname, steps, tout):  # function for writing collection of vtk files of time steps as time series (time in s, as written by simulation)
+
+    fpvd = open(pvdname, "w")
+    fpvd.write('<?xml version="1.0"?>\n<VTKFile type="Collection" version="1.0">\n  <Collection>\n')
+    for i in steps: fpvd.write('    <DataSet timestep="%.2f" file="pv%04i.vti"/>\n' %(i * tout, i))
+    fpvd.write('  </Collection>\n</VTKFile>\n')
+    fpvd.close()
+
+def datakey(filenames, values):  # function for key of exported or intermediate data: size and modification time of input files, parameters
+
+    fhash = hashlib.sha256()
+    for filename in filenames:
+        if os.path.exists(filename): fhash.update(("%s %i %i\n" %(filename, os.path.getsize(filename), os.stat(filename).st_mtime_ns)).encode())
+        else: fhash.update(("%s\n" %filename).encode())
+    fhash.update(json.dumps(values).encode())
+    return fhash.hexdigest()[:16]
+
+def cachedlayer(cachename, key, compute, dtype=numpy.float32):  # function for loading intermediate layer from cache (computing and caching it if outdated, stored as dtype)
+
+    cachefile = cachename + "_" + key + ".npy"
+    if os.path.exists(cachefile): return numpy.load(cachefile)
+
+    layer = numpy.asarray(compute(), dtype=dtype)  # same values whether computed or loaded
+    for oldfile in glob.glob(cachename + "_*.npy"): os.remove(oldfile)  # outdated versions of layer
+    fcache = open(cachefile + ".tmp", "wb")
+    numpy.save(fcache, layer)
+    fcache.close()
+    os.replace(cachefile + ".tmp", cachefile)
+    return layer
+
+def removestale(outpathf, cachepath, keys, vrformat, basechange):  # function for removing exported time steps and cached layers out of range, in other format or no longer needed
+
+    for filename in glob.glob(outpathf+"pv*.csv") + glob.glob(outpathf+"pv*.vti"):
+
+        name, ext = os.path.splitext(os.path.basename(filename))
+        if name[2:] not in keys or ext != {"csv": ".csv", "vtk": ".vti"}[vrformat]: os.remove(filename)
+
+    for filename in glob.glob(cachepath+"pv*_*.npy"):  # hillshade of time steps only with change of basal topography
+
+        name = os.path.basename(filename)
+        if name[2:6] not in keys or (name[6:].startswith("_shade_") and not basechange): os.remove(filename)
+
+def writemanifest(manifestpath, manifest):  # function for writing manifest of exported time steps (replacing the file at once)
+
+    fmanifest = open(manifestpath + ".tmp", "w")
+    json.dump(manifest, fmanifest, indent=1)
+    fmanifest.close()
+    os.replace(manifestpath + ".tmp", manifestpath)
+
+def initexport(settings):  # function for sharing input arrays and parameters with the processes exporting time steps
+
+    global export
+    export = settings
+
+def exportstep(i):  # function for exporting one time step to csv or vtk file (all processing in memory)
+
+    ascpath, outpathf, header, xcoord, ycoord, elev0 = export["ascpath"], export["outpathf"], export["header"], export["xcoord"], export["ycoord"], export["elev0"]
+    basechange, glacier, layers, tsunami, ortho, phases, tmin = export["basechange"], export["glacier"], export["layers"], export["tsunami"], export["ortho"], export["phases"], export["tmin"]
+    min1, ref1, htsun, rgb, vrformat = export["min1"], export["ref1"], export["htsun"], export["rgb"], export["vrformat"]
+    cachepath, keys, shade = export["cachepath"], export["keys"], export["shade"]
+    hflow0, ored, ogreen, oblue = export["hflow0"], export["ored"], export["ogreen"], export["oblue"]
+    numpy.seterr(divide="ignore", invalid="ignore")  # divisions in cells not selected by numpy.where
+
+    if i<10: ii="000"+str(i)
+    elif i<100: ii="00"+str(i)
+    elif i<1000: ii="0"+str(i)
+    else: ii=str(i)
+    keys = keys[ii]
+
+    # Loading and processing flow height and basechange data
+
+    hflow = readstep(ascpath, "hflow", ii)[1]
+    hmax = readstep(ascpath, "hflow_max", ii)[1]
+
+    if basechange and i>tmin: elev = numpy.trunc(elev0 + readstep(ascpath, "basechange", ii)[1])  # as int(100*elev)/100 with integer division
+    else: elev = numpy.trunc(elev0)
+
+    if phases==3:
+
+        hflow1 = readstep(ascpath, "hflow1", ii)[1]
+        hflow2 = readstep(ascpath, "hflow2", ii)[1]
+        hflow3 = readstep(ascpath, "hflow3", ii)[1]
+        hs = elev + hflow1 + hflow2
+
+    else: hs = elev + hflow
+
+    h = elev + hflow
+
+    if not ortho:
+
+        # Creating hillshade as alternative background to orthophoto (once for all time steps, per time step with change of basal topography)
+
+        if shade is None: shade = cachedlayer(cachepath+"pv"+ii+"_shade", keys["shade"], lambda: hillshade(elev, header[2]))
+        ored = ogreen = oblue = (shade.astype(numpy.float64) + 255) / 2
+
+    flowing = hflow >= min1
+    reached = hmax >= min1
+    alpha, alphamax = cachedlayer(cachepath+"pv"+ii+"_alpha", keys["alpha"], lambda: numpy.round(255 * numpy.stack([
+        numpy.where(flowing, numpy.power(numpy.minimum(1, hflow / ref1), float(rgb[3])), 0),
+        numpy.where(reached, numpy.minimum(0.35, numpy.power(numpy.minimum(1, hmax / ref1), float(rgb[3]))), 0)])), numpy.uint8) / 255.0  # stored as 8 bit
+
+    if layers and phases==3:
+
+        # Setting colours for display (layer model)
+
+        red = colour(flowing, numpy.where((hflow2 > min1) | (hflow3 >= min1), 0.25, 0.5), alpha, 255.1, reached, 0.7, alphamax, 254.9, ored)
+        green = colour(flowing, numpy.where((hflow3 >= min1) | (hflow2 < min1), 0.25, 0.5), alpha, 255.1, reached, 0.3, alphamax, 254.9, ogreen)
+        blue = colour(flowing, numpy.where(hflow3 >= min1, 0.5, 0.25), alpha, 254.9, reached, 0.0, alphamax, 255.1, oblue)
+
+    elif phases==3:
+
+        # Setting colours for display (3-phase model)
+
+        if tsunami:
+
+            htsunami = numpy.where(hflow3 > min1, hflow + elev - hflow0 - elev0, 0)
+            corrtsun = numpy.where(hflow3 > min1, 0.5 * (hflow + elev - hflow0 - elev0) / float(htsun), 0)
+            addtsun = 0.5
+
+        else:
+
+            corrtsun = 0
+            addtsun = 0.0
+
+        red = colour(flowing, numpy.clip(addtsun + hflow1 / hflow + corrtsun, 0.0, 1.0), alpha, 255.1, reached, 0.7, alphamax, 254.9, ored)
+        green = colour(flowing, numpy.clip(addtsun + 1.0 * hflow2 / hflow + corrtsun, 0.0, 1.0), alpha, 255.1, reached, 0.3, alphamax, 254.9, ogreen)
+        blue = colour(flowing, hflow3 / hflow, alpha, 254.9, reached, 0.0, alphamax, 255.1, oblue)
+
+    else:
+
+        # Setting colours for display (1-phase model)
+
+        if glacier:
+
+            colfactr=1.00
+            colfactg=1.00
+            colfactb=1.00
+
+        else:
+
+            colfactr=float(rgb[0])
+            colfactg=float(rgb[1])
+            colfactb=float(rgb[2])
+
+        red = colour(flowing, colfactr, alpha, 254.9, reached, 0.7, alphamax, 255.1, ored)
+        green = colour(flowing, colfactg, alpha, 254.9, reached, 0.3, alphamax, 255.1, ogreen)
+        blue = colour(flowing, colfactb, alpha, 254.9, reached, 0.0, alphamax, 255.1, oblue)
+
+    # Writing arrays to csv or vtk file
+
+    if tsunami: hdisp = htsunami
+    else: hdisp = hflow
+    hdisp = numpy.where(hdisp == 0, numpy.nan, hdisp)
+
+    if vrformat == "vtk":
+
+        writevti(outpathf+"pv"+ii+".vti", header, [["z", h], ["h", hdisp], ["s", hs], ["r", red], ["g", green], ["b", blue]])
+        return
+
+    ftable = io.StringIO()
+    numpy.savetxt(ftable, numpy.column_stack([xcoord, ycoord, h.ravel(), numpy.round(hdisp, 2).ravel(), numpy.round(hs, 2).ravel(), 
+        numpy.round(red, 2).ravel(), numpy.round(green, 2).ravel(), numpy.round(blue, 2).ravel()]), 
+        fmt=["%.2f", "%.2f", "%.3f", "%.2f", "%.2f", "%.2f", "%.2f", "%.2f"], delimiter=",", header="x,y,z,h,s,r,g,b", comments="")
+
+    ffinal=open(outpathf+"pv"+ii+".csv", "w")
+    ffinal.write(ftable.getvalue().replace("nan", "NaN"))
+    ffinal.close()
+
 def main():
 
     # Setting flags and parameters
@@ -184,6 +466,8 @@ def main():
     contoursh = options["contoursh"]
     contoursz = options["contoursz"]
     rgb = options["rgb"]
+    vrformat = options["format"]
+    cores = options["cores"]
 
     # Managing missing input
 
@@ -198,6 +482,8 @@ def main():
     if not contoursh: contoursh = "1,100,2"
     if not contoursz: contoursz = "-11000,9000,100"
     if not rgb: rgb = "0.60,0.25,0.15,0.2"
+    if not vrformat: vrformat = "csv"
+    if not cores: cores = "1"
 
     # Managing parameter lists
 
@@ -215,6 +501,9 @@ def main():
     rgb = list(map(str, rgb.split(",")))
     if not len(rgb) == 4: ErrorMessage("number of RGB components")
 
+    try: cores = int(cores)
+    except ValueError: ErrorMessage("number of cores")
+
     tmin = int(time[0])
     tmax = int(time[1])
 
@@ -224,12 +513,19 @@ def main():
     ascpath = prefix+"_results/"+prefix+"_ascii/"+prefix
     outpathf0=prefix+"_paraview/"
     outpathf=prefix+"_paraview/data/"
+    cachepath=prefix+"_paraview/cache/"
+    manifestpath=prefix+"_paraview/manifest.json"
 
-    os.system("rm -rf " + outpathf0)
-    os.system("mkdir " + outpathf0)
-    os.system("mkdir " + outpathf)
+    for path in [outpathf0, outpathf, cachepath]:  # existing export is updated (time steps which are up to date are kept)
+        if not os.path.exists(path): os.system("mkdir " + path)
 
-    grass.run_command("r.in.gdal", flags="o", overwrite=True, input=ascpath+"_elev.asc", output=prefix+"_elev0")
+    manifest = {}
+    if os.path.exists(manifestpath):
+        fmanifest = open(manifestpath, "r")
+        manifest = json.load(fmanifest)
+        fmanifest.close()
+
+    grass.run_command("r.in.gdal", flags="o", overwrite=True, input=rastfile(ascpath+"_elev"), output=prefix+"_elev0")
     grass.run_command("g.region", flags="s", rast=prefix+"_elev0")
     grass.mapcalc('"%s_elev0" = if(isnull("%s_elev0")==1,0,"%s_elev0")' %(prefix, prefix, prefix), overwrite=True)
 
@@ -244,242 +540,88 @@ def main():
 
     # Processing orthophoto
 
+    ored = ogreen = oblue = None
+    orthokey = None
     if ortho:
 
-        grass.run_command("r.in.gdal", flags="o", overwrite=True, input=ortho, output="ortho0")
-        grass.run_command("r.composite", overwrite=True, red="ortho0.red", green="ortho0.green", blue="ortho0.blue", output="ortho")
+        def readortho():  # importing orthophoto and reading colour bands in current region
+
+            grass.run_command("r.in.gdal", flags="o", overwrite=True, input=ortho, output="ortho0")
+            grass.run_command("r.composite", overwrite=True, red="ortho0.red", green="ortho0.green", blue="ortho0.blue", output="ortho")
+            return numpy.stack([readmap("ortho0.red", outpathf + "xortho.bin"), readmap("ortho0.green", outpathf + "xortho.bin"), 
+                readmap("ortho0.blue", outpathf + "xortho.bin")])
+
+        orthokey = datakey([ortho, rastfile(ascpath+"_elev")], ["ortho"])
+        ored, ogreen, oblue = cachedlayer(cachepath+"ortho", orthokey, readortho).astype(numpy.float64)
+
+    # Loading elevation and initial flow height arrays
+
+    header, elev0 = readgrid(*readraster(ascpath+"_elev"))
+    nrows, ncols = elev0.shape
+    xcoord = numpy.tile(header[0] + header[2] * numpy.arange(0, ncols), nrows)  # coordinates of cell centres
+    ycoord = numpy.repeat(header[1] + header[2] * numpy.arange(nrows - 1, -1, -1), ncols)
 
-    # Loading initial flow height raster for tsunami mode
+    shade = None
+    if not ortho and not basechange:
 
+        shade = cachedlayer(cachepath+"shade", datakey([rastfile(ascpath+"_elev")], ["shade"]), lambda: hillshade(numpy.trunc(elev0), header[2]))  # as for all time steps
+
+    hflow0 = None
     if tsunami:
 
-        grass.run_command("r.in.gdal", flags="o", overwrite=True, input=ascpath+"_hflow0000.asc", output=prefix+"_hflow0")
-    
-    # Starting loop over all time steps
-    
-    for i in range( tmin, tmax+1):
+        hflow0 = readstep(ascpath, "hflow", "0000", numpy.nan)[1]  # no data of initial flow height not replaced
 
-        if i<10: ii="000"+str(i)
-        elif i<100: ii="00"+str(i)
-        else: ii="0"+str(i)
+    # Identifying time steps to be exported (missing or outdated)
 
-        # Importing and processing flow height and basechange data
+    keys = {}
+    stale = []
+    for i in range(tmin, tmax+1):
 
-        grass.run_command("r.in.gdal", flags="o", overwrite=True, input=ascpath+"_hflow"+ii+".asc", output=prefix+"_hflow")
-        grass.run_command("r.in.gdal", flags="o", overwrite=True, input=ascpath+"_hflow_max"+ii+".asc", output=prefix+"_hmax")
-    
-        grass.mapcalc('"%s_hflow" = if(isnull("%s_hflow")==1,0,"%s_hflow")' %(prefix, prefix, prefix), overwrite=True)
-        grass.mapcalc('"%s_hmax" = if(isnull("%s_hmax")==1,0,"%s_hmax")' %(prefix, prefix, prefix), overwrite=True)
-    
-        if basechange and i>tmin:
-    
-            grass.run_command("r.in.gdal", flags="o", overwrite=True, input=ascpath+"_basechange"+ii+".asc", output=prefix+"_basechange")
-            grass.mapcalc('"%s_basechange" = if(isnull("%s_basechange")==1,0,"%s_basechange")' %(prefix, prefix, prefix), overwrite=True)
-            grass.mapcalc('"%s_elev" = int(100*("%s_elev0"+"%s_basechange"))/100' %(prefix, prefix, prefix), overwrite=True)
-        
-        else:
-    
-            grass.mapcalc('"%s_elev" = int(100*"%s_elev0")/100' %(prefix, prefix), overwrite=True)            
-    
-        if phases==3:
-    
-            grass.run_command("r.in.gdal", flags="o", overwrite=True, input=ascpath+"_hflow1"+ii+".asc", output=prefix+"_hflow1")
-            grass.run_command("r.in.gdal", flags="o", overwrite=True, input=ascpath+"_hflow2"+ii+".asc", output=prefix+"_hflow2")
-            grass.run_command("r.in.gdal", flags="o", overwrite=True, input=ascpath+"_hflow3"+ii+".asc", output=prefix+"_hflow3")
+        ii = "%04i" %i
+        hfiles = [stepfile(ascpath, "hflow", ii), rastfile(ascpath+"_elev")]
+        if basechange and i>tmin: hfiles.append(stepfile(ascpath, "basechange", ii))
+        efiles = [rastfile(ascpath+"_elev")] + hfiles[2:]  # topography of time step
+        afiles = [stepfile(ascpath, "hflow", ii), stepfile(ascpath, "hflow_max", ii)]
+        sfiles = hfiles + afiles
+        if phases==3: sfiles += [stepfile(ascpath, "hflow"+str(k), ii) for k in range(1, 4)]
+        if tsunami: sfiles.append(stepfile(ascpath, "hflow", "0000"))
 
-            grass.mapcalc('"%s_hflow1" = if(isnull("%s_hflow1")==1,0,"%s_hflow1")' %(prefix, prefix, prefix), overwrite=True)
-            grass.mapcalc('"%s_hflow2" = if(isnull("%s_hflow2")==1,0,"%s_hflow2")' %(prefix, prefix, prefix), overwrite=True)
-            grass.mapcalc('"%s_hflow3" = if(isnull("%s_hflow3")==1,0,"%s_hflow3")' %(prefix, prefix, prefix), overwrite=True)
-            grass.mapcalc('"%s_hs" = "%s_elev" + "%s_hflow1"+"%s_hflow2"' %(prefix, prefix, prefix, prefix), overwrite=True)
+        keys[ii] = {
+            "shade": datakey(efiles, ["shade", basechange and i>tmin]),
+            "alpha": datakey(afiles, ["alpha", float(min1), float(ref1), rgb[3]]),
+            "output": datakey(sfiles, [exportversion, basechange and i>tmin, glacier, layers, tsunami, phases, float(min1), float(ref1), htsun, rgb, vrformat, orthokey])}
 
-        else:
-        
-            grass.mapcalc('"%s_hs" = "%s_elev" + "%s_hflow"' %(prefix, prefix, prefix), overwrite=True)
-      
-        grass.mapcalc('"%s_h" = "%s_elev" + "%s_hflow"' %(prefix, prefix, prefix), overwrite=True)
-        grass.mapcalc('"%s_hflow" = "%s_hflow"' %(prefix, prefix), overwrite=True)
+        if manifest.get(ii) != keys[ii]["output"] or not os.path.exists(outpathf+"pv"+ii+{"csv": ".csv", "vtk": ".vti"}[vrformat]): stale.append(i)
 
-        if not ortho:
+    removestale(outpathf, cachepath, keys, vrformat, basechange)  # removing time steps and cached layers out of range or in other format
 
-            # Creating and processing hillshade raster as alternative background to orthophoto
+    manifest = {ii: manifest[ii] for ii in keys if ii in manifest and not int(ii) in stale}
+    writemanifest(manifestpath, manifest)  # outdated time steps invalidated before exporting
 
-            grass.run_command("r.relief", overwrite=True, input=prefix+"_h", output=prefix+"_hillshade")
-            grass.mapcalc('"ortho0.red" = ("%s_hillshade"+255)/2' %prefix, overwrite=True)
-            grass.mapcalc('"ortho0.green" = ("%s_hillshade"+255)/2' %prefix, overwrite=True)
-            grass.mapcalc('"ortho0.blue" = ("%s_hillshade"+255)/2' %prefix, overwrite=True)
+    # Exporting missing or outdated time steps
 
-        grass.mapcalc('"%s_alpha" = if("%s_hflow">=%s,pow(min(1,"%s_hflow"/%s),%s),0)' %(prefix, prefix, min1, prefix, ref1, rgb[3]), overwrite=True)
-        grass.mapcalc('"%s_alphamax" = if("%s_hmax">=%s,min(0.35,pow(min(1,"%s_hmax"/%s),%s)),0)' %(prefix, prefix, min1, prefix, ref1, rgb[3]), overwrite=True)
-        
-        if layers and phases==3:
+    settings = {"ascpath": ascpath, "outpathf": outpathf, "header": header, "xcoord": xcoord, "ycoord": ycoord, "elev0": elev0, "basechange": basechange, 
+        "glacier": glacier, "layers": layers, "tsunami": tsunami, "ortho": ortho, "phases": phases, "tmin": tmin, "min1": float(min1), "ref1": float(ref1), 
+        "htsun": htsun, "rgb": rgb, "vrformat": vrformat, "hflow0": hflow0, "ored": ored, "ogreen": ogreen, "oblue": oblue, 
+        "cachepath": cachepath, "keys": keys, "shade": shade}
 
-            # Setting colours for display (layer model)
+    if cores > 1 and len(stale) > 1:  # time steps processed in parallel by independent processes
 
-            grass.mapcalc('"%s_red" = if("%s_hflow">=%s,if("%s_hflow2">%s||"%s_hflow3">=%s,0.25,0.5)*"%s_alpha"+ortho0.red/255.1*(1-"%s_alpha"),\
-                if("%s_hmax">=%s,0.7*"%s_alphamax"+ortho0.red/254.9*(1-"%s_alphamax"),ortho0.red/254.9))' 
-                %(prefix, prefix, min1, prefix, min1, prefix, min1, prefix, prefix, prefix, min1, prefix, prefix), overwrite=True)
-            grass.mapcalc('"%s_green" = if("%s_hflow">=%s,if("%s_hflow3">=%s||"%s_hflow2"<%s,0.25,0.5)*"%s_alpha"+ortho0.green/255.1*(1-"%s_alpha"),\
-                if("%s_hmax">=%s,0.3*"%s_alphamax"+ortho0.green/254.9*(1-"%s_alphamax"),ortho0.green/254.9))' 
-                %(prefix, prefix, min1, prefix, min1, prefix, min1, prefix, prefix, prefix, min1, prefix, prefix), overwrite=True)
-            grass.mapcalc('"%s_blue" = if("%s_hflow">=%s,if("%s_hflow3">=%s,0.5,0.25)*"%s_alpha"+ortho0.blue/254.9*(1-"%s_alpha"),\
-                if("%s_hmax">=%s,0.0*"%s_alphamax"+ortho0.blue/255.1*(1-"%s_alphamax"),ortho0.blue/254.9))' 
-                %(prefix, prefix, min1, prefix, min1, prefix, prefix, prefix, min1, prefix, prefix), overwrite=True)
+        pool = multiprocessing.Pool(min(cores, len(stale)), initexport, (settings,))
+        pool.map(exportstep, stale)
+        pool.close()
+        pool.join()
 
-        elif phases==3:
-    
-            # Setting colours for display (3-phase model)
-    
-            if tsunami:
+    else:
 
-                grass.mapcalc('"%s_htsun" = if("%s_hflow3">%s,"%s_hflow"+"%s_elev"-"%s_hflow0"-"%s_elev0",0)' %(prefix, prefix, min1, prefix, prefix, prefix, prefix), overwrite=True)        
-                grass.mapcalc('"%s_corrtsun" = if("%s_hflow3">%s,0.5*("%s_hflow"+"%s_elev"-"%s_hflow0"-"%s_elev0")/%s,0)' %(prefix, prefix, min1, prefix, prefix, prefix, prefix, htsun), overwrite=True)
-                addtsun= "0.5"
+        initexport(settings)
+        for i in stale: exportstep(i)
 
-            else:
-        
-                grass.mapcalc('"%s_corrtsun" = 0' %prefix, overwrite=True)
-                addtsun = "0.0"
-
-            grass.mapcalc('"%s_red" = if("%s_hflow">=%s,max(0.0,min(1.0,(%s+"%s_hflow1"/"%s_hflow"+"%s_corrtsun")))*"%s_alpha"+ortho0.red/255.1*(1-"%s_alpha"),if("%s_hmax">=%s,\
-                0.7*"%s_alphamax"+ortho0.red/254.9*(1-"%s_alphamax"),ortho0.red/254.9))' 
-                %(prefix, prefix, min1, addtsun, prefix, prefix, prefix, prefix, prefix, prefix, min1, prefix, prefix), overwrite=True)
-            grass.mapcalc('"%s_green" = if("%s_hflow">=%s,max(0.0,min(1.0,(%s+1.0*"%s_hflow2"/"%s_hflow"+"%s_corrtsun")))*"%s_alpha"+ortho0.green/255.1*(1-"%s_alpha"),\
-                if("%s_hmax">=%s,0.3*"%s_alphamax"+ortho0.green/254.9*(1-"%s_alphamax"),ortho0.green/254.9))' 
-                %(prefix, prefix, min1, addtsun, prefix, prefix, prefix, prefix, prefix, prefix, min1, prefix, prefix), overwrite=True)
-            grass.mapcalc('"%s_blue" = if("%s_hflow">=%s,"%s_hflow3"/"%s_hflow"*"%s_alpha"+ortho0.blue/254.9*(1-"%s_alpha"),if("%s_hmax">=%s,\
-            0.0*"%s_alphamax"+ortho0.blue/255.1*(1-"%s_alphamax"),ortho0.blue/254.9))' 
-                %(prefix, prefix, min1, prefix, prefix, prefix, prefix, prefix, min1, prefix, prefix), overwrite=True)
-    
-        else:
-    
-            # Setting colours for display (1-phase model)
-    
-            if glacier:
-            
-                colfactr="1.00"
-                colfactg="1.00"
-                colfactb="1.00"
-                
-            else:
-            
-                colfactr=rgb[0]
-                colfactg=rgb[1]
-                colfactb=rgb[2]
-                    
-            grass.mapcalc('"%s_red" = if("%s_hflow">=%s,%s*"%s_alpha"+ortho0.red/254.9*(1-"%s_alpha"),if("%s_hmax">=%s,0.7*"%s_alphamax"+ortho0.red/255.1*(1-"%s_alphamax"),ortho0.red/254.9))' 
-                %(prefix, prefix, min1, colfactr, prefix, prefix, prefix, min1, prefix, prefix), overwrite=True)
-            grass.mapcalc('"%s_green" = if("%s_hflow">=%s,%s*"%s_alpha"+ortho0.green/254.9*(1-"%s_alpha"),if("%s_hmax">=%s,0.3*"%s_alphamax"+ortho0.green/255.1*(1-"%s_alphamax"),ortho0.green/254.9))' 
-                %(prefix, prefix, min1, colfactg, prefix, prefix, prefix, min1, prefix, prefix), overwrite=True)
-            grass.mapcalc('"%s_blue" = if("%s_hflow">=%s,%s*"%s_alpha"+ortho0.blue/254.9*(1-"%s_alpha"),if("%s_hmax">=%s,0.0*"%s_alphamax"+ortho0.blue/255.1*(1-"%s_alphamax"),ortho0.blue/254.9))' 
-                %(prefix, prefix, min1, colfactb, prefix, prefix, prefix, min1, prefix, prefix), overwrite=True)    
-
-        # Importing rasters to csv file
-
-        grass.run_command("r.out.gdal", overwrite=True, input=prefix+"_h", output=outpathf+"xh.csv", format="XYZ")
-        grass.run_command("r.out.gdal", overwrite=True, input=prefix+"_hs", output=outpathf+"xs.csv", format="XYZ")
-        
-        if tsunami: grass.run_command("r.out.gdal", overwrite=True, input=prefix+"_htsun", output=outpathf+"xf.csv", format="XYZ")
-        else: grass.run_command("r.out.gdal", overwrite=True, input=prefix+"_hflow", output=outpathf+"xf.csv", format="XYZ")
-        
-        grass.run_command("r.out.gdal", overwrite=True, input=prefix+"_red", output=outpathf+"xr.csv", format="XYZ")
-        grass.run_command("r.out.gdal", overwrite=True, input=prefix+"_green", output=outpathf+"xg.csv", format="XYZ")
-        grass.run_command("r.out.gdal", overwrite=True, input=prefix+"_blue", output=outpathf+"xb.csv", format="XYZ")
-
-        fxbody=open(outpathf+"xh.csv", "r")
-        fxsody=open(outpathf+"xs.csv", "r")
-        fxfody=open(outpathf+"xf.csv", "r")
-        fxrody=open(outpathf+"xr.csv", "r")
-        fxgody=open(outpathf+"xg.csv", "r")
-        fxcody=open(outpathf+"xb.csv", "r")
-    
-        fbody=open(outpathf+"xxh.csv", "w")
-        fsody=open(outpathf+"xxs.csv", "w")
-        ffody=open(outpathf+"xxf.csv", "w")
-        frody=open(outpathf+"xxr.csv", "w")
-        fgody=open(outpathf+"xxg.csv", "w")
-        fcody=open(outpathf+"xxb.csv", "w")
-
-        txbody=fxbody.readlines()
-        txbody.sort()
-        for j in range(len(txbody)):
-            fbody.write(txbody[j])
-
-        txsody=fxsody.readlines()
-        txsody.sort()
-        for j in range(len(txsody)):
-            fsody.write(txsody[j])
-
-        txfody=fxfody.readlines()
-        txfody.sort()
-        for j in range(len(txfody)):
-            ffody.write(txfody[j])
-
-        txrody=fxrody.readlines()
-        txrody.sort()
-        for j in range(len(txrody)):
-            frody.write(txrody[j])
-
-        txgody=fxgody.readlines()
-        txgody.sort()
-        for j in range(len(txgody)):
-            fgody.write(txgody[j])
-
-        txcody=fxcody.readlines()
-        txcody.sort()
-        for j in range(len(txcody)):
-            fcody.write(txcody[j])
-
-        fbody.close()
-        fsody.close()
-        ffody.close()
-        frody.close()
-        fgody.close()
-        fcody.close()
-        fxbody.close()
-        fxfody.close()
-        fxrody.close()
-        fxgody.close()
-        fxcody.close()
-
-        fbody=open(outpathf+"xxh.csv", "r")
-        fsody=open(outpathf+"xxs.csv", "r")
-        ffody=open(outpathf+"xxf.csv", "r")
-        frody=open(outpathf+"xxr.csv", "r")
-        fgody=open(outpathf+"xxg.csv", "r")
-        fcody=open(outpathf+"xxb.csv", "r")
-        ffinal=open(outpathf+"pv"+ii+".csv", "w")
-
-        tfinal="x,y,z,h,s,r,g,b\n" 
-    
-        tbody=fbody.readlines()
-    
-        for j in range(len(tbody)):
-            tbody[j]=tbody[j].replace("\n","")
-            tsody=fsody.readline().replace("\n","")
-            tsody = tsody.split(" ")
-            tfody=ffody.readline().replace("\n","")
-            tfody = tfody.split(" ")
-            trody=frody.readline().replace("\n","")
-            trody = trody.split(" ")
-            tgody=fgody.readline().replace("\n","")
-            tgody = tgody.split(" ")
-            tcody=fcody.readline().replace("\n","")
-            tcody = tcody.split(" ")
-            if tfody[2] == "0": tfody[2] = "NaN"
-            tbody[j] = ( tbody[j] + "," + str(round(float(tfody[2]),2)) + "," + str(round(float(tsody[2]),2)) + "," + str(round(float(trody[2]),2)) + "," 
-                + str(round(float(tgody[2]),2)) + "," + str(round(float(tcody[2]),2)))
-            tbody[j] = tbody[j].replace("65535","NaN").replace("-nan","NaN").replace(" ",",") + "\n"
-            tfinal = tfinal + tbody[j]
-            
-        print(tfinal, file=ffinal)
-        
-        fbody.close()
-        fsody.close()
-        ffody.close()
-        frody.close()
-        fgody.close()
-        fcody.close()
-        ffinal.close()
+    writemanifest(manifestpath, {ii: keys[ii]["output"] for ii in keys})
+
+    if vrformat == "vtk":
+
+        writepvd(outpathf+"pv.pvd", range(tmin, tmax+1), readtout(prefix+"_results/"+prefix+"_files/"+prefix+"_paramcomm.txt"))
 
     # Cleaning system
 
@@ -514,9 +656,13 @@ def main():
     timport = timport + "if os.path.exists('contoursh'): shutil.rmtree('contoursh')" + "\n"
     timport = timport + "if os.path.exists('contoursz'): shutil.rmtree('contoursz')" + "\n"
     timport = timport + "\n"
-    timport = timport + "intab = paraview.simple.CSVReader(FileName=glob.glob('data/pv*.csv'))" + "\n"
-    timport = timport + "points = paraview.simple.TableToPoints(intab, XColumn='x', YColumn='y', ZColumn='z', KeepAllDataArrays=True)" + "\n"
-    timport = timport + "surface = paraview.simple.Delaunay2D(points)" + "\n"
+    if vrformat == "vtk":
+        timport = timport + "inimg = paraview.simple.PVDReader(FileName='data/pv.pvd')" + "\n"
+        timport = timport + "surface = paraview.simple.WarpByScalar(Input=inimg, Scalars=['POINTS', 'z'])" + "\n"
+    else:
+        timport = timport + "intab = paraview.simple.CSVReader(FileName=glob.glob('data/pv*.csv'))" + "\n"
+        timport = timport + "points = paraview.simple.TableToPoints(intab, XColumn='x', YColumn='y', ZColumn='z', KeepAllDataArrays=True)" + "\n"
+        timport = timport + "surface = paraview.simple.Delaunay2D(points)" + "\n"
     timport = timport + "surfcalc = paraview.simple.Calculator(Input=surface, ResultArrayName='rgb', Function='r * iHat + g * jHat + b * kHat')" + "\n"
     timport = timport + "contoursh = paraview.simple.Contour(Input=surface, ContourBy='h', Isosurfaces=hcont)" + "\n"
     if tsunami:
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+##############################################################################
+#
+# MODULE:       r.avaflow.worker.py
+#
+# AUTHOR:       Martin Mergili
+# CONTRIBUTORS: Massimiliano Alvioli and Ivan Marchesini
+#
+# PURPOSE:      The simulation model for avalanche and debris flows
+#               Script for distributed processing of multiple model runs
+#
+# COPYRIGHT:    (c) 2013 - 2023 by the author
+#               (c) 2020 - 2023 by the University of Graz
+#               (c) 2013 - 2021 by the BOKU University, Vienna
+#               (c) 2015 - 2020 by the University of Vienna
+#               (c) 1999 - 2023 by the GRASS Development Team
+#
+#               This program is free software under the GNU General Public
+#               License (>=v2). Read the file COPYING that comes with GRASS
+#               for details.
+#
+##############################################################################
+
+#%module
+#% description: The mass flow simulation tool: worker for distributed processing
+#% keywords: Raster
+#% keywords: Landslide
+#% keywords: Numerical simulation
+#%end
+
+#%option
+#% key: queue
+#% type: string
+#% description: Path to queue directory shared with r.avaflow
+#% required: yes
+#% multiple: no
+#%end
+
+#%option
+#% key: heartbeat
+#% type: string
+#% description: Interval for signalling activity to r.avaflow (s), at most a quarter of the heartbeat timeout of the queue (default: a twelfth)
+#% required: no
+#% multiple: no
+#%end
+
+import grass.script as grass  # importing libraries
+import os
+import socket
+import sys
+
+for modpath in [os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "etc", "r.avaflow"),
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "r.avaflow")]:  # shared modules (installed addon or source tree)
+    if os.path.isdir(modpath) and not modpath in sys.path:
+        sys.path.insert(1, modpath)
+
+from avaflowexec import readtimeout, work
+
+
+def ErrorMessage(specify):  # function for error message:
+    grass.message(" ")
+    grass.error("Please revise the " + specify + ".")
+    grass.message(" ")
+    sys.exit()
+
+
+def main():
+
+    queuepath = options["queue"]  # path to queue directory
+    heartbeat = options["heartbeat"]  # interval for heartbeat
+
+    worker = socket.gethostname() + ":" + str(os.getpid())  # name of worker
+
+    print()
+    print("Worker %s waiting for model runs." % worker)
+    print()
+
+    timeout = readtimeout(queuepath)  # time without heartbeat after which r.avaflow reassigns a model run (s)
+
+    if not heartbeat:
+        heartbeat = str(timeout / 12)
+    try:
+        heartbeat = float(heartbeat)
+    except ValueError:
+        ErrorMessage("heartbeat interval")
+    if heartbeat <= 0 or heartbeat > timeout / 4:
+        ErrorMessage("heartbeat interval (at most %.1f s, a quarter of the heartbeat timeout of the queue)" % (timeout / 4))
+
+    try:
+        work(queuepath, worker, heartbeat)
+    except RuntimeError as err:  # files of r.avaflow not available on this computer
+        ErrorMessage("location of the worker (files of r.avaflow %s, the GRASS database and the working directory of r.avaflow have to be shared under the same paths)" % err)
+
+    print()
+    print("Completed.")
+    print()
+
+
+if __name__ == "__main__":
+    options, flags = grass.parser()
+    main()
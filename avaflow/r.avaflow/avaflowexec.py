@@ -0,0 +1,515 @@
+#!/usr/bin/env python3
+
+#############################################################################
+#
+# MODULE:       avaflowexec.py
+#
+# AUTHORS:      Martin Mergili and Shiva P. Pudasaini
+#
+# PURPOSE:      The mass flow simulation tool
+#               Execution of model runs and post-processing jobs as child
+#               processes (shared by r.avaflow and r.avaflow.worker)
+#
+# COPYRIGHT:    (c) 2013 - 2023 by the authors
+#               (c) 2020 - 2023 by the University of Graz
+#               (c) 2000 - 2023 by the GRASS Development Team
+#
+#               This program is free software under the GNU General Public
+#               License (>=v2). Read the file COPYING that comes with GRASS
+#               for details.
+#
+#############################################################################
+
+# Importing libraries
+
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+import time
+import types
+
+
+# Defining functions and classes for child processes
+
+def exitcode(wstatus):  # function for exit status of reaped child process (negative signal number if terminated by signal, as subprocess)
+
+    if os.WIFSIGNALED(wstatus):
+        return -os.WTERMSIG(wstatus)
+    return os.WEXITSTATUS(wstatus)
+
+
+class Progress:  # class for following the progress output of a model run (termination by watchdog):
+
+    def __init__(self, outname, watchdog, tstop=None):
+        self.outname = outname  # file with output of model run
+        self.watchdog = watchdog  # maximum wall time (s), minimum simulated time per wall time, interval of checks (s), number of consecutive slow checks
+        self.tstop = tstop  # simulated time at which model run stops (s, None = unknown)
+        self.tstart = time.time()  # start of model run
+        self.fpos = 0  # position in output already read
+        self.tsum = None  # latest simulated time (s)
+        self.nsum = None  # latest number of time steps
+        self.last = [None, None]  # simulated time and number of time steps at last check
+        self.nslow = 0  # number of consecutive checks with simulated time progressing too slowly
+        self.finished = False  # simulation completed, model run writing results
+
+    def read(self):  # reading progress lines added to output of model run
+        try:
+            fprogress = open(self.outname, "r")
+        except OSError:
+            return
+        fprogress.seek(self.fpos)
+        fdata = fprogress.read()
+        self.fpos = fprogress.tell()
+        fprogress.close()
+
+        for frecord in fdata.replace("\r", "\n").split("\n"):  # progress lines: nout, nsum, cflmax, tlength, tsum, ...
+            if frecord.startswith("Model execution completed"):
+                self.finished = True
+            fields = frecord.split()
+            if len(fields) >= 5 and fields[0].isdigit() and fields[1].isdigit():
+                try:
+                    self.tsum = float(fields[4])
+                    self.nsum = int(fields[1])
+                except ValueError:
+                    continue
+        if not self.tstop is None and not self.tsum is None and self.tsum >= self.tstop - 0.05:  # progress lines rounded to 0.1 s
+            self.finished = True
+
+    def check(self):  # reason for terminating model run (None if model run is expected to complete)
+
+        self.read()
+        if self.watchdog[0] > 0 and time.time() - self.tstart > self.watchdog[0]:
+            return "wall time"
+        if self.finished or self.tsum is None:  # no rate after the end of the simulation or before the first time step
+            return None
+
+        if not self.last[0] is None:
+            if (self.tsum - self.last[0]) / self.watchdog[2] < self.watchdog[1] and not self.nsum > self.last[1]:
+                self.nslow += 1  # neither simulated time nor number of time steps progressing
+            else:
+                self.nslow = 0
+        self.last = [self.tsum, self.nsum]
+        if self.nslow >= self.watchdog[3]:
+            return "simulation rate"
+        return None
+
+
+class BatchScheduler:  # class for multi-core processing of model runs:
+
+    def __init__(self, temppath, ncores, oncomplete=None, region=None, onlaunch=None, watchdog=None, tstop=None):
+        self.temppath = temppath  # temporary directory with batch files, parameter files and output of model runs
+        self.ncores = max(1, int(ncores))  # maximum number of concurrently executed model runs
+        self.oncomplete = oncomplete  # function called with id and exit status of each completed model run
+        self.onlaunch = onlaunch  # function called with id of each started model run
+        self.region = region  # region string for direct execution of r.avaflow.main in the current mapset (None = batch file per model run)
+        self.pending = []  # model runs waiting for execution
+        self.running = {}  # model runs in execution, by process id
+        self.status = {}  # exit status of completed model runs
+        self.runtime = {}  # wall time of completed model runs (s)
+        self.usage = {}  # resource usage of completed model runs (including all processes started by them)
+        self.watchdog = watchdog  # maximum wall time (s), minimum simulated time per wall time, interval of checks (s), number of consecutive slow checks
+        self.tstop = tstop  # simulated time at which model runs stop (s)
+        self.progress = {}  # progress of running model runs
+        self.killed = {}  # model runs terminated by watchdog, with reason
+        self.lock = threading.Lock()  # lock for running model runs (reaping by main thread, termination by watchdog)
+
+    def submit(self, jid):  # queueing model run
+        self.pending.append(jid)
+
+    def cancel(self):  # removing all queued model runs, returning their ids
+        cancelled = self.pending
+        self.pending = []
+        return cancelled
+
+    def command(self, jid):  # command line and environment of model run
+        if self.region is None:
+            return ["bash", self.temppath + "/tmp" + str(jid) + "/batch" + str(jid)], None
+        env = os.environ.copy()
+        env["GRASS_REGION"] = self.region  # region of model run, without modifying the WIND file of the mapset
+        env["XINT"] = str(jid)  # id of model run
+        env["XRAST"] = "0"  # only ascii raster output, GRASS raster maps of model runs would collide in the shared mapset
+        env["XTAB"] = self.temppath + "/paramtab.bin"  # parameter table with values of model run
+        env["XCACHE"] = self.temppath + "/inputs.bin"  # cache of input raster maps
+        return ["r.avaflow.main", "input1=" + self.temppath + "/param0.txt"], env
+
+    def launch(self, jid):  # starting model run as child process
+        print("Executing model run %s" % jid)
+        fout = open(self.temppath + "/out" + str(jid), "w")
+        args, env = self.command(jid)
+        proc = subprocess.Popen(args, env=env, stdin=subprocess.DEVNULL, stdout=fout, start_new_session=True)
+        if self.watchdog:
+            self.progress[jid] = Progress(self.temppath + "/out" + str(jid), self.watchdog, self.tstop)
+        with self.lock:
+            self.running[proc.pid] = [jid, proc, fout, time.time()]
+        if self.onlaunch:
+            self.onlaunch(jid)
+
+    def watch(self, stopped):  # terminating model runs exceeding maximum wall time or with simulated time progressing too slowly
+
+        while not stopped.wait(self.watchdog[2]):
+
+            with self.lock:
+                running = list(self.running.items())
+
+            for pid, [jid, proc, fout, tstart] in running:
+
+                reason = self.progress[jid].check()
+                if reason and not jid in self.killed:
+                    with self.lock:  # model run not reaped while terminating (process id cannot be reused)
+                        if not pid in self.running:
+                            continue  # model run completed in the meantime
+                        self.killed[jid] = reason
+                        print("Model run %s terminated by watchdog (%s)." % (jid, reason))
+                        try:
+                            os.killpg(pid, signal.SIGTERM)  # terminating all processes of model run
+                        except ProcessLookupError:
+                            pass
+
+    def run(self):  # executing all queued model runs, blocking until each child process terminates
+
+        if self.watchdog:
+            stopped = threading.Event()
+            watcher = threading.Thread(target=self.watch, args=(stopped,))
+            watcher.start()
+
+        while self.pending or self.running:
+            while self.pending and len(self.running) < self.ncores:
+                self.launch(self.pending.pop(0))
+            try:
+                pid = os.waitid(os.P_ALL, 0, os.WEXITED | os.WNOWAIT).si_pid  # waiting for terminated child without reaping it
+            except ChildProcessError:
+                break
+            with self.lock:  # reaping and removing model run at once
+                pid, wstatus, rusage = os.wait4(pid, 0)
+                if pid not in self.running:
+                    continue
+                jid, proc, fout, tstart = self.running.pop(pid)
+            proc.returncode = exitcode(wstatus)  # child is reaped here, not by subprocess
+            fout.close()
+            self.status[jid] = proc.returncode
+            self.runtime[jid] = time.time() - tstart
+            self.usage[jid] = rusage
+            if proc.returncode == 0:
+                print("Model run %s completed." % jid)
+            else:
+                print("Model run %s terminated with exit status %s." % (jid, proc.returncode))
+            if self.oncomplete:
+                self.oncomplete(jid, proc.returncode)
+
+        if self.watchdog:
+            stopped.set()
+            watcher.join()
+        return self.status
+
+
+class QueueScheduler(BatchScheduler):  # class for distributed processing of model runs through queue directory shared with r.avaflow.worker:
+
+    def __init__(self, temppath, queuepath, nworkers, oncomplete=None, region=None, onlaunch=None, timeout=120.0, watchdog=None, tstop=None):
+        BatchScheduler.__init__(self, temppath, 1, oncomplete, region, onlaunch, watchdog, tstop)  # watchdog applied by workers
+        self.queuepath = queuepath  # queue directory (pending, claimed and completed model runs)
+        self.nworkers = nworkers  # number of local worker processes
+        self.timeout = timeout  # time without heartbeat after which a claimed model run is reassigned (s)
+        self.jobs = {}  # ids of queued model runs, by job file name of current attempt
+        self.claimed = []  # job files claimed by workers
+
+        for qdir in ["pending", "claimed", "done"]:  # clearing queue of earlier multiple model runs
+            if os.path.exists(queuepath + "/" + qdir):
+                shutil.rmtree(queuepath + "/" + qdir)
+            os.makedirs(queuepath + "/" + qdir)
+        if os.path.exists(queuepath + "/stop"):
+            os.remove(queuepath + "/stop")
+        ftimeout = open(queuepath + "/timeout", "w")  # heartbeat timeout, workers signal activity well within
+        print(self.timeout, file=ftimeout)
+        ftimeout.close()
+
+    def launch(self, jid):  # writing job file of model run to queue
+        args, env = self.command(jid)
+        jobname = str(len(self.jobs) + 1).zfill(6) + ".1.json"  # order of dispatch, attempt
+        job = {"jid": jid, "args": args, "env": {key: env[key] for key in ["GRASS_REGION", "XINT", "XRAST", "XTAB", "XCACHE", "XFORMAT", "XSPARSE", "XVTK"] if key in env}, 
+            "cwd": os.getcwd(), "out": self.temppath + "/out" + str(jid), 
+            "files": [path for path in [args[1].split("=", 1)[1], env["XTAB"], env["XCACHE"]] if os.path.exists(path)],  # files of r.avaflow read by the model run
+            "watchdog": self.watchdog, "tstop": self.tstop}
+        fjob = open(self.queuepath + "/" + jobname + ".tmp", "w")
+        json.dump(job, fjob)
+        fjob.close()
+        os.rename(self.queuepath + "/" + jobname + ".tmp", self.queuepath + "/pending/" + jobname)
+        self.jobs[jobname] = jid
+
+    def cancel(self):  # removing all model runs not yet claimed by a worker, returning their ids
+        cancelled = []
+        for jobname in sorted(os.listdir(self.queuepath + "/pending")):
+            try:
+                os.remove(self.queuepath + "/pending/" + jobname)
+                cancelled.append(self.jobs.pop(jobname))
+            except (OSError, KeyError):
+                continue
+        return cancelled
+
+    def run(self):  # executing all queued model runs through workers
+
+        for jid in self.pending:
+            self.launch(jid)
+        self.pending = []
+
+        workers = []
+        for i in range(0, self.nworkers):  # starting local workers
+            workers.append(subprocess.Popen(["r.avaflow.worker", "queue=" + self.queuepath], stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                start_new_session=True))
+        active = time.time()  # last sign of activity of any worker
+
+        while self.jobs:
+
+            time.sleep(1.0)
+
+            for jobname in os.listdir(self.queuepath + "/claimed"):  # model runs started or lost by workers
+                if jobname in self.jobs and not jobname in self.claimed:
+                    self.claimed.append(jobname)
+                    if self.onlaunch:
+                        self.onlaunch(self.jobs[jobname])
+                try:
+                    heartbeat = os.path.getmtime(self.queuepath + "/claimed/" + jobname)
+                    active = max(active, heartbeat)
+                    if time.time() - heartbeat > self.timeout and jobname in self.jobs:  # reassigning as new attempt
+                        base, attempt = jobname.split(".")[0:2]
+                        newname = base + "." + str(int(attempt) + 1) + ".json"
+                        os.rename(self.queuepath + "/claimed/" + jobname, self.queuepath + "/pending/" + newname)
+                        self.jobs[newname] = self.jobs.pop(jobname)
+                        self.claimed.remove(jobname)
+                        print("Model run %s reassigned (no heartbeat of worker)." % self.jobs[newname])
+                except (OSError, ValueError):
+                    continue
+
+            for jobname in sorted(os.listdir(self.queuepath + "/done")):  # completed model runs
+                if jobname.endswith(".tmp"):
+                    continue
+                fdone = open(self.queuepath + "/done/" + jobname, "r")
+                done = json.load(fdone)
+                fdone.close()
+                os.remove(self.queuepath + "/done/" + jobname)
+                active = time.time()
+                if not jobname in self.jobs:  # earlier attempt of model run completed after reassignment
+                    continue
+
+                jid = self.jobs.pop(jobname)
+                if jobname in self.claimed:
+                    self.claimed.remove(jobname)
+                elif self.onlaunch:  # model run completed before claim was noticed
+                    self.onlaunch(jid)
+                self.status[jid] = done["status"]
+                self.runtime[jid] = done["runtime"]
+                self.usage[jid] = types.SimpleNamespace(**done["usage"])
+                if done.get("killed"):
+                    self.killed[jid] = done["killed"]
+                    print("Model run %s terminated by watchdog (%s)." % (jid, done["killed"]))
+                if done["status"] == 0:
+                    print("Model run %s completed by worker %s." % (jid, done["worker"]))
+                else:
+                    print("Model run %s terminated with exit status %s on worker %s." % (jid, done["status"], done["worker"]))
+                if self.oncomplete:
+                    self.oncomplete(jid, done["status"])
+
+            if self.jobs and all(not worker.poll() is None for worker in workers) and time.time() - active > self.timeout:
+                open(self.queuepath + "/stop", "w").close()  # no local worker alive and no heartbeat of any other worker
+                raise RuntimeError("no active worker, model runs %s not completed" % ", ".join(map(str, sorted(self.jobs.values()))))
+
+        open(self.queuepath + "/stop", "w").close()  # signalling workers to exit
+        for worker in workers:
+            worker.wait()
+        return self.status
+
+
+class TaskGraph:  # class for concurrent execution of post-processing jobs, ordered through their input and output files:
+
+    def __init__(self, ncores):
+        self.ncores = max(1, int(ncores))  # maximum number of cores used by concurrently executed jobs
+        self.tasks = []  # name, job (shell command or function), inputs, outputs, number of cores, prerequisite jobs
+        self.running = {}  # jobs in execution, by process id
+        self.status = {}  # exit status of completed jobs
+        self.runtime = {}  # wall time of completed jobs (s)
+
+    def add(self, name, job, inputs=(), outputs=(), ncores=1):  # declaring job, executed after all earlier jobs writing its inputs or using its outputs
+        prereq = []
+        for k, task in enumerate(self.tasks):
+            if set(task[3]) & set(inputs) or set(task[3]) & set(outputs) or set(task[2]) & set(outputs):
+                prereq.append(k)
+        self.tasks.append([name, job, list(inputs), list(outputs), min(max(1, ncores), self.ncores), prereq])
+
+    def launch(self, k):  # starting job as child process
+        name, job = self.tasks[k][0:2]
+        if callable(job):
+            sys.stdout.flush()
+            pid = os.fork()
+            if pid == 0:  # child process executing function
+                code = 0
+                try:
+                    job()
+                except BaseException as err:
+                    print("Job %s failed: %s" % (name, err))
+                    code = 1
+                sys.stdout.flush()
+                os._exit(code)
+            proc = None
+        else:
+            proc = subprocess.Popen(job, shell=True, stdin=subprocess.DEVNULL)
+            pid = proc.pid
+        self.running[pid] = [k, proc, time.time()]
+
+    def run(self):  # executing all jobs, blocking until each child process terminates
+
+        pending = list(range(0, len(self.tasks)))
+        ncoresused = 0
+        while pending or self.running:
+            for k in list(pending):  # starting jobs with completed prerequisites while cores are available
+                if not all([j in self.status for j in self.tasks[k][5]]):
+                    continue
+                if ncoresused + self.tasks[k][4] <= self.ncores or not self.running:
+                    pending.remove(k)
+                    self.launch(k)
+                    ncoresused = ncoresused + self.tasks[k][4]
+            try:
+                pid, wstatus = os.waitpid(-1, 0)
+            except ChildProcessError:
+                break
+            if pid not in self.running:
+                continue
+            k, proc, tstart = self.running.pop(pid)
+            ncoresused = ncoresused - self.tasks[k][4]
+            self.status[k] = exitcode(wstatus)
+            if proc:
+                proc.returncode = self.status[k]  # child is reaped here, not by subprocess
+            self.runtime[k] = time.time() - tstart
+            print("Job %s completed in %.1f seconds." % (self.tasks[k][0], self.runtime[k]))
+        return self.status
+
+    def writetimings(self, timingsname):  # writing table of exit status and wall time of jobs
+        ftimings = open(timingsname, "w")
+        ftimings.write("job\tstatus\ttime\n")
+        for k, task in enumerate(self.tasks):
+            if k in self.status:
+                ftimings.write("%s\t%i\t%.1f\n" % (task[0], self.status[k], self.runtime[k]))
+        ftimings.close()
+
+
+def Heartbeat(claimpath, stopped, interval, terminate):  # function for signalling that model run is still executed (r.avaflow.worker):
+    while not stopped.wait(interval):
+        try:
+            os.utime(claimpath)
+        except OSError:  # model run was reassigned, this attempt is abandoned before writing further output
+            terminate(signal.SIGKILL)  # terminating all processes of model run at once
+            break
+
+
+def Watch(progress, stopped, terminate, killed):  # function for terminating model run not expected to complete (watchdog of r.avaflow.worker):
+    while not stopped.wait(progress.watchdog[2]):
+        reason = progress.check()
+        if reason:
+            killed.append(reason)
+            terminate(signal.SIGTERM)
+            break
+
+
+def readtimeout(queuepath):  # function for heartbeat timeout of queue (s), waiting for r.avaflow to set up queue (r.avaflow.worker)
+
+    while not os.path.exists(queuepath + "/timeout"):
+        time.sleep(1.0)
+    ftimeout = open(queuepath + "/timeout", "r")
+    timeout = float(ftimeout.read())  # time without heartbeat after which r.avaflow reassigns a model run (s)
+    ftimeout.close()
+    return timeout
+
+
+def work(queuepath, worker, heartbeat):  # function for executing model runs of queue until r.avaflow signals stop (r.avaflow.worker):
+
+    while True:
+
+        jobs = sorted(os.listdir(queuepath + "/pending"))
+        if not jobs:
+            if os.path.exists(queuepath + "/stop"):  # no more model runs to be expected
+                break
+            time.sleep(1.0)
+            continue
+
+        claimed = None
+        for jobname in jobs:  # claiming first available model run (renaming is atomic, only one worker succeeds)
+            try:
+                os.utime(queuepath + "/pending/" + jobname)  # job may have waited longer than the heartbeat timeout
+                os.rename(queuepath + "/pending/" + jobname, queuepath + "/claimed/" + jobname)
+                claimed = jobname
+                break
+            except OSError:
+                continue
+        if not claimed:
+            continue
+
+        claimpath = queuepath + "/claimed/" + claimed
+        os.utime(claimpath)
+        fjob = open(claimpath, "r")
+        job = json.load(fjob)
+        fjob.close()
+
+        missing = [path for path in [job["cwd"]] + job.get("files", []) if not os.path.exists(path)]
+        if missing:  # GRASS database or working directory of r.avaflow not shared with this computer
+            try:
+                os.rename(claimpath, queuepath + "/pending/" + claimed)  # releasing model run for other workers
+            except OSError:
+                pass
+            raise RuntimeError("not accessible: %s" % ", ".join(missing))
+
+        print("Executing model run %s" % job["jid"])
+
+        env = os.environ.copy()
+        env.update(job["env"])  # region, id of model run, raster output control
+        fout = open(job["out"], "w")
+        start = time.time()
+        proc = subprocess.Popen(job["args"], env=env, cwd=job["cwd"], stdin=subprocess.DEVNULL, stdout=fout, start_new_session=True)
+
+        lock = threading.Lock()  # model run not reaped while terminating (process id cannot be reused)
+        reaped = []
+        def terminate(signum):  # terminating all processes of model run
+            with lock:
+                if not reaped:
+                    try:
+                        os.killpg(proc.pid, signum)
+                    except ProcessLookupError:
+                        pass
+
+        stopped = threading.Event()
+        killed = []  # reason for termination by watchdog
+        threads = [threading.Thread(target=Heartbeat, args=(claimpath, stopped, heartbeat, terminate))]
+        if job.get("watchdog"):
+            threads.append(threading.Thread(target=Watch, args=(Progress(job["out"], job["watchdog"], job.get("tstop")), stopped, terminate, killed)))
+        for thread in threads:
+            thread.start()
+        os.waitid(os.P_PID, proc.pid, os.WEXITED | os.WNOWAIT)  # waiting for model run without reaping it
+        with lock:
+            pid, wstatus, rusage = os.wait4(proc.pid, 0)
+            reaped.append(pid)
+        proc.returncode = exitcode(wstatus)  # child is reaped here, not by subprocess
+        stopped.set()
+        for thread in threads:
+            thread.join()
+        fout.close()
+
+        try:
+            os.utime(claimpath)  # checking claim before reporting, results of a reassigned model run belong to the new attempt
+        except OSError:
+            print("Model run %s abandoned (reassigned to another worker)." % job["jid"])
+            continue
+
+        done = {"jid": job["jid"], "status": proc.returncode, "runtime": time.time() - start, "worker": worker, "killed": (killed or [None])[0],
+            "usage": {"ru_utime": rusage.ru_utime, "ru_stime": rusage.ru_stime, "ru_maxrss": rusage.ru_maxrss}}
+        fdone = open(queuepath + "/done/" + claimed + ".tmp", "w")
+        json.dump(done, fdone)
+        fdone.close()
+        os.rename(queuepath + "/done/" + claimed + ".tmp", queuepath + "/done/" + claimed)  # reporting completed model run
+
+        try:
+            os.remove(claimpath)  # claim of this attempt only, a reassigned model run is claimed under a new job file name
+        except OSError:
+            pass
+
+        print("Model run %s completed." % job["jid"])
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+
+#############################################################################
+#
+# MODULE:       avaflowio.py
+#
+# AUTHORS:      Martin Mergili and Shiva P. Pudasaini
+#
+# PURPOSE:      The mass flow simulation tool
+#               Reading and writing of the output raster maps, sparse
+#               snapshots and result stores of the model, input
+#               files shared by multiple model runs
+#               (shared by r.avaflow and r.avaflow.paraview)
+#
+# COPYRIGHT:    (c) 2013 - 2023 by the authors
+#               (c) 2020 - 2023 by the University of Graz
+#               (c) 2000 - 2023 by the GRASS Development Team
+#
+#               This program is free software under the GNU General Public
+#               License (>=v2). Read the file COPYING that comes with GRASS
+#               for details.
+#
+#############################################################################
+
+# Importing libraries
+
+import io
+import json
+import lzma
+import math
+import numpy
+import os
+import shutil
+import zlib
+
+
+# Defining functions and classes for output raster maps, sparse snapshots and result stores
+
+def readasc(ascname):  # function for reading ascii raster into array (no data as NaN):
+
+    fasc = open(ascname, "r")
+    header = []
+    for i in range(0, 6):
+        header.append(fasc.readline().split())
+    data = numpy.array(fasc.read().split(), dtype=numpy.float32)
+    fasc.close()
+
+    data = data.reshape(int(header[1][1]), int(header[0][1]))
+    data[data == float(header[5][1])] = numpy.nan
+    return header, data
+
+
+def readbin(binname):  # function for reading binary raster with ENVI header into memory-mapped array (no data as in header)
+
+    fhdr = open(binname[:-4] + ".hdr", "r")
+    hdr = {}
+    for line in fhdr:
+        if "=" in line:
+            key, value = line.split("=", 1)
+            hdr[key.strip()] = value.strip()
+    fhdr.close()
+
+    ncols = int(hdr["samples"])
+    nrows = int(hdr["lines"])
+    mapinfo = [value.strip() for value in hdr["map info"].strip("{}").split(",")]  # projection, reference cell, coordinates of centre of upper left cell, cell size
+    header = [["ncols", str(ncols)], ["nrows", str(nrows)], ["xllcenter", mapinfo[3]], 
+        ["yllcenter", "%.2f" % (float(mapinfo[4]) - (nrows - 1) * float(mapinfo[5]))], ["cellsize", mapinfo[5]], ["NODATA_value", hdr["data ignore value"]]]  # header as in ascii raster
+
+    if hdr["byte order"] == "0":
+        dtype = "<f4"
+    else:
+        dtype = ">f4"
+    data = numpy.memmap(binname, dtype=dtype, mode="r", shape=(nrows, ncols))
+    return header, data
+
+
+def rastfile(rastname):  # function for file name of output raster of the model (binary or ascii)
+
+    if os.path.exists(rastname + ".bin"):
+        return rastname + ".bin"
+    return rastname + ".asc"
+
+
+def readraster(rastname):  # function for reading output raster of the model into array (no data as NaN)
+
+    if os.path.exists(rastname + ".bin"):
+        header, data = readbin(rastname + ".bin")
+        return header, numpy.where(data == float(header[5][1]), numpy.nan, data).astype(numpy.float32)
+    return readasc(rastname + ".asc")
+
+
+def writeasc(ascname, header, data, fmt="%.3f"):  # function for writing array to ascii raster (format of corrasc)
+
+    fdata = ""
+    for i in range(0, 5):
+        fdata = fdata + header[i][0] + "\t" + header[i][1] + "\n"
+    fdata = fdata + "NODATA_value\t-9999\n"
+
+    fbody = io.StringIO()
+    numpy.savetxt(fbody, numpy.where(numpy.isnan(data), -9999.0, data), fmt=fmt, delimiter=" ")
+    fdata = fdata + fbody.getvalue().replace(fmt % -9999.0, "-9999")
+
+    fasc = open(ascname + ".asc", "w")
+    fasc.write(fdata)
+    fasc.close()
+
+
+def writebin(binname, header, data):  # function for writing array to binary raster with ENVI header (format of r.avaflow.main)
+
+    nrows = int(header[1][1])
+    cellsize = float(header[4][1])
+    fhdr = open(binname + ".hdr", "w")
+    fhdr.write("ENVI\ndescription = {r.avaflow}\nsamples = %s\nlines = %s\nbands = 1\nheader offset = 0\nfile type = ENVI Standard\n" % (header[0][1], header[1][1]))
+    fhdr.write("data type = 4\ninterleave = bsq\nbyte order = 0\n")
+    fhdr.write("map info = {Arbitrary, 1.5, 1.5, %s, %.2f, %s, %s}\n" % (header[2][1], float(header[3][1]) + (nrows - 1) * cellsize, header[4][1], header[4][1]))
+    fhdr.write("data ignore value = -9999.000\n")
+    fhdr.close()
+
+    numpy.where(numpy.isnan(data), -9999.0, data).astype("<f4").tofile(binname + ".bin")
+
+
+def readsparse(sparsename):  # function for reading sparse snapshot (header, names of variables, cell indices, values per cell and variable)
+
+    fsparse = open(sparsename, "rb")
+    fsparse.read(4)  # identifier
+    order = "<"
+    if not numpy.frombuffer(fsparse.read(4), dtype="<i4")[0] == 1:
+        order = ">"  # written with other byte order
+    nrows, ncols, nvars, ncells = numpy.frombuffer(fsparse.read(16), dtype=order + "i4")
+    west, south, cellsize = numpy.frombuffer(fsparse.read(12), dtype=order + "f4")
+    names = [fsparse.read(32).split(b"\0")[0].decode() for i in range(0, nvars)]
+    fsparse.close()
+
+    header = [["ncols", str(ncols)], ["nrows", str(nrows)], ["xllcenter", "%.2f" % west], ["yllcenter", "%.2f" % south], ["cellsize", "%.2f" % cellsize], 
+        ["NODATA_value", "-9999"]]
+    offset = 4 + 4 + 16 + 12 + 32 * nvars
+    cells = numpy.memmap(sparsename, dtype=order + "i4", mode="r", offset=offset, shape=(ncells,))
+    values = numpy.memmap(sparsename, dtype=order + "f4", mode="r", offset=offset + 4 * ncells, shape=(ncells, nvars))
+    return header, names, cells, values
+
+
+def densify(sparsename, domainname, name):  # function for expanding one variable of a sparse snapshot to an array (no data outside the domain as NaN)
+
+    header, names, cells, values = readsparse(sparsename)
+    data = numpy.full(int(header[1][1]) * int(header[0][1]), numpy.nan, dtype=numpy.float32)
+    data[readsparse(domainname)[2]] = 0  # cells of the area of interest without flow
+    data[cells] = values[:, names.index(name)]
+    return header, data.reshape(int(header[1][1]), int(header[0][1]))
+
+
+def densifysnapshots(ascpath, pf):  # function for writing the raster maps of all sparse snapshots (format of output raster maps)
+
+    snapshots = sorted([sname for sname in os.listdir(ascpath) if sname.startswith(pf + "_snapshot") and sname.endswith(".spr")])
+    for sname in snapshots:
+        fill = sname[len(pf + "_snapshot"):-4]
+        for name in readsparse(ascpath + sname)[1]:
+            header, data = densify(ascpath + sname, ascpath + pf + "_domain.spr", name)
+            if os.environ.get("XFORMAT") == "1":
+                writebin(ascpath + pf + "_" + name + fill, header, data)
+            else:
+                writeasc(ascpath + pf + "_" + name + fill, header, data)
+
+
+class ResultStore:  # class for chunked and compressed storage of the raster maps of all time steps of a model run:
+
+    def __init__(self, storepath, mode="r", compression="zlib", chunk=256):
+        self.storepath = storepath  # file of result store
+        self.mode = mode  # r = reading, w = writing
+        if mode == "w":
+            self.fstore = open(storepath + ".tmp", "wb")
+            self.fstore.write(b"AVRS")  # identifier
+            self.index = {"compression": compression, "chunk": chunk, "header": None, "variables": {}}
+        else:
+            self.fstore = open(storepath, "rb")
+            if not self.fstore.read(4) == b"AVRS":
+                raise ValueError("%s is not a result store" % storepath)
+            self.fstore.seek(-8, os.SEEK_END)
+            ifooter = self.fstore.tell()
+            ioffset = int(numpy.frombuffer(self.fstore.read(8), dtype="<u8")[0])  # position of index
+            self.fstore.seek(ioffset)
+            self.index = json.loads(zlib.decompress(self.fstore.read(ifooter - ioffset)).decode())
+
+    def add(self, name, step, header, data):  # writing raster map of one variable and time step in chunks
+        if self.index["header"] is None:
+            self.index["header"] = header
+        variable = self.index["variables"].setdefault(name, {"steps": [], "chunks": {}})
+        chunk = self.index["chunk"]
+        for i in range(0, data.shape[0], chunk):
+            for j in range(0, data.shape[1], chunk):
+                fblock = numpy.ascontiguousarray(data[i:i + chunk, j:j + chunk], dtype="<f4").tobytes()
+                if self.index["compression"] == "lzma":
+                    fblock = lzma.compress(fblock)
+                else:
+                    fblock = zlib.compress(fblock, 6)
+                variable["chunks"]["%s,%s,%s" % (step, i // chunk, j // chunk)] = [self.fstore.tell(), len(fblock)]
+                self.fstore.write(fblock)
+        variable["steps"].append(step)
+
+    def close(self):  # writing index and closing result store
+        if self.mode == "w":
+            ioffset = self.fstore.tell()
+            self.fstore.write(zlib.compress(json.dumps(self.index).encode()))
+            self.fstore.write(numpy.array([ioffset], dtype="<u8").tobytes())
+            self.fstore.close()
+            os.replace(self.storepath + ".tmp", self.storepath)
+        else:
+            self.fstore.close()
+
+    def variables(self):  # names of stored variables
+        return sorted(self.index["variables"])
+
+    def steps(self, name):  # time steps stored for variable
+        return sorted(self.index["variables"][name]["steps"])
+
+    def read(self, name, tmin=None, tmax=None, bbox=None):  # reading time steps tmin to tmax of variable within bounding box (north, south, west, east)
+        header = self.index["header"]
+        nrows, ncols, cellsize = int(header[1][1]), int(header[0][1]), float(header[4][1])
+        chunk = self.index["chunk"]
+        variable = self.index["variables"][name]
+
+        r0, r1, c0, c1 = 0, nrows, 0, ncols
+        if bbox:  # rows and columns of cells with centre in bounding box
+            r0 = max(0, int(math.ceil(nrows - 1 - (bbox[0] - float(header[3][1])) / cellsize - 1e-6)))
+            r1 = min(nrows, int(math.floor(nrows - 1 - (bbox[1] - float(header[3][1])) / cellsize + 1e-6)) + 1)
+            c0 = max(0, int(math.ceil((bbox[2] - float(header[2][1])) / cellsize - 1e-6)))
+            c1 = min(ncols, int(math.floor((bbox[3] - float(header[2][1])) / cellsize + 1e-6)) + 1)
+            r1, c1 = max(r0, r1), max(c0, c1)
+        steps = [step for step in self.steps(name) if (tmin is None or step >= tmin) and (tmax is None or step <= tmax)]
+
+        data = numpy.empty((len(steps), r1 - r0, c1 - c0), dtype=numpy.float32)
+        for k, step in enumerate(steps):
+            for ci in range(r0 // chunk, (r1 - 1) // chunk + 1 if r1 > r0 else 0):
+                for cj in range(c0 // chunk, (c1 - 1) // chunk + 1 if c1 > c0 else 0):  # decompressing overlapping chunks only
+                    foffset, flength = variable["chunks"]["%s,%s,%s" % (step, ci, cj)]
+                    self.fstore.seek(foffset)
+                    fblock = self.fstore.read(flength)
+                    if self.index["compression"] == "lzma":
+                        fblock = lzma.decompress(fblock)
+                    else:
+                        fblock = zlib.decompress(fblock)
+                    block = numpy.frombuffer(fblock, dtype="<f4").reshape(min(chunk, nrows - ci * chunk), min(chunk, ncols - cj * chunk))
+                    i0, i1 = max(r0, ci * chunk), min(r1, ci * chunk + block.shape[0])
+                    j0, j1 = max(c0, cj * chunk), min(c1, cj * chunk + block.shape[1])
+                    data[k, i0 - r0:i1 - r0, j0 - c0:j1 - c0] = block[i0 - ci * chunk:i1 - ci * chunk, j0 - cj * chunk:j1 - cj * chunk]
+        return steps, data
+
+
+def packresults(ascpath, pf, storepath, compression, chunk, remove):  # function for packing the raster maps of all time steps into result store
+
+    rstore = ResultStore(storepath, "w", compression, chunk)
+    packed = []
+    snapshots = []
+    for fname in sorted(os.listdir(ascpath)):
+        rname, rext = os.path.splitext(fname)
+        if not rname.startswith(pf + "_") or len(rname) < len(pf) + 6 or not rname[-4:].isdigit():
+            continue
+        if rext in [".asc", ".bin"]:  # raster map of time step
+            header, data = readraster(ascpath + rname)
+            rstore.add(rname[len(pf) + 1:-4], int(rname[-4:]), header, data)
+            packed.append(rname)
+        elif rext == ".spr" and rname.startswith(pf + "_snapshot"):  # sparse snapshot of time step
+            snapshots.append(fname)
+    for fname in snapshots:  # variables of sparse snapshots not already stored from raster maps
+        for name in readsparse(ascpath + fname)[1]:
+            if name in rstore.index["variables"] and int(fname[-8:-4]) in rstore.index["variables"][name]["steps"]:
+                continue
+            header, data = densify(ascpath + fname, ascpath + pf + "_domain.spr", name)
+            rstore.add(name, int(fname[-8:-4]), header, data)
+    rstore.close()
+
+    if remove:
+        for rname in packed:
+            for rext in [".asc", ".bin", ".hdr"]:
+                if os.path.exists(ascpath + rname + rext):
+                    os.remove(ascpath + rname + rext)
+
+
+# Defining functions for input files shared by multiple model runs
+
+def writeparamtab(tabpath, plines, members, lmax):  # function for writing parameter table of multiple model runs (values overriding the shared parameter file)
+
+    columns = []  # lines of shared parameter file
+    values = []  # values of model runs
+    for key in ["rhrelease1", "vhrelease", "rhentrmax1", "vhentrmax"]:
+        if key in plines:
+            columns.append(plines[key])
+            values.append([float(member[key]) for member in members])
+    for l in range(0, lmax):
+        columns.append(plines["flowparam"] + l)
+        values.append([round(member["flowparam"][l], 10) for member in members])
+
+    table = numpy.array(values, dtype="<f4").reshape(len(columns), len(members)).T  # one row per model run
+    varied = [c for c in range(0, len(columns)) if numpy.unique(table[:, c]).size > 1]  # only varying parameters are stored
+
+    ftab = open(tabpath, "wb")
+    ftab.write(b"AVPT")  # header: identifier, number of columns, number of rows, lines of shared parameter file
+    numpy.array([len(varied), len(members)], dtype="<i4").tofile(ftab)
+    numpy.array([columns[c] for c in varied], dtype="<i4").tofile(ftab)
+    numpy.ascontiguousarray(table[:, varied]).tofile(ftab)  # values of model runs
+    ftab.close()
+
+
+def writeinputcache(cachepath, maps, rows, cols, export):  # function for writing the cache of input raster maps shared by multiple model runs (export writes one map as float32 plane)
+
+    fcache = open(cachepath + ".tmp", "wb")
+    fcache.write(b"AVIC")  # header: identifier, number of maps, number of rows, number of columns, names of maps
+    numpy.array([len(maps), rows, cols], dtype="<i4").tofile(fcache)
+    for mapname in maps:
+        fcache.write(mapname.encode()[:255].ljust(256, b"\0"))
+
+    for mapname in maps:  # contiguous float32 planes, no data as -9999
+        export(mapname, cachepath + ".map")
+        fmap = open(cachepath + ".map", "rb")
+        shutil.copyfileobj(fmap, fcache)
+        fmap.close()
+    if os.path.exists(cachepath + ".map"):
+        os.remove(cachepath + ".map")
+
+    fcache.close()
+    os.chmod(cachepath + ".tmp", 0o444)  # read-only, shared by all model runs
+    os.replace(cachepath + ".tmp", cachepath)
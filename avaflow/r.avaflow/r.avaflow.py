@@ -57,6 +57,24 @@
 #% guisection: flags
 #%end
 
+#%flag
+#% key: l
+#% description: Multiple model runs in the current mapset without GRASS session per model run (with -m)
+#% guisection: flags
+#%end
+
+#%flag
+#% key: r
+#% description: Resume multiple model runs, executing only model runs not completed according to the manifest (with -m)
+#% guisection: flags
+#%end
+
+#%flag
+#% key: s
+#% description: Sparse output of time steps, only cells with flow (densified for visualization)
+#% guisection: flags
+#%end
+
 #%flag
 #% key: t
 #% description: Map plots of impact wave or tsunami height
@@ -80,11 +98,19 @@
 #%option
 #% key: cores
 #% type: string
-#% description: Number of cores to be used for multiple model runs
+#% description: Number of cores to be used for multiple model runs and for rendering of animations
 #% required: no
 #% multiple: no
 #%end
 
+#%option
+#% key: queue
+#% type: string
+#% description: Path to queue directory shared with r.avaflow.worker processes for distributed multiple model runs, number of local workers, time without heartbeat after which a model run is reassigned (s)
+#% required: no
+#% multiple: yes
+#%end
+
 #%option
 #% key: cellsize
 #% type: string
@@ -663,6 +689,39 @@
 #% multiple: no
 #%end
 
+#%option
+#% key: design
+#% type: string
+#% description: Design of random parameter sampling (random, lhs = Latin hypercube, sobol, halton)
+#% required: no
+#% multiple: no
+#% options: random,lhs,sobol,halton
+#%end
+
+#%option
+#% key: seed
+#% type: string
+#% description: Seed for random parameter sampling
+#% required: no
+#% multiple: no
+#%end
+
+#%option
+#% key: watchdog
+#% type: string
+#% description: Termination of multiple model runs: maximum wall time per model run (s, 0 = no limit), minimum simulated time per wall time, interval of checks (s), number of consecutive slow checks
+#% required: no
+#% multiple: yes
+#%end
+
+#%option
+#% key: adaptive
+#% type: string
+#% description: Adaptive random sampling: number of model runs per wave, tolerance for maximum change of impact indicator index between waves
+#% required: no
+#% multiple: yes
+#%end
+
 #%option
 #% key: cfl
 #% type: string
@@ -743,21 +802,70 @@
 #% multiple: yes
 #%end
 
+#%option
+#% key: cache
+#% type: string
+#% description: Path to directory for caching results of single model runs, maximum size of cache (MB), reuse as hard links (0 = no, copies, 1 = yes, files read-only)
+#% required: no
+#% multiple: yes
+#%end
+
+#%option
+#% key: format
+#% type: string
+#% description: Format of output raster maps of the model (asc = ascii grid, bin = binary float32 with ENVI header)
+#% required: no
+#% multiple: no
+#% options: asc,bin
+#%end
+
+#%option
+#% key: vrformat
+#% type: string
+#% description: Format of virtual reality output of single model runs (csv = point tables, also used for Blender import, vtk = binary VTK image data with time series collection)
+#% required: no
+#% multiple: no
+#% options: csv,vtk
+#%end
+
+#%option
+#% key: store
+#% type: string
+#% description: Result store of time steps of single model runs: compression (zlib, lzma), size of chunks (cells), removal of stored raster maps (0 = no, 1 = yes)
+#% required: no
+#% multiple: yes
+#%end
+
 # Importing libraries
 
 import grass.script as grass
 from grass.script import core as grasscore
+import fcntl
+import hashlib
+import io
+import json
 import math
+import multiprocessing
+import numpy
+from PIL import GifImagePlugin
 from PIL import Image
+from PIL import ImageDraw
+from PIL import ImageFont
 import os
-import queue
 import random
 import shutil
-import subprocess
 import sys
-import threading
 import time
 
+for modpath in [os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "etc", "r.avaflow"),
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "r.avaflow")]:  # shared modules (installed addon or source tree)
+    if os.path.isdir(modpath) and not modpath in sys.path:
+        sys.path.insert(1, modpath)
+
+from avaflowexec import BatchScheduler, QueueScheduler, TaskGraph
+from avaflowio import readasc, readbin, rastfile, readraster, writeasc, writebin, readsparse, densify, densifysnapshots, ResultStore, packresults, \
+    writeparamtab, writeinputcache
+
 
 # Defining fundamental functions, classes, and variables
 
@@ -777,10 +885,6 @@ if not bingrass:
     grass.message(" ")
     sys.exit()
         
-queueLock = threading.Lock()  # queue for multi-core processing
-workQueue = queue.Queue()
-
-exitFlag = 0  # exit flag
 ambvars = grass.gisenv()  # path to GRASS data
 locpath = ambvars.GISDBASE + "/" + ambvars.LOCATION_NAME  # path to GRASS location
 temppath = (
@@ -812,34 +916,41 @@ def ErrorMessage(specify):  # function for error message:
     sys.exit()
 
 
-class myThread(threading.Thread):  # class for threading:
-    def __init__(self, name, q):
-        threading.Thread.__init__(self)
-        self.name = name
-        self.q = q
-
-    def run(self):
-        process_data(self.name, self.q)
-
-
-def StartBatch(jid):  # function for start of multi-core processing:
-    print("Executing model run %s" % jid)
-    execute = "bash " + temppath + "/tmp" + str(jid) + "/batch" + str(jid)
-    os.system(execute + " < /dev/null > " + temppath + "/out" + str(jid))
-    print("Model run %s completed." % jid)
-    return
-
+def sampledesign(design, nruns, ndim, seed):  # function for design matrix of random parameter sampling (values between 0 and 1):
+
+    rng = numpy.random.default_rng(seed)
+
+    if design == "lhs":  # Latin hypercube: one sample per stratum and dimension, strata randomly permuted
+        strata = numpy.argsort(rng.random((nruns, ndim)), axis=0)
+        return (strata + rng.random((nruns, ndim))) / nruns
+
+    elif design == "halton":  # Halton sequence (first point skipped), randomly shifted if seed is given
+        primes = []
+        nprime = 2
+        while len(primes) < ndim:
+            if all(nprime % pprime for pprime in primes):
+                primes.append(nprime)
+            nprime += 1
+        points = numpy.zeros((nruns, ndim))
+        for k in range(0, ndim):
+            index = numpy.arange(1, nruns + 1)
+            fraction = 1.0
+            while numpy.any(index > 0):
+                fraction /= primes[k]
+                points[:, k] += fraction * (index % primes[k])
+                index //= primes[k]
+        if seed is not None:
+            points = numpy.mod(points + rng.random(ndim), 1.0)
+        return points
+
+    elif design == "sobol":  # scrambled Sobol sequence
+        try:
+            from scipy.stats import qmc
+        except ImportError:
+            ErrorMessage("sampling design (Sobol sequences require SciPy)")
+        return qmc.Sobol(d=ndim, scramble=True, seed=seed).random(nruns)
 
-def process_data(threadName, q):  # function supporting start of multi-core processing:
-    while not exitFlag:
-        queueLock.acquire()
-        if not workQueue.empty():
-            time.sleep(0.25)
-            data = q.get()
-            queueLock.release()
-            StartBatch(data)
-        else:
-            queueLock.release()
+    return rng.random((nruns, ndim))  # independent uniform random numbers
 
 
 mstring = [
@@ -852,6 +963,8 @@ mstring = [
     "_treach",
 ]  # list of names of raster maps
 
+roccolours = [(69, 139, 116), (100, 149, 237), (255, 140, 0), (255, 64, 64)]  # colours of ROC curves of iii, iii normalized, dii, dii normalized
+
 
 def corrasc(corrname):  # function for correcting output ascii rasters
 
@@ -885,6 +998,536 @@ def corrasc(corrname):  # function for correcting output ascii rasters
     os.system("rm -f " + corrname + "o.asc")
     os.system("rm -f " + corrname + ".asc.aux.xml")
 
+def readmap(mapname, binname):  # function for reading raster map of the current region into array (no data as NaN, not-a-number values as 0)
+
+    region = grass.region()
+    grass.run_command("r.out.bin", flags="f", input=mapname, output=binname, bytes=4, null=-9999, overwrite=True)
+    data = numpy.fromfile(binname, dtype=numpy.float32).reshape(int(region["rows"]), int(region["cols"]))
+    os.remove(binname)
+    data[numpy.isnan(data)] = 0.0  # as replacement of -nan in exported ascii rasters
+    data[data == -9999] = numpy.nan
+    return data
+
+
+def roccurve(index, observed, normalization):  # function for ROC analysis of indicator index against observation (as r.avaflow.roc.R):
+    # returns thresholds, false and true positive rates, area under curve, averages of observation and model (None if not defined)
+
+    index = numpy.where(index < 0, numpy.nan, index)
+    if normalization == 2:
+        index[(index == 0) & (observed == 0)] = numpy.nan  # excluding cells neither observed nor simulated
+    observed = numpy.where(observed > 0, 1.0, numpy.where(observed < 0, numpy.nan, observed))
+    valid = ~(numpy.isnan(index) | numpy.isnan(observed))
+    indexf = index[valid]
+    observedf = observed[valid]
+    npos = int(numpy.count_nonzero(observedf == 1))
+    nneg = int(numpy.count_nonzero(observedf == 0))
+
+    averages = None
+    if normalization == 2:
+        nadd = 5 * npos - nneg  # number of added negative cells with index 0
+        if nadd < 0 or len(observedf) + nadd == 0:  # no valid cells, averages not defined
+            return None, None, None, None, None
+        averages = [float(numpy.sum(observedf)) / (len(observedf) + nadd), float(numpy.sum(indexf)) / (len(indexf) + nadd)]
+    if npos == 0 or nneg == 0:
+        return None, None, None, None, averages
+
+    order = numpy.argsort(-indexf, kind="stable")  # one pass over cells sorted by decreasing index
+    indexs = indexf[order]
+    tp = numpy.cumsum(observedf[order])
+    fp = numpy.arange(1, len(indexs) + 1) - tp
+    ends = numpy.append(numpy.flatnonzero(numpy.diff(indexs)), len(indexs) - 1)  # last cell of each threshold
+    thresholds = numpy.append(numpy.inf, indexs[ends])
+    fpr = numpy.append(0.0, fp[ends] / nneg)
+    tpr = numpy.append(0.0, tp[ends] / npos)
+    auc = float(numpy.sum(numpy.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2.0))
+    return thresholds, fpr, tpr, auc, averages
+
+
+def plotroc(plotname, fpr, tpr, auc, colour):  # function for ROC plot (layout of r.avaflow.roc.R)
+
+    width, height = 1417, 1181  # 12 x 10 cm at 300 dpi
+    left, right, top, bottom = 190, width - 30, 30, height - 190  # plot region
+    sx = lambda x: left + (x + 0.092) / 1.134 * (right - left)
+    sy = lambda y: bottom - (y + 0.0408) / 1.1016 * (bottom - top)
+    try:
+        font = ImageFont.load_default(size=44)
+    except TypeError:  # Pillow without scalable default font
+        font = ImageFont.load_default()
+
+    img = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(img)
+    for k in range(0, 50, 2):  # line of random prediction
+        draw.line([(sx(k / 50.0), sy(k / 50.0)), (sx((k + 1) / 50.0), sy((k + 1) / 50.0))], fill=(190, 190, 190), width=3)
+    if auc is not None:
+        draw.line([(sx(x), sy(y)) for x, y in zip(fpr, tpr)], fill=colour, width=6)  # ROC curve
+
+    draw.rectangle([left, top, right, bottom], outline="black", width=3)
+    for k in range(0, 6):  # axes
+        tick = k / 5.0
+        draw.line([(sx(tick), bottom), (sx(tick), bottom + 15)], fill="black", width=3)
+        draw.line([(left - 15, sy(tick)), (left, sy(tick))], fill="black", width=3)
+        draw.text((sx(tick), bottom + 25), "%.1f" % tick, fill="black", font=font, anchor="mt")
+        draw.text((left - 25, sy(tick)), "%.1f" % tick, fill="black", font=font, anchor="rm")
+    draw.text(((left + right) / 2, height - 20), "rFP/rON", fill="black", font=font, anchor="md")
+    ylabel = Image.new("RGB", (500, 60), "white")
+    ImageDraw.Draw(ylabel).text((250, 30), "rTP/rOP", fill="black", font=font, anchor="mm")
+    ylabel = ylabel.rotate(90, expand=True)
+    img.paste(ylabel, (20, int((top + bottom) / 2 - 250)))
+
+    draw.text((right - 300, bottom - 150), "AUROC", fill="black", font=font, anchor="lm")  # legend
+    draw.line([(right - 400, bottom - 80), (right - 320, bottom - 80)], fill=colour, width=6)
+    if auc is None:
+        draw.text((right - 300, bottom - 80), "NA", fill=colour, font=font, anchor="lm")
+    else:
+        draw.text((right - 300, bottom - 80), "%.3f" % auc, fill=colour, font=font, anchor="lm")
+    img.save(plotname)
+
+
+def evaluateroc(index, observed, normalization, colour, rocname, curvename, averagesname):  # function for ROC plot, table of ROC curve and averages
+
+    thresholds, fpr, tpr, auc, averages = roccurve(index, observed, normalization)
+
+    if averages:
+        faverages = open(averagesname, "w")
+        for label, average in zip(["AVGobs", "AVGmodel"], averages):
+            faverages.write(label + "\t" + ("%.4f" % average).rstrip("0").rstrip(".") + "\n")
+        faverages.close()
+
+    if auc is not None:
+        fcurve = open(curvename, "w")
+        fcurve.write("AUROC\t%.6f\n" % auc)
+        fcurve.write("threshold\tfpr\ttpr\n")
+        for threshold, frate, trate in zip(thresholds, fpr, tpr):
+            fcurve.write("%.6f\t%.6f\t%.6f\n" % (threshold, frate, trate))
+        fcurve.close()
+
+    plotroc(rocname, fpr, tpr, auc, colour)
+
+
+def framebounds(nframes, nparts):  # function for splitting time steps into ranges rendered by separate processes (first and last time step)
+
+    nparts = max(1, min(nparts, nframes))
+    bounds = [int(round(float(k * nframes) / nparts)) for k in range(0, nparts + 1)]
+    return [[bounds[k], bounds[k + 1] - 1] for k in range(0, nparts)]
+
+
+def palettesample(pngname):  # function for reduced image used for deriving the palette of an animated gif
+
+    img = Image.open(pngname)
+    img.thumbnail((320, 320), Image.BILINEAR)
+    return img.convert("RGB")
+
+
+def animationframes(pngname, widthc, palette):  # function for full and compressed frame of animated gif from one decoded image
+
+    img = Image.open(pngname).convert("RGB")
+    heightc = int(float(img.size[1]) * float(widthc / float(img.size[0])))  # height of compressed image
+    imgc = img.resize((widthc, heightc), Image.BILINEAR)
+    return img.quantize(palette=palette, dither=Image.Dither.NONE), imgc.quantize(palette=palette, dither=Image.Dither.NONE)
+
+
+class AnimationWriter:  # class for writing animated gif frame by frame with one palette for all frames:
+
+    def __init__(self, gifname, duration=200):
+        self.fgif = open(gifname, "wb")
+        self.duration = duration  # display time of frames (ms)
+        self.previous = None  # palette indices of previous frame
+
+    def add(self, frame):  # appending frame, only the region changed since the previous frame is encoded
+        data = numpy.asarray(frame)
+        if self.previous is None:
+            for fblock in GifImagePlugin.getheader(frame, info={"loop": 0, "optimize": False})[0]:
+                self.fgif.write(fblock)
+            box = (0, 0, frame.size[0], frame.size[1])
+        else:
+            changed = data != self.previous
+            if not changed.any():
+                box = (0, 0, 1, 1)  # unchanged frame
+            else:
+                rows = numpy.flatnonzero(changed.any(axis=1))
+                cols = numpy.flatnonzero(changed.any(axis=0))
+                box = (int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1)
+        for fblock in GifImagePlugin.getdata(frame.crop(box), offset=box[:2], duration=self.duration, disposal=1):
+            self.fgif.write(fblock)
+        self.previous = data
+
+    def close(self):
+        self.fgif.write(b";")  # trailer
+        self.fgif.close()
+
+
+def writeanimations(pngnames, gifname, widthc, ncores):  # function for writing full and compressed animated gif (gifname.gif, gifnamec.gif)
+
+    nproc = max(1, min(ncores, len(pngnames)))
+    pool = multiprocessing.Pool(nproc)
+
+    samples = pool.map(palettesample, pngnames[::int(math.ceil(len(pngnames) / 16.0))])  # palette shared by all frames
+    montage = Image.new("RGB", (max([sample.size[0] for sample in samples]), sum([sample.size[1] for sample in samples])))
+    ymontage = 0
+    for sample in samples:
+        montage.paste(sample, (0, ymontage))
+        ymontage = ymontage + sample.size[1]
+    palette = Image.new("P", (1, 1))
+    palette.putpalette(montage.quantize(colors=256, method=Image.Quantize.MEDIANCUT).getpalette())
+
+    gif = AnimationWriter(gifname + ".gif")
+    gifc = AnimationWriter(gifname + "c.gif")
+    nbatch = 2 * nproc  # number of frames held in memory
+    for k in range(0, len(pngnames), nbatch):  # decoding, resizing and quantizing in parallel, writing in order
+        for frame, framec in pool.starmap(animationframes, [(pngname, widthc, palette) for pngname in pngnames[k:k + nbatch]]):
+            gif.add(frame)
+            gifc.add(framec)
+    gif.close()
+    gifc.close()
+
+    pool.close()
+    pool.join()
+
+
+class IndexAccumulator:  # class for aggregation of impact and deposit indicator indices while model runs complete:
+
+    def __init__(self, pf, ascpath, thresholds, model, kflag):
+        self.pf = pf
+        self.ascpath = ascpath
+        self.thresholds = [float(thresholds[0]), float(thresholds[1]), float(thresholds[2])]
+        self.model = model
+        self.kflag = kflag
+        self.header = None  # ascii header of result rasters
+        self.iii = []  # counts for impact indicator indices (flow height, kinetic energy, pressure)
+        self.dii = None  # counts for deposit indicator index
+        self.nsuccess = 0  # number of successful simulations
+        self.previous = None  # impact indicator index (flow height) at last check of convergence
+
+    def add(self, jid, csuccess):  # updating indices with results of one model run
+
+        pf = self.pf
+        jfill = str(jid).zfill(6)  # formatting model run string
+
+        if not csuccess == 1:
+
+            if self.kflag:
+                grass.mapcalc('"%s_iis%s"=0' % (pf, jfill), overwrite=True, quiet=True)  # impact indicator score map
+                grass.mapcalc('"%s_dis%s"=0' % (pf, jfill), overwrite=True, quiet=True)  # deposit indicator score map
+            return
+
+        self.nsuccess += 1  # updating number of successful simulations
+
+        rmax = []
+        for j in range(0, 3):
+            self.header, rdata = readraster(self.ascpath + pf + mstring[j] + "_max" + str(jid))  # maximum flow height, kinetic energy, pressure
+            rmax.append(rdata)
+        rfin = readraster(self.ascpath + pf + "_hflow_fin" + str(jid))[1]  # final flow height
+        rbase = readraster(self.ascpath + pf + "_basechange_fin" + str(jid))[1]  # final change of basal topography
+
+        if numpy.nanmin(rbase) == 0 and numpy.nanmax(rbase) == 0:
+            rdep = rfin  # simulated height of deposition
+        else:
+            rdep = numpy.where(numpy.isnan(rbase), numpy.nan, numpy.where(rbase > 0, rbase, 0))
+
+        if not self.iii:
+            for j in range(0, 3):
+                self.iii.append(numpy.zeros(rmax[j].shape, dtype=numpy.float32))
+            self.dii = numpy.zeros(rdep.shape, dtype=numpy.float32)
+
+        for j in range(0, 3):  # updating impact indicator index counts (no data propagates as in r.mapcalc)
+            self.iii[j] += numpy.where(rmax[j] > self.thresholds[j], 1, 0)
+            self.iii[j][numpy.isnan(rmax[j])] = numpy.nan
+        self.dii += numpy.where(rdep > self.thresholds[0], 1, 0)  # updating deposit indicator index counts
+        self.dii[numpy.isnan(rdep)] = numpy.nan
+
+        # Input for aimec
+
+        writeasc(pf + "_results/" + pf + "_aimec/depth/" + jfill, self.header, 
+            numpy.where(rmax[0] >= self.thresholds[0], rmax[0], numpy.where(numpy.isnan(rmax[0]), numpy.nan, 0)))  # constrained maximum flow height
+        writeasc(pf + "_results/" + pf + "_aimec/pressure/" + jfill, self.header, 
+            numpy.where(rmax[1] >= self.thresholds[1], rmax[1], numpy.where(numpy.isnan(rmax[1]), numpy.nan, 0)))  # constrained maximum flow kinetic energy
+
+        if self.kflag:  # importing result maps of model run:
+
+            if self.model <= 3:
+                mstringlist = ["_hflow_max", "_hflow_fin", "_vflow_max", "_tflow_max", "_pflow_max", "_basechange_fin", "_treach"]
+            else:
+                mstringlist = ["_hflow_max", "_hflow_fin", "_vflow1_max", "_vflow2_max", "_vflow3_max", "_tflow_max", "_pflow_max", "_basechange_fin", "_treach"]
+
+            for mstringi in mstringlist:
+                grass.run_command("r.in.gdal", input=rastfile(self.ascpath + pf + mstringi + str(jid)), output=pf + mstringi + str(jid), overwrite=True)  # importing map
+
+            writeasc(self.ascpath + pf + "_hflow_dep" + str(jid), self.header, rdep)
+            grass.run_command("r.in.gdal", input=self.ascpath + pf + "_hflow_dep" + str(jid) + ".asc", output=pf + "_hflow_dep" + str(jid), overwrite=True)
+            os.remove(self.ascpath + pf + "_hflow_dep" + str(jid) + ".asc")
+
+            grass.mapcalc('"%s_iis%s"=if("%s_hflow_max%s">%s,1,0)'% (pf, jfill, pf, str(jid), self.thresholds[0]), overwrite=True, quiet=True)  # impact indicator score map
+            grass.mapcalc('"%s_dis%s"=if("%s_hflow_dep%s">%s,1,0)'% (pf, jfill, pf, str(jid), self.thresholds[0]), overwrite=True, quiet=True)  # deposit indicator score map
+
+    def change(self):  # maximum absolute change of impact indicator index (flow height) since last call (None if not available)
+
+        if self.nsuccess == 0:
+            return None
+
+        current = self.iii[0] / float(self.nsuccess)
+        if self.previous is None:
+            change = None
+        else:
+            change = float(numpy.nanmax(numpy.abs(current - self.previous)))
+        self.previous = current
+        return change
+
+    def finalize(self):  # writing and importing index maps
+
+        pf = self.pf
+        inames = [pf + "_iii" + mstring[0], pf + "_iii" + mstring[1], pf + "_iii" + mstring[2], pf + "_dii"]
+
+        if self.nsuccess == 0:  # no successful simulation, indices are undefined:
+
+            for iname in inames:
+                grass.mapcalc('"%s"=null()' % iname, overwrite=True, quiet=True)
+                grass.run_command("r.out.gdal", input=iname, output=self.ascpath + iname + ".asc", format="AAIGrid", overwrite=True)
+                corrasc(self.ascpath + iname)
+            return
+
+        icounts = self.iii + [self.dii]
+        for i in range(0, 4):
+            writeasc(self.ascpath + inames[i], self.header, icounts[i] / float(self.nsuccess), fmt="%.6f")  # exporting index map to ascii
+            grass.run_command("r.in.gdal", input=self.ascpath + inames[i] + ".asc", output=inames[i], overwrite=True)  # importing index map
+
+
+class ResultCache:  # class for reusing results of identical single model runs:
+
+    def __init__(self, cachepath, cachesize, links=False):
+        self.cachepath = cachepath  # directory of cache
+        self.cachesize = cachesize * 1048576  # maximum size of cache (bytes)
+        self.links = links  # results shared with cache as read-only hard links instead of copies
+        if not os.path.exists(cachepath):
+            os.makedirs(cachepath)
+
+    def copyfile(self, src, dst):  # copying file as reflink where supported by the file system (blocks shared until modified)
+        fsrc = open(src, "rb")
+        fdst = open(dst, "wb")
+        try:
+            fcntl.ioctl(fdst.fileno(), 0x40049409, fsrc.fileno())  # FICLONE
+        except OSError:
+            shutil.copyfileobj(fsrc, fdst, 1048576)
+        fsrc.close()
+        fdst.close()
+        return dst
+
+    def hashfile(self, fhash, fname):  # updating hash with content of file
+        fhash.update(fname.encode())
+        fin = open(fname, "rb")
+        for fblock in iter(lambda: fin.read(1048576), b""):
+            fhash.update(fblock)
+        fin.close()
+
+    def key(self, paramfile):  # key of model run: parameter file, region, input raster maps and files, solver
+
+        fhash = hashlib.sha256()
+        self.hashfile(fhash, paramfile)
+        fhash.update(grass.region_env().encode())
+        fhash.update(os.environ.get("XFORMAT", "0").encode())  # format of output raster maps
+        fhash.update(os.environ.get("XVTK", "0").encode())  # format of virtual reality output
+
+        solver = which("r.avaflow.main")
+        if solver:
+            fhash.update(("%s %s" % (os.path.getsize(solver), os.path.getmtime(solver))).encode())
+
+        fparam = open(paramfile, "r")
+        pvalues = fparam.read().split()
+        fparam.close()
+
+        for pvalue in pvalues:  # input raster maps and files referenced in parameter file
+            for pname in pvalue.split(","):
+                if "@" in pname:
+                    mname, mset = pname.split("@", 1)
+                else:
+                    mname, mset = pname, mainmapset
+                mpath = locpath + "/" + mset
+                if mname and os.path.isfile(mpath + "/cellhd/" + mname):
+                    for mdir in ["cellhd", "cell", "fcell"]:
+                        if os.path.isfile(mpath + "/" + mdir + "/" + mname):
+                            self.hashfile(fhash, mpath + "/" + mdir + "/" + mname)
+                    if os.path.isdir(mpath + "/cell_misc/" + mname):
+                        for mfile in sorted(os.listdir(mpath + "/cell_misc/" + mname)):
+                            self.hashfile(fhash, mpath + "/cell_misc/" + mname + "/" + mfile)
+                elif pname and os.path.isfile(pname):
+                    self.hashfile(fhash, pname)
+
+        return fhash.hexdigest()
+
+    def fetch(self, ckey, target):  # materializing cached results as writable copies (or hard links), returning False if not cached
+
+        cpath = self.cachepath + "/" + ckey
+        if not os.path.isfile(cpath + "/size"):
+            return False
+
+        if os.path.exists(target):
+            shutil.rmtree(target)
+        for croot, cdirs, cfiles in os.walk(cpath + "/results"):
+            troot = target + croot[len(cpath + "/results"):]
+            os.makedirs(troot, exist_ok=True)
+            for cfile in cfiles:
+                if self.links:
+                    try:
+                        os.chmod(croot + "/" + cfile, 0o444)  # protecting cached file shared through hard link
+                        os.link(croot + "/" + cfile, troot + "/" + cfile)
+                        continue
+                    except OSError:
+                        pass
+                self.copyfile(croot + "/" + cfile, troot + "/" + cfile)
+
+        os.utime(cpath)  # marking entry as recently used
+        return True
+
+    def store(self, ckey, source):  # adding results to cache and evicting least recently used entries
+
+        cpath = self.cachepath + "/" + ckey
+        if os.path.exists(cpath):
+            shutil.rmtree(cpath)
+        shutil.copytree(source, cpath + "/results", copy_function=self.copyfile)
+
+        csize = 0
+        for croot, cdirs, cfiles in os.walk(cpath + "/results"):
+            for cfile in cfiles:
+                if self.links:
+                    os.chmod(croot + "/" + cfile, 0o444)  # protecting cached files shared through hard links
+                csize += os.path.getsize(croot + "/" + cfile)
+        fsize = open(cpath + "/size", "w")
+        fsize.write(str(csize))
+        fsize.close()
+
+        self.evict()
+
+    def evict(self):  # removing least recently used entries exceeding maximum size of cache
+
+        centries = []
+        for ckey in os.listdir(self.cachepath):
+            if os.path.isfile(self.cachepath + "/" + ckey + "/size"):
+                fsize = open(self.cachepath + "/" + ckey + "/size", "r")
+                centries.append([os.path.getmtime(self.cachepath + "/" + ckey), int(fsize.read()), ckey])
+                fsize.close()
+        centries.sort(reverse=True)
+
+        ctotal = 0
+        for centry in centries:
+            ctotal += centry[1]
+            if ctotal > self.cachesize:
+                shutil.rmtree(self.cachepath + "/" + centry[2])
+
+
+class RuntimePredictor:  # class for predicting wall time of model runs from earlier model runs of the same project:
+
+    def __init__(self, historypath, model, lmax, ncells, vrelease, nhistory=500):
+        self.historypath = historypath  # file with parameters and wall times of earlier model runs of the project
+        self.config = str(model) + "_" + str(lmax)  # model and number of flow parameters
+        self.ncells = ncells  # number of cells of region
+        self.vrelease = vrelease  # release volume without variation (m3)
+        self.nhistory = nhistory  # maximum number of model runs kept in history
+        self.coef = None  # regression coefficients of logarithm of wall time
+
+        rows = []
+        if os.path.exists(historypath):
+            fhistory = open(historypath, "r")
+            for line in fhistory:
+                fields = line.split()
+                if len(fields) == lmax + 5 and fields[0] == self.config:
+                    rows.append(list(map(float, fields[1:])))
+            fhistory.close()
+        rows = rows[-nhistory:]
+
+        if len(rows) > lmax + 4:  # fitting log-linear model (grid size and release volume as baselines, flow parameters)
+            rows = numpy.array(rows)
+            self.coef = numpy.linalg.lstsq(self.features(rows[:, :-1]), numpy.log(numpy.maximum(rows[:, -1], 0.01)), rcond=None)[0]
+
+    def features(self, values):  # design matrix: constant, logarithms of number of cells, release volume and entrainment variation, flow parameters
+        return numpy.column_stack((numpy.ones(len(values)), numpy.log(numpy.maximum(values[:, 0:3], 0.0001)), values[:, 3:]))
+
+    def values(self, member):
+        return [self.ncells, self.vrelease * float(member["vhrelease"]), float(member["vhentrmax"])] + list(member["flowparam"])
+
+    def predict(self, member):  # expected logarithm of wall time, or baseline (cells times release volume) without sufficient history
+        if self.coef is None:
+            return math.log(self.ncells * max(self.vrelease * float(member["vhrelease"]), 0.0001))
+        return float(numpy.dot(self.features(numpy.array([self.values(member)])), self.coef)[0])
+
+    def record(self, member):  # adding completed model run to history (keeping the latest model runs only)
+        if not os.path.exists(os.path.dirname(self.historypath)):
+            os.makedirs(os.path.dirname(self.historypath))
+        lines = []
+        if os.path.exists(self.historypath):
+            fhistory = open(self.historypath, "r")
+            lines = fhistory.readlines()
+            fhistory.close()
+        lines.append(self.config + "\t" + "\t".join(map(str, self.values(member) + [member["runtime"]])) + "\n")
+        fhistory = open(self.historypath + ".tmp", "w")
+        fhistory.writelines(lines[-self.nhistory:])
+        fhistory.close()
+        os.replace(self.historypath + ".tmp", self.historypath)
+
+
+def readsteps(filepath, pf, jid):  # function for reading number of output steps and computational time steps of model run:
+
+    nout = None
+    nsum = None
+    if os.path.exists(filepath + pf + "_nout" + str(jid) + ".txt"):
+        ftimesteps = open(filepath + pf + "_nout" + str(jid) + ".txt", "r")
+        nout = int(ftimesteps.readline())  # number of output steps
+        ftimesteps.close()
+    if os.path.exists(filepath + pf + "_summary" + str(jid) + ".txt"):
+        fsummary = open(filepath + pf + "_summary" + str(jid) + ".txt", "r")
+        for line in fsummary:  # last line of summary contains number of computational time steps
+            fields = line.split("\t")
+            if len(fields) > 1 and fields[0].isdigit() and fields[1].isdigit():
+                nsum = int(fields[1])
+        fsummary.close()
+    return nout, nsum
+
+
+def outputsize(dirpaths, pf, jid):  # function for summing up size of output files of model run (MB):
+
+    nbytes = 0
+    for dirpath in dirpaths:
+        if not os.path.isdir(dirpath):
+            continue
+        for entry in os.scandir(dirpath):  # output files named with prefix, name of output (ending with letter) and id of model run
+            stem = entry.name.split(".")[0]
+            if stem.startswith(pf + "_") and stem.endswith(str(jid)) and stem[:-len(str(jid))][-1:].isalpha() and entry.is_file():
+                nbytes += entry.stat().st_size
+    return round(nbytes / 1048576.0, 1)
+
+
+def writeruns(runspath, members):  # function for writing table of resource usage of multiple model runs:
+
+    frun = open(runspath, "w")
+    print("jid\tstatus\twalltime\tusertime\tsystime\tmaxrss\toutputsteps\ttimesteps\twritten", file=frun)
+    for member in members:
+        if "resources" in member:
+            print("%s\t%s\t%.2f\t%.2f\t%.2f\t%.1f\t%s\t%s\t%.1f" % (member["jid"], member["status"], member["runtime"], member["resources"]["usertime"], 
+                member["resources"]["systime"], member["resources"]["maxrss"], member["resources"]["outputsteps"], member["resources"]["timesteps"],
+                member["resources"]["written"]), file=frun)  # times in s, memory and output in MB
+    frun.close()
+
+
+def writemanifest(manifestpath, manifest):  # function for writing manifest of multiple model runs (replacing the file at once)
+
+    fmanifest = open(manifestpath + ".tmp", "w")
+    json.dump(manifest, fmanifest, indent=1)
+    fmanifest.close()
+    os.replace(manifestpath + ".tmp", manifestpath)
+
+
+def exportortho(ortho_c1, ortho_c2, ortho_c3, ortho_c4, ortho_c5, ortho_c6, ascpath):  # function for staging the orthophoto channels (once for all model runs)
+
+   try: grass.parse_command("g.rename", rast=(ortho_c4, ortho_c1))
+   except: test=0
+   try: grass.parse_command("g.rename", rast=(ortho_c5, ortho_c2))
+   except: test=0
+   try: grass.parse_command("g.rename", rast=(ortho_c6, ortho_c3))
+   except: test=0
+
+   for ortho_c in [ortho_c1, ortho_c2, ortho_c3]:
+       grass.run_command("r.out.gdal", input=ortho_c, output=ascpath + ortho_c + ".asc", format="AAIGrid", overwrite=True)
+       corrasc(ascpath + ortho_c)
+
+
 def writeparam(jid, aflag, eflag, kflag, mflag, tflag, vflag, pf, cores, cellsize, phases, gravity, limiter, layers, controls, aoicoords, 
    elevation, hrelease, rhrelease1, vhrelease, vhrlx, hrelease1, hrelease2, hrelease3, trelease, trelstop, tslide, stoptime, vinx, viny, vinx1, viny1, vinx2, viny2, vinx3, viny3, 
    hentrmax, rhentrmax1, vhentrmax, vhemx, hentrmax1, hentrmax2, hentrmax3, phi1, phi2, phi3, delta1, delta2, delta3, tufri, ny1, ny2, ny3, ambdrag, flufri, centr, cvshear, deltab, 
@@ -892,10 +1535,8 @@ def writeparam(jid, aflag, eflag, kflag, mflag, tflag, vflag, pf, cores, cellsiz
    adaptograph, frictiograph, transformograph, sampling, slidepar, cfl, times, slomo, thresholds, profile, ctrlpoints, reftime, phexagg, orthophoto, 
    lmax, nmesh, model, phasesnum, thresholdsc, tint, tstop, gt, ortho_c1, ortho_c2, ortho_c3, ortho_c4, ortho_c5, ortho_c6, visualization, ascpath):
 
-   if not mflag:
-       p1file = open(temppath + "/param1.txt", "w")  # opening parameter file for single model run
-   else:
-       p1file = open(temppath + "/param" + str(jid) + ".txt", "w")  # opening parameter file for multiple model runs
+   p1file = io.StringIO()  # collecting lines of parameter file
+   plines = {}  # lines of parameters varying among multiple model runs
 
    print(mainmapset, file=p1file)  # name of main mapset
    
@@ -940,6 +1581,7 @@ def writeparam(jid, aflag, eflag, kflag, mflag, tflag, vflag, pf, cores, cellsiz
    print(controls[9], file=p1file)  # control for input hydrograph management      
    print(controls[10], file=p1file)  # control for deceleration management
 
+   plines["maps"] = [p1file.getvalue().count("\n")]  # lines of names of input raster maps
    if elevation:
        print(elevation, file=p1file)  # name of elevation map
    else:
@@ -959,10 +1601,12 @@ def writeparam(jid, aflag, eflag, kflag, mflag, tflag, vflag, pf, cores, cellsiz
    else:
        print("None", file=p1file)
    if rhrelease1:
+       plines["rhrelease1"] = p1file.getvalue().count("\n")
        print(rhrelease1, file=p1file)  # fraction of PHASE 1 release height
    else:
        print("1.00", file=p1file)
    if vhrelease:
+       plines["vhrelease"] = p1file.getvalue().count("\n")
        print(vhrlx, file=p1file)  # variation of release height
    else:
        print("1.00", file=p1file)
@@ -1005,10 +1649,12 @@ def writeparam(jid, aflag, eflag, kflag, mflag, tflag, vflag, pf, cores, cellsiz
    else:
        print("None", file=p1file)
    if rhentrmax1:
+       plines["rhentrmax1"] = p1file.getvalue().count("\n")
        print(rhentrmax1, file=p1file)  # fraction of PHASE 1 maximum height of entrainment
    else:
        print("1.00", file=p1file)
    if vhentrmax:
+       plines["vhentrmax"] = p1file.getvalue().count("\n")
        print(vhemx, file=p1file)  # variation of maximum height of entrainment
    else:
        print("1.00", file=p1file)
@@ -1114,22 +1760,6 @@ def writeparam(jid, aflag, eflag, kflag, mflag, tflag, vflag, pf, cores, cellsiz
        print("None", file=p1file)
    if orthophoto:
    
-       try: grass.parse_command("g.rename", rast=(ortho_c4, ortho_c1))
-       except: test=0
-       try: grass.parse_command("g.rename", rast=(ortho_c5, ortho_c2))
-       except: test=0
-       try: grass.parse_command("g.rename", rast=(ortho_c6, ortho_c3))
-       except: test=0
-       
-       grass.run_command("r.out.gdal", input=ortho_c1, output=ascpath + ortho_c1 + ".asc", format="AAIGrid", overwrite=True)
-       corrasc(ascpath + ortho_c1)     
-
-       grass.run_command("r.out.gdal", input=ortho_c2, output=ascpath + ortho_c2 + ".asc", format="AAIGrid", overwrite=True)
-       corrasc(ascpath + ortho_c2)
-
-       grass.run_command("r.out.gdal", input=ortho_c3, output=ascpath + ortho_c3 + ".asc", format="AAIGrid", overwrite=True)
-       corrasc(ascpath + ortho_c3)
-   
        print(ortho_c1, file=p1file)  # name of orthophoto channel 1 map
        print(ortho_c2, file=p1file)  # name of orthophoto channel 2 map
        print(ortho_c3, file=p1file)  # name of orthophoto channel 3 map
@@ -1138,6 +1768,7 @@ def writeparam(jid, aflag, eflag, kflag, mflag, tflag, vflag, pf, cores, cellsiz
        print("None", file=p1file)
        print("None", file=p1file)
        print("None", file=p1file)
+   plines["maps"].append(p1file.getvalue().count("\n"))
 
    if hydrocoords:
        print(hydrocoords, file=p1file)  # hydrograph profile parameters
@@ -1165,6 +1796,7 @@ def writeparam(jid, aflag, eflag, kflag, mflag, tflag, vflag, pf, cores, cellsiz
        print("None", file=p1file)
 
    print(lmax, file=p1file)  # number of flow parameters
+   plines["flowparam"] = p1file.getvalue().count("\n")
    for l in range(0, lmax):
        print(round(gt[l], 10), file=p1file)  # flow parameters
 
@@ -1196,7 +1828,14 @@ def writeparam(jid, aflag, eflag, kflag, mflag, tflag, vflag, pf, cores, cellsiz
    for i in range(0, len(visualization)):
        print(visualization[i], file=p1file) #visualization parameter
 
-   p1file.close()  # closing parameter file
+   if not mflag:
+       pfile = open(temppath + "/param1.txt", "w")  # opening parameter file for single model run
+   else:
+       pfile = open(temppath + "/param" + str(jid) + ".txt", "w")  # opening parameter file for multiple model runs (jid 0 = shared by all model runs)
+   pfile.write(p1file.getvalue())
+   pfile.close()  # closing parameter file
+
+   return plines
 
 def main():  # starting main function
 
@@ -1206,10 +1845,14 @@ def main():  # starting main function
     eflag = flags["e"]
     kflag = flags["k"]
     mflag = flags["m"]
+    lflag = flags["l"]
+    rflag = flags["r"]
+    sflag = flags["s"]
     tflag = flags["t"]
     vflag = flags["v"]
     pf = options["prefix"]
     cores = options["cores"]
+    queue = options["queue"]
     cellsize = options["cellsize"]
     phases = options["phases"]
     gravity = options["gravity"]
@@ -1276,6 +1919,10 @@ def main():  # starting main function
     frictiograph = options["frictiograph"]
     transformograph = options["transformograph"]
     sampling = options["sampling"]
+    design = options["design"]
+    seed = options["seed"]
+    adaptive = options["adaptive"]
+    watchdog = options["watchdog"]
     slidepar = options["slidepar"]
     cfl = options["cfl"]
     times = options["time"]
@@ -1287,6 +1934,10 @@ def main():  # starting main function
     phexagg = options["phexagg"]
     orthophoto = options["orthophoto"]
     visualization = options["visualization"]
+    cache = options["cache"]
+    rformat = options["format"]
+    vrformat = options["vrformat"]
+    store = options["store"]
 
     # Prefix
     if not pf:
@@ -1469,6 +2120,41 @@ def main():  # starting main function
                 ErrorMessage("value provided for sampling")
             sampling=str(sampling)
 
+            if not design:
+                design = "random"
+            if seed:
+                try:
+                    seed = int(seed)
+                except ValueError:
+                    ErrorMessage("seed for random parameter sampling")
+                random.seed(seed)
+            else:
+                seed = None
+
+            if watchdog:
+                watchdog = list(map(str, watchdog.split(",")))
+                if len(watchdog) == 2:
+                    watchdog.append("60")
+                if len(watchdog) == 3:
+                    watchdog.append("3")
+                if not len(watchdog) == 4:
+                    ErrorMessage("watchdog parameters (maximum wall time, minimum simulated time per wall time, interval of checks, number of slow checks)")
+                try:
+                    watchdog = [float(watchdog[0]), float(watchdog[1]), float(watchdog[2]), int(watchdog[3])]
+                except ValueError:
+                    ErrorMessage("watchdog parameters")
+                if watchdog[3] < 1:
+                    ErrorMessage("number of slow checks of watchdog (at least 1)")
+
+            if adaptive:
+                adaptive = list(map(str, adaptive.split(",")))
+                if not len(adaptive) == 2 or not int(sampling) > 0:
+                    ErrorMessage("parameters for adaptive sampling (number of model runs per wave and tolerance, with random sampling only)")
+                try:
+                    adaptive = [int(adaptive[0]), float(adaptive[1])]
+                except ValueError:
+                    ErrorMessage("parameters for adaptive sampling")
+
         # Parameters for initial sliding
         if not slidepar:
             slidepar = "0,0,0"
@@ -1726,6 +2412,26 @@ def main():  # starting main function
                 ErrorMessage("number of cores")
             cores=str(cores)
 
+            if queue:  # distributed processing
+                queue = list(map(str, queue.split(",")))
+                if len(queue) == 1:
+                    queue.append(cores)
+                if len(queue) == 2:
+                    queue.append("120")
+                if not len(queue) == 3:
+                    ErrorMessage("queue parameters")
+                try:
+                    queue[1] = int(queue[1])
+                except ValueError:
+                    ErrorMessage("number of local workers")
+                try:
+                    queue[2] = float(queue[2])
+                except ValueError:
+                    ErrorMessage("heartbeat timeout of queue")
+                if queue[2] < 4.0:
+                    ErrorMessage("heartbeat timeout of queue (at least 4 s)")
+                queue[0] = os.path.abspath(os.path.expanduser(queue[0]))
+
         #Visualization parameters
         if not visualization:
             visualization = "0.1,5.0,5.0,1,100,2,-11000,9000,100,0.60,0.25,0.15,0.2,1.0,None,None,None"
@@ -1733,6 +2439,38 @@ def main():  # starting main function
         if not len(visualization) == 17:
             ErrorMessage("number of visualization parameters")
 
+        # Cache of results
+        if cache:
+            cache = list(map(str, cache.split(",")))
+            if len(cache) == 1:
+                cache.append("1000")
+            if len(cache) == 2:
+                cache.append("0")
+            if not len(cache) == 3:
+                ErrorMessage("cache parameters")
+            try:
+                cache[1] = float(cache[1])
+            except ValueError:
+                ErrorMessage("maximum size of cache")
+            if not cache[2] in ["0", "1"]:
+                ErrorMessage("reuse of cached results as hard links")
+            cache[2] = cache[2] == "1"
+
+        # Result store
+        if store:
+            store = list(map(str, store.split(",")))
+            if len(store) == 1:
+                store.append("256")
+            if len(store) == 2:
+                store.append("0")
+            if not len(store) == 3 or not store[0] in ["zlib", "lzma"]:
+                ErrorMessage("result store parameters (compression zlib or lzma, size of chunks, removal of stored raster maps)")
+            try:
+                store[1] = int(store[1])
+                store[2] = int(store[2])
+            except ValueError:
+                ErrorMessage("result store parameters")
+
     # Preparing environment
 
     print("1. PREPARING ENVIRONMENT.")
@@ -1743,6 +2481,19 @@ def main():  # starting main function
     os.environ["GRASS_VERBOSE"] = "-1"
     grass.run_command("g.gisenv", set="GRASS_VERBOSE=-1")  # suppressing errors and warnings (overruled for some functions)
 
+    if rformat == "bin":
+        os.environ["XFORMAT"] = "1"  # binary output raster maps of the model
+    else:
+        os.environ["XFORMAT"] = "0"  # ascii output raster maps of the model
+    if sflag:
+        os.environ["XSPARSE"] = "1"  # sparse snapshots of time steps
+    else:
+        os.environ["XSPARSE"] = "0"
+    if vrformat == "vtk":
+        os.environ["XVTK"] = "1"  # virtual reality output as vtk image data
+    else:
+        os.environ["XVTK"] = "0"  # virtual reality output as csv files
+
     ortho_c1 = pf + "_ortho.red"
     ortho_c2 = pf + "_ortho.green"
     ortho_c3 = pf + "_ortho.blue"
@@ -1754,7 +2505,15 @@ def main():  # starting main function
     ascpath = pf + "_results/" + pf + "_ascii/"  # path to directory with ascii rasters
     filepath = pf + "_results/" + pf + "_files/"  # path to directory with result text files
 
-    if eflag:  # for model execution mode:
+    manifestpath = filepath + pf + "_manifest.json"  # path to manifest of multiple model runs
+    resume = False
+    if eflag and mflag and rflag:
+        if os.path.exists(manifestpath):
+            resume = True  # keeping results of completed model runs
+        else:
+            print("No manifest of multiple model runs found, executing all model runs.")
+
+    if eflag and not resume:  # for model execution mode:
 
         if os.path.exists(pf + "_results"):
             os.system("rm -rf " + pf + "_results")  # if result directory already exists, deleting it
@@ -1773,6 +2532,8 @@ def main():  # starting main function
             os.mkdir(pf + "_results/" + pf + "_plots/" + pf + "_profiles_timesteps")  # creating directory for result profiles of all time steps
         os.mkdir(ascpath)  # creating directory for result ascii rasters
 
+    if eflag:
+
         # Defining GRASS region
 
         grass.run_command("g.region", flags="d")  # setting default region
@@ -1795,6 +2556,11 @@ def main():  # starting main function
         grass.run_command("g.region", flags="a", n=rnorth, s=rsouth, w=rwest, e=reast)  # updating bounds
         grass.run_command("g.region", flags="a", res=cellsize)  # updating cell size
 
+        # Staging inputs shared by all model runs
+
+        if orthophoto and not (resume and os.path.exists(ascpath + ortho_c3 + ".asc")):
+            exportortho(ortho_c1, ortho_c2, ortho_c3, ortho_c4, ortho_c5, ortho_c6, ascpath)  # orthophoto channels are exported once
+
         if not mflag:  # for single model run:
 
             jid = 0
@@ -1816,12 +2582,27 @@ def main():  # starting main function
 
             start = time.time()  # storing time (start of main computation)
 
-            os.environ["XINT"] = "1"  # exporting id of model run
-            grass.run_command("r.avaflow.main")  # executing r.avaflow
+            cached = False
+            if cache and not kflag:  # GRASS raster maps of model run cannot be restored from cache
+                resultcache = ResultCache(os.path.expanduser(cache[0]), cache[1], cache[2])
+                ckey = resultcache.key(temppath + "/param1.txt")
+                cached = resultcache.fetch(ckey, pf + "_results")
+                if cached:
+                    print("Results of identical model run taken from cache.")
+
+            if not cached:
+
+                os.environ["XINT"] = "1"  # exporting id of model run
+                grass.run_command("r.avaflow.main")  # executing r.avaflow
+
+                if cache and not kflag and os.path.exists(filepath + pf + "_nout1.txt"):
+                    resultcache.store(ckey, pf + "_results")  # caching results of completed model run
 
             stop = time.time()  # storing time (end of main computation)
             comptime = stop - start  # storing computational time in seconds
 
+            if os.path.exists(filepath + pf + "_time.txt"):
+                os.remove(filepath + pf + "_time.txt")  # not modifying cached file
             timefile = open(filepath + pf + "_time.txt", "w")
             timefile.write(str(comptime))  # writing computational time to file
             timefile.close()
@@ -1997,6 +2778,26 @@ def main():  # starting main function
                 lnrun = 0
                 ltest = 0
 
+            if int(sampling) > 0:  # design matrix for random sampling:
+
+                dnames = ["vhrelease", "vhentrmax"]  # varied parameters
+                if model == 7 and hrelease and rhrelease1:
+                    dnames.append("rhrelease1")
+                if model == 7 and hentrmax and rhentrmax1:
+                    dnames.append("rhentrmax1")
+                for l in range(0, lmax):
+                    dnames.append("flowparam" + str(l + 1))
+
+                dmatrix = sampledesign(design, nruns, len(dnames), seed)
+
+                if not resume:  # design of interrupted multiple model runs is kept
+                    fdesign = open(filepath + pf + "_design.txt", "w")  # writing design matrix to file
+                    print("jid\t" + "\t".join(dnames), file=fdesign)
+                    for jid in range(1, nruns + 1):
+                        print(str(jid) + "\t" + "\t".join(["%.6f" % dvalue for dvalue in dmatrix[jid - 1]]), file=fdesign)
+                    fdesign.close()
+
+            members = []  # parameter combinations of all model runs
             for jid in range(1, nruns + 1):  # loop over predefined number of randomized parameter combinations:
 
                 if jid < 10:
@@ -2039,7 +2840,7 @@ def main():  # starting main function
 
                 elif int(sampling) > 0:  # for random sampling:
 
-                    vhrl = round(random.uniform(float(vhrlmin), float(vhrlmax)), 2)  # variation of release height
+                    vhrl = round(float(vhrlmin) + dmatrix[jid - 1][0] * (float(vhrlmax) - float(vhrlmin)), 2)  # variation of release height
 
                 else:  # if OAT sampling is applied:
 
@@ -2068,7 +2869,7 @@ def main():  # starting main function
 
                 elif int(sampling) > 0:  # for random sampling:
 
-                    vhem = round(random.uniform(float(vhemmin), float(vhemmax)), 2)  # variation of maximum height of entrainment
+                    vhem = round(float(vhemmin) + dmatrix[jid - 1][1] * (float(vhemmax) - float(vhemmin)), 2)  # variation of maximum height of entrainment
 
                 else:  # if OAT sampling is applied:
 
@@ -2091,7 +2892,7 @@ def main():  # starting main function
 
                     elif int(sampling) > 0:  # for random sampling:
 
-                        rhrls = random.uniform(float(rhrlsmin), float(rhrlsmax))  # randomizing ratio of PHASE 1 release height
+                        rhrls = float(rhrlsmin) + dmatrix[jid - 1][dnames.index("rhrelease1")] * (float(rhrlsmax) - float(rhrlsmin))  # randomizing ratio of PHASE 1 release height
 
                     else:  # if OAT sampling is applied:
 
@@ -2119,7 +2920,7 @@ def main():  # starting main function
 
                     elif int(sampling) > 0:  # for random sampling:
 
-                        rhems = random.uniform(float(rhemsmin), float(rhemsmax))  # randomizing ratio of maximum PHASE 1 height of entrainment
+                        rhems = float(rhemsmin) + dmatrix[jid - 1][dnames.index("rhentrmax1")] * (float(rhemsmax) - float(rhemsmin))  # randomizing ratio of maximum PHASE 1 height of entrainment
 
                     else:  # for OAT sampling:
 
@@ -2154,7 +2955,8 @@ def main():  # starting main function
                 elif int(sampling) > 0:  # if random sampling is applied:
 
                     for l in range(0, lmax):
-                        gt.append(random.uniform(float(flowparam[2 * l]), float(flowparam[2 * l + 1])))  # randomizing flow and basal surface parameters
+                        gt.append(float(flowparam[2 * l]) + dmatrix[jid - 1][dnames.index("flowparam" + str(l + 1))]
+                            * (float(flowparam[2 * l + 1]) - float(flowparam[2 * l])))  # randomizing flow and basal surface parameters
 
                 else:  # if OAT sampling is applied:
 
@@ -2170,12 +2972,60 @@ def main():  # starting main function
                         lnrun = 0
                         ltest += 1
 
-                writeparam(jid, aflag, eflag, kflag, mflag, tflag, vflag, pf, cores, cellsize, phases, gravity, limiter, layers, controls, aoicoords, 
-                    elevation, hrelease, rhrls, vhrelease, vhrl, hrelease1, hrelease2, hrelease3, trelease, trelstop, tslide, stoptime, vinx, viny, vinx1, viny1, vinx2, viny2, vinx3, viny3, 
-                    hentrmax, rhems, vhentrmax, vhem, hentrmax1, hentrmax2, hentrmax3, phi1, phi2, phi3, delta1, delta2, delta3, tufri, ny1, ny2, ny3, ambdrag, flufri, centr, cvshear, deltab, 
-                    ctrans12, ctrans13, ctrans23, zones, impactarea, hdeposit, hydrograph, hydrocoords, density, friction, viscosity, basal, transformation, special, dynfric, 
-                    adaptograph, frictiograph, transformograph, sampling, slidepar, cfl, times, slomo, thresholds, profile, ctrlpoints, reftime, phexagg, orthophoto, 
-                    lmax, nmesh, model, phasesnum, thresholdsc, tint, tstop, gt, ortho_c1, ortho_c2, ortho_c3, ortho_c4, ortho_c5, ortho_c6, visualization, ascpath)
+                members.append({"jid": jid, "vhrelease": vhrl, "vhentrmax": vhem, "rhrelease1": rhrls, "rhentrmax1": rhems, "flowparam": gt,
+                    "status": "pending", "runtime": None, "outputs": []})  # parameter combination of model run
+
+            # Manifest of model runs
+
+            if resume:  # applying parameter combinations and states of the interrupted multiple model runs:
+
+                fmanifest = open(manifestpath, "r")
+                manifest = json.load(fmanifest)
+                fmanifest.close()
+                members = manifest["members"]
+                ipar = manifest["ipar"]
+                nruns = len(members)
+
+            else:
+                manifest = {"sampling": sampling, "design": design, "seed": seed, "nruns": nruns, "ipar": ipar, "members": members}
+
+            writemanifest(manifestpath, manifest)
+
+            vhrl = members[0]["vhrelease"]
+            vhem = members[0]["vhentrmax"]
+            rhrls = members[0]["rhrelease1"]
+            rhems = members[0]["rhentrmax1"]
+            gt = members[0]["flowparam"]
+
+            plines = writeparam(0, aflag, eflag, kflag, mflag, tflag, vflag, pf, cores, cellsize, phases, gravity, limiter, layers, controls, aoicoords, 
+                elevation, hrelease, rhrls, vhrelease, vhrl, hrelease1, hrelease2, hrelease3, trelease, trelstop, tslide, stoptime, vinx, viny, vinx1, viny1, vinx2, viny2, vinx3, viny3, 
+                hentrmax, rhems, vhentrmax, vhem, hentrmax1, hentrmax2, hentrmax3, phi1, phi2, phi3, delta1, delta2, delta3, tufri, ny1, ny2, ny3, ambdrag, flufri, centr, cvshear, deltab, 
+                ctrans12, ctrans13, ctrans23, zones, impactarea, hdeposit, hydrograph, hydrocoords, density, friction, viscosity, basal, transformation, special, dynfric, 
+                adaptograph, frictiograph, transformograph, sampling, slidepar, cfl, times, slomo, thresholds, profile, ctrlpoints, reftime, phexagg, orthophoto, 
+                lmax, nmesh, model, phasesnum, thresholdsc, tint, tstop, gt, ortho_c1, ortho_c2, ortho_c3, ortho_c4, ortho_c5, ortho_c6, visualization, ascpath)  # parameter file shared by all model runs
+            writeparamtab(temppath + "/paramtab.bin", plines, members, lmax)  # parameter values of the individual model runs
+
+            fparam = open(temppath + "/param0.txt", "r")
+            maps = fparam.read().split("\n")[plines["maps"][0]:plines["maps"][1]]
+            fparam.close()
+            maps = [mapname for mapname in maps if not mapname in ["None", ""] and grass.find_file(mapname, element="cell")["file"]]
+            region = grass.region()
+            writeinputcache(temppath + "/inputs.bin", sorted(set(maps)), int(region["rows"]), int(region["cols"]), lambda mapname, binname: 
+                grass.run_command("r.out.bin", flags="f", input=mapname, output=binname, bytes=4, null=-9999, overwrite=True))  # input raster maps are read once for all model runs
+
+            nameList = []  # model runs to be executed
+            for member in members:
+
+                if member["status"] in ["success", "failure", "killed", "cancelled"]:  # model run already completed or not needed
+                    continue
+                member["status"] = "pending"
+                jid = member["jid"]
+                nameList.append(jid)
+                if os.path.exists(filepath + pf + "_nout" + str(jid) + ".txt"):
+                    os.remove(filepath + pf + "_nout" + str(jid) + ".txt")  # removing result of interrupted model run
+
+                if lflag or queue:  # model runs are executed directly in the current mapset, no batch file needed
+                    continue
 
                 # Creating batch file
 
@@ -2201,144 +3051,126 @@ export rwest=%s
 export reast=%s
 export rtemp=%s
 export GRASS_BATCH_JOB=%s/r.avaflow.mult
-cp %s/*.txt %s/map%s/.tmp/rtemp/
+export XTAB=%s/paramtab.bin
+export XCACHE=%s/inputs.bin
 %s --text %s/map%s --exec $GRASS_BATCH_JOB
 unset GRASS_BATCH_JOB"""
-                    % (jid, cellsize, rnorth, rsouth, rwest, reast, temppath, scriptpath2, temppath, locpath, jid, bingrass, locpath, jid), file=out)  # creating batch file
+                    % (jid, cellsize, rnorth, rsouth, rwest, reast, temppath, scriptpath2, temppath, temppath, bingrass, locpath, jid), file=out)  # creating batch file
 
                 out.close()  # closing batch file
                 fd = os.open(strtmp + str(jid), os.O_RDONLY)  # opening batch file
                 os.fchmod(fd, 0o755)  # making batch file executable
                 os.close(fd)  # closing batch file
 
+            if resume:
+                print("Resuming multiple model runs: %s out of %s model runs to be executed." % (str(len(nameList)), str(nruns)))
+
             # Executing batch processing
 
             start_batch = time.time()  # storing time (start of multi-core processing)
 
-            neff = min(ncores, nruns)
-            threadList = list(range(1, neff + 1))
-            nameList = list(range(1, nruns + 1))
-            threads = []
-            for tName in threadList:
-                thread = myThread(tName, workQueue)
-                thread.start()
-                threads.append(thread)
-            queueLock.acquire()
-            for word in nameList:
-                workQueue.put(word)
-            queueLock.release()
-            while not workQueue.empty():
-                pass
-            global exitFlag
-            exitFlag = 1
-            for t in threads:
-                t.join()
+            accumulator = IndexAccumulator(pf, ascpath, thresholds, model, kflag)
+
+            for member in members:  # aggregating model runs completed before resuming
+                if member["status"] == "success":
+                    accumulator.add(member["jid"], 1)
+                elif member["status"] in ["failure", "killed"]:
+                    accumulator.add(member["jid"], 0)
+
+            ncompleted = [0]  # number of model runs completed in this session
+            region = grass.region()
+            vrelease = 0.0  # release volume without variation
+            for rmap in [hrelease, hrelease1, hrelease2, hrelease3]:
+                if rmap:
+                    vrelease += float(grass.parse_command("r.univar", flags="g", map=rmap)["sum"]) * float(region["nsres"]) * float(region["ewres"])
+            predictor = RuntimePredictor(os.path.expanduser("~/.avaflow/runtimes/" + ambvars.LOCATION_NAME + "_" + pf + ".txt"), model, lmax, 
+                int(region["rows"]) * int(region["cols"]), vrelease)
+
+            def RunLaunched(jid):  # function for updating manifest when model run is started:
+                members[jid - 1]["status"] = "running"
+                writemanifest(manifestpath, manifest)
+
+            def RunCompleted(jid, status):  # function for aggregation of model run as soon as it is completed:
+                csuccess = -1
+                if status == 0 and os.path.exists(filepath + pf + "_nout" + str(jid) + ".txt"):
+                    ftimesteps = open(filepath + pf + "_nout" + str(jid) + ".txt", "r")  # opening file with number of time steps and success
+                    ftimesteps.readline()  # number of time steps is not needed
+                    csuccess = int(ftimesteps.readline().replace("\n", ""))  # reading control for success of simulation
+                    ftimesteps.close()
+                if jid in scheduler.killed:
+                    csuccess = 0  # model run terminated by watchdog is treated as numerical failure
+                accumulator.add(jid, csuccess)
+
+                member = members[jid - 1]
+                if jid in scheduler.killed:
+                    member["status"] = "killed"
+                    member["killed"] = scheduler.killed[jid]  # reason for termination
+                elif csuccess == 1:
+                    member["status"] = "success"
+                elif csuccess == 0:
+                    member["status"] = "failure"  # numerical failure
+                else:
+                    member["status"] = "error"  # model run terminated without result
+                member["runtime"] = round(scheduler.runtime[jid], 2)
+                member["outputs"] = [rastfile(ascpath + pf + mstringi + str(jid)) for mstringi in ["_hflow_max", "_hflow_fin", "_tflow_max", "_pflow_max", 
+                    "_basechange_fin", "_treach"] if os.path.exists(rastfile(ascpath + pf + mstringi + str(jid)))]
+                if os.path.exists(filepath + pf + "_nout" + str(jid) + ".txt"):
+                    member["outputs"].append(filepath + pf + "_nout" + str(jid) + ".txt")
+
+                rusage = scheduler.usage[jid]
+                noutsteps, ntimesteps = readsteps(filepath, pf, jid)
+                member["resources"] = {"usertime": round(rusage.ru_utime, 2), "systime": round(rusage.ru_stime, 2), 
+                    "maxrss": round(rusage.ru_maxrss / 1024.0, 1), "outputsteps": noutsteps, "timesteps": ntimesteps, 
+                    "written": outputsize([ascpath, filepath, pf + "_results/" + pf + "_aimec/"], pf, jid)}  # resource usage of model run (s, MB)
+
+                if status == 0:
+                    predictor.record(member)
+
+                ncompleted[0] += 1
+                if adaptive and ncompleted[0] % adaptive[0] == 0:  # checking convergence of impact indicator index after each wave:
+
+                    ichange = accumulator.change()
+                    if not ichange is None:
+                        print("Maximum change of impact indicator index after %s model runs: %.4f" % (str(ncompleted[0]), ichange))
+                        if ichange <= adaptive[1]:
+                            for cjid in scheduler.cancel():
+                                members[cjid - 1]["status"] = "cancelled"  # model run not needed
+                            print("Impact indicator index converged, queued model runs cancelled.")
+
+                writemanifest(manifestpath, manifest)
+
+            if queue:
+                scheduler = QueueScheduler(temppath, queue[0], queue[1], RunCompleted, grass.region_env(), RunLaunched, queue[2], watchdog, float(tstop))
+            elif lflag:
+                scheduler = BatchScheduler(temppath, min(ncores, max(1, len(nameList))), RunCompleted, grass.region_env(), RunLaunched, watchdog, float(tstop))
+            else:
+                scheduler = BatchScheduler(temppath, min(ncores, max(1, len(nameList))), RunCompleted, None, RunLaunched, watchdog, float(tstop))
+            if not adaptive:  # dispatching model runs with longest expected wall time first
+                nameList.sort(key=lambda jid: -predictor.predict(members[jid - 1]))
+            for jid in nameList:
+                scheduler.submit(jid)
+            try:
+                batchstatus = scheduler.run()  # executing model runs
+            except RuntimeError as err:  # no worker left for the queued model runs
+                ErrorMessage("queue (%s)" % err)
+
+            nfailed = [jid for jid in nameList if jid in batchstatus and not batchstatus[jid] == 0]
             print()
+            if nfailed:
+                print("Model runs with non-zero exit status: %s" % ", ".join(map(str, nfailed)))
             print("Batch processing completed.")
             print()
 
-            for jid in range(1, nruns + 1):
-                os.system("rm -rf " + locpath + "/map" + str(jid))  # removing mapsets for all model runs
+            if not lflag and not queue:
+                for jid in nameList:
+                    os.system("rm -rf " + locpath + "/map" + str(jid))  # removing mapsets for all model runs
 
             # Impact and deposition indicator indices
 
-            for j in range(0, 3):  # loop over all output parameters for wich impact indicator index should be derived:
-                grass.mapcalc('"%s_iii%s"=0' % (pf, mstring[j]), overwrite=True, quiet=True)  # initializing impact indicator index map
-            grass.mapcalc('"%s_dii"=0' % pf, overwrite=True, quiet=True)  # initializing deposit indicator index map
-
-            nsuccess = 0  # intitalizing counter for number of successful simulations
-            for jid in nameList:  # loop over all model runs:
-
-                ftimesteps = open(pf + "_results/" + pf + "_files/" + pf + "_nout" + str(jid) + ".txt", "r") # opening file with number of time steps and success
-                ftimesteps.readline()  # number of time steps is not needed
-                csuccess = (ftimesteps.readline())  # reading control for success of simulation
-                csuccess = int(csuccess.replace("\n", ""))  # removing newline
-                ftimesteps.close()  # closing file with number of time steps
-
-                if jid < 10:
-                    jfill = "00000" + str(jid)  # formatting model run string
-                elif jid < 100:
-                    jfill = "0000" + str(jid)
-                elif jid < 1000:
-                    jfill = "000" + str(jid)
-                elif jid < 10000:
-                    jfill = "00" + str(jid)
-                elif jid < 100000:
-                    jfill = "0" + str(jid)
-                else:
-                    jfill = str(jid)
-
-                if csuccess == 1:  # if simulation was successful:
-
-                    nsuccess = nsuccess + 1  # updating number of successful simulations
-
-                if model <= 3:
-                    mstringlist = ["_hflow_max", "_hflow_fin", "_vflow_max", "none", "none", "_tflow_max", "_pflow_max", "_basechange_fin", "_treach"]
-                elif model == 7:
-                    mstringlist = ["_hflow_max", "_hflow_fin", "_vflow1_max", "_vflow2_max", "_vflow3_max", "_tflow_max", "_pflow_max", "_basechange_fin", "_treach"]
-
-                if csuccess == 1:
-
-                    for mstringi in mstringlist:
-
-                        if not mstringi == "none":
-
-                            grass.run_command("r.in.gdal", input=ascpath + pf + mstringi + str(jid) + ".asc", output=pf + mstringi + str(jid), overwrite=True)  # importing map
-
-                    minval = grass.raster_info(pf + "_basechange_fin" + str(jid))["min"]  # minimum value of basal change
-                    maxval = grass.raster_info(pf + "_basechange_fin" + str(jid))["max"]  # maximum value of basal change
-
-                    if minval == 0 and maxval == 0:
-                        grass.mapcalc('"%s_hflow_dep%s"="%s_hflow_fin%s"' % (pf, str(jid), pf, str(jid)), overwrite=True, quiet=True) # simulated height of deposition map
-                    else:
-                        grass.mapcalc('"%s_hflow_dep%s"=if("%s_basechange_fin%s">0,"%s_basechange_fin%s",0)' % (pf, str(jid), pf, str(jid), pf, str(jid)), overwrite=True, quiet=True)
-
-                    grass.mapcalc('"%s_iis%s"=if("%s_hflow_max%s">%s,1,0)'% (pf, jfill, pf, str(jid), thresholds[0]), overwrite=True, quiet=True)  # impact indicator score map
-                    grass.mapcalc('"%s_dis%s"=if("%s_hflow_dep%s">%s,1,0)'% (pf, jfill, pf, str(jid), thresholds[0]), overwrite=True, quiet=True)  # deposit indicator score map
-
-                    for j in range(0, 3):  # loop over all output parameters for wich impact indicator index should be derived:
-
-                        grass.mapcalc('"%s_iii%s"=if("%s%s_max%s">%s,"%s_iii%s"+1,"%s_iii%s")' % (pf, mstring[j], pf, mstring[j], str(jid), thresholds[j], pf, mstring[j], pf, mstring[j]),
-                            overwrite=True, quiet=True)  # updating impact indicator index map
-
-                    grass.mapcalc('"%s_dii"=if("%s_hflow_dep%s">%s,"%s_dii"+1,"%s_dii")' % (pf, pf, str(jid), thresholds[0], pf, pf), 
-                        overwrite=True, quiet=True)  # updating deposit indicator index map
-
-                    # Input for aimec
-
-                    grass.mapcalc('"_hflowii"=if("%s_hflow_max%s">=%s,"%s_hflow_max%s",0)' % (pf, str(jid), thresholds[0], pf, str(jid)), overwrite=True, quiet=True)
-                        # constraining maximum flow height map
-                    grass.mapcalc('"_tflowii"=if("%s_tflow_max%s">=%s,"%s_tflow_max%s",0)' % (pf, str(jid), thresholds[1], pf, str(jid)), overwrite=True, quiet=True)
-                        # constraining maximum flow kinetic energy map
-
-                    grass.run_command("r.out.gdal", input="_hflowii", output=pf + "_results/" + pf + "_aimec/depth/" + jfill + ".asc", format="AAIGrid", overwrite=True)
-                        # exporting maximum flow height raster to ascii
-                    grass.run_command("r.out.gdal", input="_tflowii", output=pf + "_results/" + pf + "_aimec/pressure/" + jfill + ".asc", format="AAIGrid", overwrite=True)
-                        # exporting maximum flow kinetic energy raster to ascii
-
-                    corrasc(pf + "_results/" + pf + "_aimec/depth/" + jfill)
-                    corrasc(pf + "_results/" + pf + "_aimec/pressure/" + jfill)
-
-                else:
-                    grass.mapcalc('"%s_iis%s"=0' % (pf, jfill), overwrite=True, quiet=True)  # impact indicator score map
-                    grass.mapcalc('"%s_dis%s"=0' % (pf, jfill), overwrite=True, quiet=True)  # deposit indicator score map
-
-            # Finalizing impact indicator index maps
-
-            for j in range(0, 3):
-
-                grass.mapcalc('"%s_iii%s"=float("%s_iii%s")/float(%s)' % (pf, mstring[j], pf, mstring[j], str(nsuccess)), overwrite=True, quiet=True)
-
-                grass.run_command("r.out.gdal", input=pf + "_iii" + mstring[j], output=ascpath + pf + "_iii" + mstring[j] + ".asc", format="AAIGrid", 
-                    overwrite=True)  # exporting impact indicator index map to ascii
-                corrasc(ascpath + pf + "_iii" + mstring[j])
-
-            # Finalizing deposit indicator index map
-
-            grass.mapcalc('"%s_dii"=float("%s_dii")/float(%s)' % (pf, pf, str(nsuccess)), overwrite=True, quiet=True)
-
-            grass.run_command("r.out.gdal", input=pf + "_dii", output=ascpath + pf + "_dii.asc", format="AAIGrid", overwrite=True)  # exporting deposit indicator index map to ascii
-            corrasc(ascpath + pf + "_dii")
+            accumulator.finalize()
+            nsuccess = accumulator.nsuccess  # number of successful simulations
+            writeruns(filepath + pf + "_runs.txt", members)  # table of resource usage of model runs
+            ncancelled = len([member for member in members if member["status"] == "cancelled"])  # number of model runs cancelled after convergence
 
             # Input for aimec
 
@@ -2382,17 +3214,26 @@ unset GRASS_BATCH_JOB"""
         else:
             success = csuccess
 
+        try:
+            vcores = int(cores)  # number of processes for rendering of animations
+        except (TypeError, ValueError):
+            vcores = os.cpu_count() or 1
+
+        graph = TaskGraph(vcores)  # post-processing jobs
+        plotpath = pf + "_results/" + pf + "_plots/"  # path to directory with plots
+
         # Profile plots
 
         if profile and not mflag and success > 0:
 
-            subprocess.call("Rscript %s_results/%s_plots/r.avaflow.profile.R --slave --quiet" % (pf, pf), shell=True)  # creating profiles with R
+            pranges = framebounds(ntimesteps + 1, vcores)
+            for tfirst, tlast in pranges:
+                graph.add("profiles %s-%s" % (tfirst, tlast), "Rscript %sr.avaflow.profile.R %s %s --slave --quiet" % (plotpath, tfirst, tlast),
+                    outputs=[plotpath + pf + "_profiles_timesteps/%s-%s" % (tfirst, tlast)])  # creating profiles with R
 
             for j in [1, 2, 4,]:  # loop over all parameters to be displayed as bar plots:
 
-                pnames = []  # initializing list of map images
-                pnamesc = []  # initializing list of compressed profile images
-                pwidthc = 400  # defining width of compressed profile images
+                pnames = []  # initializing list of profile images
 
                 for step in range(0, ntimesteps + 1):  # loop over all time steps:
 
@@ -2405,48 +3246,34 @@ unset GRASS_BATCH_JOB"""
                     else:
                         fill = str(step)
 
-                    pimg = Image.open(pf + "_results/" + pf + "_plots/" + pf + "_profiles_timesteps/" + pf + mstring[j] + fill + ".png")  # opening profile image
-                    pheightc = int(float(pimg.size[1]) * float(pwidthc / float(pimg.size[0])))  # height of compressed profile image
-                    pimgc = pimg.resize((pwidthc, pheightc), Image.BILINEAR)  # compressed profile image
-                    pimgc.save(temppath + "/" + mstring[j] + "c" + fill + ".png")  # saving compressed profile image
-
-                    pnames.append(pf + "_results/" + pf + "_plots/" + pf + "_profiles_timesteps/" + pf + mstring[j] + fill + ".png") # updating list of profile images
-                    pnamesc.append(temppath + "/" + mstring[j] + "c" + fill + ".png")  # updating list of profile images
-
-                images = []
-
-                for nnn in pnames:
-                    frame = Image.open(nnn)
-                    frame = frame.convert("P", palette=Image.ADAPTIVE, colors=256)
-                    images.append(frame)
+                    pnames.append(plotpath + pf + "_profiles_timesteps/" + pf + mstring[j] + fill + ".png") # updating list of profile images
 
-                # Save the frames as an animated GIF
-                images[0].save(pf + "_results/" + pf + "_plots/" + pf + mstring[j] + "_profile.gif", save_all=True, append_images=images[1:], duration=200, loop=0)
-
-                images = []
-
-                for nnn in pnamesc:
-                    frame = Image.open(nnn)
-                    frame = frame.convert("P", palette=Image.ADAPTIVE, colors=256)
-                    images.append(frame)
-
-                # Save the frames as an animated GIF (reduced file size)
-                images[0].save(pf + "_results/" + pf + "_plots/" + pf + mstring[j] + "_profilec.gif", save_all=True, append_images=images[1:], duration=200, loop=0)
+                # Save the frames as animated GIFs (full and reduced file size)
+                graph.add("profile animation" + mstring[j], 
+                    lambda pnames=pnames, j=j: writeanimations(pnames, plotpath + pf + mstring[j] + "_profile", 400, max(1, vcores // 3)),
+                    inputs=[plotpath + pf + "_profiles_timesteps/%s-%s" % (tfirst, tlast) for tfirst, tlast in pranges],
+                    outputs=[plotpath + pf + mstring[j] + "_profile.gif"], ncores=max(1, vcores // 3))
 
         # Hydrograph plots
 
         if (hydrograph or hydrocoords) and not mflag and success > 0:
 
-                subprocess.call("Rscript %s_results/%s_plots/r.avaflow.hydrograph.R --slave --quiet" % (pf, pf), shell=True)  # creating hydrograph plot with R
+                graph.add("hydrographs", "Rscript %sr.avaflow.hydrograph.R --slave --quiet" % plotpath)  # creating hydrograph plot with R
 
         # Map plots
 
         if success > 0:
 
-            subprocess.call("Rscript %s_results/%s_plots/r.avaflow.map.R --slave --quiet" % (pf, pf), shell=True)  # creating maps with R
+            if sflag and not mflag:
+                graph.add("snapshots", lambda: densifysnapshots(ascpath, pf), outputs=[ascpath])  # raster maps of time steps needed for map plots
 
             if not mflag: # for single model run:
 
+                mranges = framebounds(ntimesteps + 2, vcores)
+                for tfirst, tlast in mranges:
+                    graph.add("maps %s-%s" % (tfirst, tlast), "Rscript %sr.avaflow.map.R %s %s --slave --quiet" % (plotpath, tfirst, tlast),
+                        inputs=[ascpath], outputs=[plotpath + pf + "_maps_timesteps/%s-%s" % (tfirst, tlast)])  # creating maps with R
+
                 jrange = [0]
                 if aflag:
                     jrange.append(1)
@@ -2455,15 +3282,12 @@ unset GRASS_BATCH_JOB"""
                     jrange.append(3)
                 if model == 7 and tflag:
                     jrange.append(5)
-                jrange.append(6)
 
                 for j in jrange:  # loop over all sets of maps to be used for animated gifs
 
                     mnames = []  # initializing list of map images
-                    mnamesc = []  # initializing list of compressed map images
-                    mwidthc = 640  # defining width of compressed map images
-            
-                    for i in range( 0, ntimesteps + 2 ):  # loop over all time steps plus one for maps of maximum values:
+
+                    for i in range( 0, ntimesteps + 1 ):  # loop over all time steps:
 
                         if i < 10:
                             fill = "000" + str(i)  # formatting model run string
@@ -2474,107 +3298,57 @@ unset GRASS_BATCH_JOB"""
                         else:
                             fill = str(i)
 
-                        if i <= ntimesteps and not j == 6:  # for all time steps (not maps of maximum value), prepare maps for animated gifs
-
-                            mimg = Image.open( pf + "_results/" + pf + "_plots/" + pf + "_maps_timesteps/" + pf + mstring[j] + fill + ".png" )  # opening map image
-                            mheightc = int(float( mimg.size[1]) * float( mwidthc / float(mimg.size[0] )))  # height of compressed map image
-                            mimgc = mimg.resize(( mwidthc, mheightc ), Image.BILINEAR )  # compressed map image
-                            mimgc.save( temppath + "/" + mstring[j] + "c" + fill + ".png" )  # saving compressed map image
-                            mnames.append( pf + "_results/" + pf + "_plots/" + pf + "_maps_timesteps/" + pf + mstring[j] + fill + ".png" ) # updating list of map images
-                            mnamesc.append( temppath + "/" + mstring[j] + "c" + fill + ".png" )  # updating list of compressed map images
-
-                    if not j == 6:
-
-                        images = []
-
-                        for nnn in mnames:
-                            frame = Image.open( nnn )
-                            frame = frame.convert( "P", palette=Image.ADAPTIVE, colors=256 )
-                            images.append( frame )
-
-                        # Save the frames as an animated GIF
-                        images[0].save( pf + "_results/" + pf + "_plots/" + pf + mstring[j] + "_map.gif", save_all=True, append_images=images[1:], duration=200, loop=0 )
-
-                        images = []
+                        mnames.append( plotpath + pf + "_maps_timesteps/" + pf + mstring[j] + fill + ".png" ) # updating list of map images
 
-                        for nnn in mnamesc:
-                            frame = Image.open( nnn )
-                            frame = frame.convert( "P", palette=Image.ADAPTIVE, colors=256 )
-                            images.append( frame )
-
-                        # Save the frames as an animated GIF
-                        images[0].save( pf + "_results/" + pf + "_plots/" + pf + mstring[j] + "_mapc.gif", save_all=True, append_images=images[1:], duration=200, loop=0 )
+                    # Save the frames as animated GIFs (full and reduced file size)
+                    graph.add("map animation" + mstring[j], 
+                        lambda mnames=mnames, j=j: writeanimations(mnames, plotpath + pf + mstring[j] + "_map", 640, max(1, vcores // len(jrange))),
+                        inputs=[plotpath + pf + "_maps_timesteps/%s-%s" % (tfirst, tlast) for tfirst, tlast in mranges],
+                        outputs=[plotpath + pf + mstring[j] + "_map.gif"], ncores=max(1, vcores // len(jrange)))
 
             else:  # for multiple model runs:
 
-                # Evaluation through ROC plots
-
-                if impactarea:
-
-                    grass.run_command("r.out.gdal", flags="c", input=impactarea, output=temppath + "/observed.asc", format="AAIGrid", overwrite=True)  
-                        # exporting map of observed impact area map to ascii raster
-                    grass.run_command("r.out.gdal", flags="c", input=pf + '_iii_hflow', output=temppath + "/xindex.asc", format="AAIGrid", overwrite=True)  
-                        # exporting impact indicator index map to ascii raster
-
-                    with open(temppath + "/xindex.asc", "r") as xfin:
-                        with open(temppath + "/index.asc", "w") as xfout:
-                            for line in xfin:
-                                xfout.write(line.replace("-nan", "0.0"))
-
-                    xfin.close()
-                    xfout.close()
-
-                    subprocess.call("Rscript %s_results/%s_plots/r.avaflow.roc.R %s %s %s %s %s --slave --quiet" % (pf, pf, temppath, pf, "1", "1", "1"), shell=True)
-                        # ROC plot relating iii to observation (without normalization)
-
-                    subprocess.call("Rscript %s_results/%s_plots/r.avaflow.roc.R %s %s %s %s %s --slave --quiet" % (pf, pf, temppath, pf, "2", "2", "1"), shell=True)
-                        # ROC plot relating iii to observation (with normalization)
+                graph.add("maps", "Rscript %sr.avaflow.map.R --slave --quiet" % plotpath)  # creating maps with R
 
-                if hdeposit:
+                # Evaluation through ROC plots
 
-                    grass.run_command("r.out.gdal", flags="c", input=hdeposit, output=temppath + "/observed.asc", format="AAIGrid", overwrite=True)  
-                        # exporting map of observed deposition height to ascii raster
-                    grass.run_command("r.out.gdal", flags="c", input=pf + '_dii', output=temppath + "/xindex.asc", format="AAIGrid", overwrite=True)  
-                        # exporting deposition indicator map to ascii raster
+                for observation, xindex, itype, imode in [[impactarea, pf + "_iii_hflow", "iii", 1], [hdeposit, pf + "_dii", "dii", 3]]:
 
-                    with open(temppath + "/xindex.asc", "r") as xfin:
-                        with open(temppath + "/index.asc", "w") as xfout:
-                            for line in xfin:
-                                xfout.write(line.replace("-nan", "0.0"))
+                    if not observation:
+                        continue
 
-                    xfin.close()
-                    xfout.close()
+                    observed = readmap(observation, temppath + "/observed.bin")  # observation
+                    index = readmap(xindex, temppath + "/index.bin")  # indicator index
 
-                    subprocess.call("Rscript %s_results/%s_plots/r.avaflow.roc.R %s %s %s %s %s --slave --quiet" % (pf, pf, temppath, pf, "3", "1", "2"), shell=True)
-                        # ROC plot relating dii to observation (without normalization)
+                    for normalization, nstring in [[1, ""], [2, "_n"]]:  # without and with normalization
 
-                    subprocess.call("Rscript %s_results/%s_plots/r.avaflow.roc.R %s %s %s %s %s --slave --quiet" % (pf, pf, temppath, pf, "4", "2", "2"), shell=True )
-                        # ROC plot relating dii to observation (with normalization)
+                        graph.add("roc " + itype + nstring, 
+                            lambda observed=observed, index=index, normalization=normalization, nstring=nstring, itype=itype, imode=imode:
+                                evaluateroc(index, observed, normalization, roccolours[imode + normalization - 2], plotpath + pf + "_roc_" + itype + nstring + ".png", 
+                                filepath + pf + "_roc_" + itype + nstring + ".txt", filepath + pf + "_averages.txt"),
+                            outputs=[plotpath + pf + "_roc_" + itype + nstring + ".png", filepath + pf + "_averages.txt"])  # ROC plot relating index to observation
 
                 # Producing graphics summarizing the evaluation results
 
+                multval = []
                 if eflag and mflag and impactarea:
-
-                    if sampling == "0" and len(ipar) == 2:
-
-                        subprocess.call("Rscript %s_results/%s_plots/r.avaflow.multval.R %s %s %s %s %s %s %s --slave --quiet"
-                            % (pf, pf, pf, str(model), str(nruns), str(ipar[0]), str(ipar[1]), "i", "0"), shell=True)
-
+                    multval.append(["i", "0"])
                 if eflag and mflag and hdeposit:
-
-                    if sampling == "0" and len(ipar) == 2:
-
-                        subprocess.call("Rscript %s_results/%s_plots/r.avaflow.multval.R %s %s %s %s %s %s %s --slave --quiet"
-                            % (pf, pf, pf, str(model), str(nruns), str(ipar[0]), str(ipar[1]), "d", "0"), shell=True)
-
+                    multval.append(["d", "0"])
                 if ctrlpoints and reftime:
+                    for ictrlpoint in range(1, len(ctrlpoints) // 2 + 1):
+                        multval.append(["t", str(ictrlpoint)])
+
+                if multval and sampling == "0" and len(ipar) == 2:
 
-                    if sampling == "0" and len(ipar) == 2:
+                    for obstype, ictrlpoint in multval:
 
-                        for ictrlpoint in range(1, len(ctrlpoints) / 2 + 1):
+                        graph.add("multval " + obstype + ictrlpoint, "Rscript %sr.avaflow.multval.R %s %s %s %s %s %s %s --slave --quiet"
+                            % (plotpath, pf, str(model), str(nruns), str(ipar[0]), str(ipar[1]), obstype, ictrlpoint),
+                            outputs=[filepath + pf + "_evaluation.txt", pf + "_results/" + pf + "_aimec/" + pf + "_aimec.txt"])
 
-                            subprocess.call("Rscript %s_results/%s_plots/r.avaflow.multval.R %s %s %s %s %s %s %s --slave --quiet" 
-                                % (pf, pf, pf, str(model), str(nruns), str(ipar[0]), str(ipar[1]), "t", str(ictrlpoint)), shell=True)
+        graph.run()  # executing post-processing jobs
+        graph.writetimings(filepath + pf + "_timings.txt")  # table of wall time of post-processing jobs
 
     # Cleaning file system and exiting
 
@@ -2596,6 +3370,8 @@ unset GRASS_BATCH_JOB"""
     os.system("rm -rf " + temppath)  # removing temporary directory
     if eflag and basechange == 0:
         os.system("rm -rf " + ascpath + pf + "_basechange*")  # removing obsolete ascii rasters
+    if eflag and not mflag and store:
+        packresults(ascpath, pf, filepath + pf + "_store.avs", store[0], store[1], store[2] == 1)  # packing raster maps of time steps into result store
 
     grass.run_command("g.remove", flags="f", type="rast", pattern="_*", quiet=True)  # removing temporary input and result raster maps
 
@@ -2622,7 +3398,9 @@ unset GRASS_BATCH_JOB"""
 
         print()
         print("Completed in %.1f seconds (net computing time excluding visualization)." % comptime_batch)
-        print("%s out of %s simulations were successful." % (str(nsuccess), str(nruns)))
+        print("%s out of %s simulations were successful." % (str(nsuccess), str(nruns - ncancelled)))
+        if ncancelled > 0:
+            print("%s simulations were not executed as the impact indicator index converged." % str(ncancelled))
         print("Please find the collected results in the directory %s_results." % pf)
         print()
 
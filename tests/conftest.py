@@ -0,0 +1,38 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+scriptdir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "avaflow")  # directory of GRASS addon scripts
+sys.path.insert(1, os.path.join(scriptdir, "r.avaflow"))  # shared modules of the addon scripts (importable without GRASS)
+
+
+def loadscript(name, session=False):  # loading addon script as module (scripts have no importable file names)
+
+    pytest.importorskip("grass.script")
+    if session and not "GISRC" in os.environ:
+        pytest.skip("%s requires a GRASS session" % name)
+
+    modname = name.replace(".", "_")
+    if not modname in sys.modules:  # registered for pickling by worker processes
+        spec = importlib.util.spec_from_file_location(modname, os.path.join(scriptdir, name, name + ".py"))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[modname] = module
+        spec.loader.exec_module(module)
+    return sys.modules[modname]
+
+
+def writesparse(sparsename, nrows, ncols, names, cells, values, header=(0.0, 0.0, 1.0)):  # writing sparse snapshot as r.avaflow.main with flag s
+
+    import numpy
+
+    fsparse = open(sparsename, "wb")
+    fsparse.write(b"AVSP")
+    fsparse.write(numpy.array([1, nrows, ncols, len(names), len(cells)], dtype="<i4").tobytes())
+    fsparse.write(numpy.array(header, dtype="<f4").tobytes())
+    for name in names:
+        fsparse.write(name.encode().ljust(32, b"\0"))
+    fsparse.write(numpy.array(cells, dtype="<i4").tobytes())
+    fsparse.write(numpy.array(values, dtype="<f4").reshape(len(cells), len(names)).tobytes())
+    fsparse.close()
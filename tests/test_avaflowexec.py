@@ -0,0 +1,199 @@
+import json
+import os
+import signal
+import sys
+import time
+
+import pytest
+
+import avaflowexec
+
+
+def writebatch(temppath, jid, script):  # batch file of model run, as written by r.avaflow without -l
+
+    os.makedirs(temppath + "/tmp" + str(jid))
+    fbatch = open(temppath + "/tmp" + str(jid) + "/batch" + str(jid), "w")
+    fbatch.write(script)
+    fbatch.close()
+
+
+def test_exitcode():  # exit status, or negative signal number
+
+    assert avaflowexec.exitcode(0) == 0
+    assert avaflowexec.exitcode(3 << 8) == 3
+    assert avaflowexec.exitcode(signal.SIGTERM) == -signal.SIGTERM
+
+
+def test_batchscheduler(tmp_path):  # all model runs executed, exit status as reported by subprocess
+
+    temppath = str(tmp_path)
+    writebatch(temppath, 1, "sleep 0.3\n")
+    writebatch(temppath, 2, "exit 3\n")
+    writebatch(temppath, 3, "kill -TERM $$\n")
+    writebatch(temppath, 4, "exit 0\n")
+
+    launched = []
+    completed = {}
+    scheduler = avaflowexec.BatchScheduler(temppath, 2, lambda jid, status: completed.update({jid: status}), None, launched.append)
+    for jid in [1, 2, 3, 4]:
+        scheduler.submit(jid)
+    status = scheduler.run()
+
+    assert launched == [1, 2, 3, 4]
+    assert status == completed == {1: 0, 2: 3, 3: -signal.SIGTERM, 4: 0}
+    assert sorted(scheduler.usage) == [1, 2, 3, 4]
+    assert scheduler.runtime[1] >= 0.3
+    assert os.path.exists(temppath + "/out1")
+
+
+def test_batchscheduler_cancel(tmp_path):  # queued model runs removed before execution
+
+    writebatch(str(tmp_path), 1, "exit 0\n")
+    scheduler = avaflowexec.BatchScheduler(str(tmp_path), 1)
+    scheduler.submit(1)
+    scheduler.submit(2)
+    assert scheduler.cancel() == [1, 2]
+    assert scheduler.run() == {}
+
+
+def test_progress(tmp_path):  # slow only if neither simulated time nor number of time steps progress, in consecutive checks
+
+    outname = tmp_path / "out1"
+    progress = avaflowexec.Progress(str(outname), [0, 1.0, 1.0, 2], 300.0)
+    assert progress.check() is None  # no output yet
+
+    for line, reason in [["   1\t10\t0.500\t1.0  \t1.0\t...\r", None], ["   1\t20\t0.500\t0.1  \t1.1\t...\r", None], ["", None], ["", "simulation rate"]]:
+        with open(str(outname), "a") as fout:
+            fout.write(line)
+        assert progress.check() == reason
+
+    progress = avaflowexec.Progress(str(outname), [0.01, 1.0, 1.0, 1], 300.0)
+    time.sleep(0.02)
+    assert progress.check() == "wall time"
+
+
+def test_progress_finished(tmp_path):  # no rate check after stop time or completion line, model run writing results
+
+    outname = tmp_path / "out1"
+    outname.write_text("   5\t900\t0.500\t1.0  \t300.0\t...\r")
+    progress = avaflowexec.Progress(str(outname), [0, 1.0, 1.0, 1], 300.0)
+    assert [progress.check(), progress.check()] == [None, None]
+
+    outname.write_text("   5\t900\t0.500\t1.0  \t120.0\t...\rModel execution completed in 12.00 seconds.\n")
+    progress = avaflowexec.Progress(str(outname), [0, 1.0, 1.0, 1], None)
+    assert [progress.check(), progress.check()] == [None, None]
+
+
+def test_batchscheduler_watchdog(tmp_path):  # stalled model run terminated, model run writing results after stop time kept
+
+    temppath = str(tmp_path)
+    writebatch(temppath, 1, "printf '   1\\t10\\t0.500\\t1.0  \\t1.0\\t...\\r'\nsleep 5\n")
+    writebatch(temppath, 2, "printf '   3\\t30\\t0.500\\t1.0  \\t60.0\\t...\\r'\nsleep 1.5\n")
+    scheduler = avaflowexec.BatchScheduler(temppath, 2, watchdog=[0, 1.0, 0.2, 2], tstop=60.0)
+    scheduler.submit(1)
+    scheduler.submit(2)
+    status = scheduler.run()
+
+    assert status == {1: -signal.SIGTERM, 2: 0}
+    assert scheduler.killed == {1: "simulation rate"}
+    assert scheduler.runtime[1] < 5.0
+
+
+def test_taskgraph(tmp_path):  # jobs ordered through their input and output files, functions executed in child processes
+
+    order = str(tmp_path / "order")
+    graph = avaflowexec.TaskGraph(4)
+    graph.add("map", "sleep 0.2; echo map >> %s" % order, outputs=["map.png"])
+    graph.add("gif", "echo gif >> %s" % order, inputs=["map.png"], outputs=["map.gif"])
+    graph.add("fail", lambda: 1 / 0)
+    graph.add("signal", "kill -TERM $$")
+    status = graph.run()
+
+    assert (tmp_path / "order").read_text() == "map\ngif\n"
+    assert status == {0: 0, 1: 0, 2: 1, 3: -signal.SIGTERM}
+    assert graph.tasks[1][5] == [0]
+
+    graph.writetimings(str(tmp_path / "timings.txt"))
+    ftimings = (tmp_path / "timings.txt").read_text().split("\n")
+    assert ftimings[0] == "job\tstatus\ttime"
+    assert ftimings[4].startswith("signal\t-15\t")
+
+
+def writequeuestubs(tmp_path, monkeypatch):  # local worker and solver found in PATH, files of r.avaflow in temporary directory
+
+    bindir = tmp_path / "bin"
+    bindir.mkdir()
+    (bindir / "r.avaflow.worker").write_text("#!%s\nimport os\nimport sys\nsys.path.insert(1, %r)\nimport avaflowexec\n"
+        "queuepath = sys.argv[1].split('=', 1)[1]\navaflowexec.work(queuepath, 'local:' + str(os.getpid()), avaflowexec.readtimeout(queuepath) / 12)\n"
+        % (sys.executable, os.path.dirname(avaflowexec.__file__)))
+    (bindir / "r.avaflow.main").write_text("#!/bin/bash\n"
+        "if [ \"$XINT\" = \"2\" ] && mkdir frozen 2>/dev/null; then  # first attempt: worker stops signalling beyond the heartbeat timeout\n"
+        "    kill -STOP $PPID; sleep 3.5; kill -CONT $PPID; sleep 1\n    echo stale > result$XINT; exit 0\nfi\necho $XINT > result$XINT\n")
+    for stub in ["r.avaflow.worker", "r.avaflow.main"]:
+        os.chmod(str(bindir / stub), 0o755)
+    monkeypatch.setenv("PATH", str(bindir) + os.pathsep + os.environ["PATH"])
+
+    (tmp_path / "temp").mkdir()
+    for fname in ["param0.txt", "paramtab.bin", "inputs.bin"]:
+        (tmp_path / "temp" / fname).write_text("")
+    (tmp_path / "work").mkdir()
+    monkeypatch.chdir(tmp_path / "work")
+
+
+def test_queuescheduler(tmp_path, monkeypatch, capsys):  # two local workers, model run reassigned while its worker does not signal activity
+
+    writequeuestubs(tmp_path, monkeypatch)
+    launched = []
+    completed = {}
+    scheduler = avaflowexec.QueueScheduler(str(tmp_path / "temp"), str(tmp_path / "queue"), 2, lambda jid, status: completed.update({jid: status}), 
+        "rows=1", launched.append, 2.0)
+    for jid in [1, 2, 3]:
+        scheduler.submit(jid)
+    status = scheduler.run()
+
+    assert status == completed == {1: 0, 2: 0, 3: 0}
+    assert sorted(set(launched)) == [1, 2, 3]
+    assert "Model run 2 reassigned" in capsys.readouterr().out
+    assert (tmp_path / "work" / "frozen").exists()
+    assert (tmp_path / "work" / "result2").read_text() == "2\n"  # abandoned attempt terminated before writing its result
+    assert sorted(scheduler.usage) == [1, 2, 3]
+    assert os.listdir(str(tmp_path / "queue" / "claimed")) == []
+
+
+def test_queuescheduler_without_worker(tmp_path, monkeypatch):  # no local worker and no heartbeat within timeout
+
+    writequeuestubs(tmp_path, monkeypatch)
+    scheduler = avaflowexec.QueueScheduler(str(tmp_path / "temp"), str(tmp_path / "queue"), 0, None, "rows=1", None, 0.5)
+    scheduler.submit(1)
+    with pytest.raises(RuntimeError, match="model runs 1 not completed"):
+        scheduler.run()
+    assert os.path.exists(str(tmp_path / "queue" / "stop"))
+
+
+def test_work_without_shared_files(tmp_path):  # model run returned to pending if files of r.avaflow are not accessible
+
+    for qdir in ["pending", "claimed", "done"]:
+        (tmp_path / qdir).mkdir()
+    (tmp_path / "pending" / "000001.1.json").write_text(json.dumps({"jid": 1, "args": ["r.avaflow.main"], "env": {}, "cwd": str(tmp_path), 
+        "out": str(tmp_path / "out1"), "files": [str(tmp_path / "missing" / "param0.txt")]}))
+
+    with pytest.raises(RuntimeError, match="missing"):
+        avaflowexec.work(str(tmp_path), "local", 1.0)
+    assert os.listdir(str(tmp_path / "pending")) == ["000001.1.json"]
+
+
+def test_work_watchdog(tmp_path):  # watchdog applied by worker, reason of termination reported
+
+    for qdir in ["pending", "claimed", "done"]:
+        (tmp_path / qdir).mkdir()
+    (tmp_path / "stop").write_text("")  # no further model runs
+    (tmp_path / "pending" / "000001.1.json").write_text(json.dumps({"jid": 1, "args": ["bash", "-c", "printf '   1\\t10\\t0.5\\t1.0\\t1.0\\t...\\r'; sleep 5"], 
+        "env": {}, "cwd": str(tmp_path), "out": str(tmp_path / "out1"), "files": [], "watchdog": [0, 1.0, 0.2, 2], "tstop": 60.0}))
+
+    avaflowexec.work(str(tmp_path), "local", 1.0)
+
+    done = json.loads((tmp_path / "done" / "000001.1.json").read_text())
+    assert done["status"] == -signal.SIGTERM
+    assert done["killed"] == "simulation rate"
+    assert done["runtime"] < 5.0
+
@@ -0,0 +1,144 @@
+import numpy
+import pytest
+
+import avaflowio
+from conftest import writesparse
+
+
+HEADER = [["ncols", "3"], ["nrows", "2"], ["xllcenter", "10.00"], ["yllcenter", "20.00"], ["cellsize", "5.00"], ["NODATA_value", "-9999"]]
+
+
+def test_ascii_roundtrip(tmp_path):  # no data written as -9999 and read as NaN
+
+    data = numpy.array([[0.0, 1.5, numpy.nan], [2.25, 0.0, 3.0]], dtype=numpy.float32)
+    avaflowio.writeasc(str(tmp_path / "pf_hflow0001"), HEADER, data)
+
+    assert avaflowio.rastfile(str(tmp_path / "pf_hflow0001")) == str(tmp_path / "pf_hflow0001.asc")
+    header, rdata = avaflowio.readraster(str(tmp_path / "pf_hflow0001"))
+    assert header == HEADER
+    numpy.testing.assert_allclose(rdata, data)
+
+
+def test_binary_roundtrip(tmp_path):  # binary raster preferred over ascii raster, header as in ascii raster
+
+    data = numpy.array([[0.0, 1.5, numpy.nan], [2.25, 0.0, 3.0]], dtype=numpy.float32)
+    avaflowio.writeasc(str(tmp_path / "pf_hflow0001"), HEADER, numpy.zeros((2, 3)))
+    avaflowio.writebin(str(tmp_path / "pf_hflow0001"), HEADER, data)
+
+    assert avaflowio.rastfile(str(tmp_path / "pf_hflow0001")) == str(tmp_path / "pf_hflow0001.bin")
+    header, rdata = avaflowio.readbin(str(tmp_path / "pf_hflow0001.bin"))
+    assert [float(value) for key, value in header] == pytest.approx([3, 2, 10.0, 20.0, 5.0, -9999.0])
+    assert rdata[0, 2] == -9999.0
+
+    header, rdata = avaflowio.readraster(str(tmp_path / "pf_hflow0001"))
+    numpy.testing.assert_array_equal(rdata, data)
+
+
+def test_densify(tmp_path):  # cells with flow from snapshot, other cells of the domain 0, outside the domain no data
+
+    writesparse(str(tmp_path / "pf_domain.spr"), 2, 3, [], [0, 1, 2, 4, 5], [], (10.0, 20.0, 5.0))
+    writesparse(str(tmp_path / "pf_snapshot0003.spr"), 2, 3, ["hflow", "tflow"], [1, 5], [[2.0, 20.0], [3.0, 30.0]], (10.0, 20.0, 5.0))
+
+    header, names, cells, values = avaflowio.readsparse(str(tmp_path / "pf_snapshot0003.spr"))
+    assert names == ["hflow", "tflow"]
+    assert header[0:5] == [["ncols", "3"], ["nrows", "2"], ["xllcenter", "10.00"], ["yllcenter", "20.00"], ["cellsize", "5.00"]]
+
+    header, data = avaflowio.densify(str(tmp_path / "pf_snapshot0003.spr"), str(tmp_path / "pf_domain.spr"), "tflow")
+    numpy.testing.assert_array_equal(data, numpy.array([[0.0, 20.0, 0.0], [numpy.nan, 0.0, 30.0]], dtype=numpy.float32))
+
+
+def test_densifysnapshots(tmp_path, monkeypatch):  # raster maps named as without sparse output
+
+    monkeypatch.delenv("XFORMAT", raising=False)
+    writesparse(str(tmp_path / "pf_domain.spr"), 1, 2, [], [0, 1], [])
+    writesparse(str(tmp_path / "pf_snapshot0000.spr"), 1, 2, ["hflow"], [1], [[1.5]])
+
+    avaflowio.densifysnapshots(str(tmp_path) + "/", "pf")
+
+    header, data = avaflowio.readraster(str(tmp_path / "pf_hflow0000"))
+    numpy.testing.assert_array_equal(data, numpy.array([[0.0, 1.5]], dtype=numpy.float32))
+
+
+@pytest.mark.parametrize("compression", ["zlib", "lzma"])
+def test_resultstore_roundtrip(tmp_path, compression):  # chunks not aligned with raster size, no data preserved
+
+    header = [["ncols", "7"], ["nrows", "10"], ["xllcenter", "100.00"], ["yllcenter", "200.00"], ["cellsize", "10.00"], ["NODATA_value", "-9999"]]
+    rng = numpy.random.default_rng(1)
+    steps = {step: rng.random((10, 7)).astype(numpy.float32) for step in [0, 1, 2]}
+    steps[1][3, 4] = numpy.nan
+
+    rstore = avaflowio.ResultStore(str(tmp_path / "pf_store.avs"), "w", compression, 4)
+    for step, data in steps.items():
+        rstore.add("hflow", step, header, data)
+    rstore.close()
+
+    rstore = avaflowio.ResultStore(str(tmp_path / "pf_store.avs"))
+    assert rstore.variables() == ["hflow"]
+    assert rstore.steps("hflow") == [0, 1, 2]
+    rsteps, data = rstore.read("hflow")
+    assert rsteps == [0, 1, 2]
+    numpy.testing.assert_array_equal(data, numpy.array([steps[0], steps[1], steps[2]]))
+
+    rsteps, data = rstore.read("hflow", 1, 2, [260.0, 230.0, 120.0, 150.0])  # rows 3 to 6, columns 2 to 5
+    rstore.close()
+    assert rsteps == [1, 2]
+    numpy.testing.assert_array_equal(data, numpy.array([steps[1][3:7, 2:6], steps[2][3:7, 2:6]]))
+
+
+def test_resultstore_rejects_other_files(tmp_path):
+
+    (tmp_path / "pf_store.avs").write_bytes(b"NONE" + bytes(16))
+    with pytest.raises(ValueError):
+        avaflowio.ResultStore(str(tmp_path / "pf_store.avs"))
+
+
+def test_packresults(tmp_path):  # raster maps of time steps packed and removed, maximum values kept as raster maps
+
+    header = [["ncols", "3"], ["nrows", "2"], ["xllcenter", "0.00"], ["yllcenter", "0.00"], ["cellsize", "1.00"], ["NODATA_value", "-9999"]]
+    ascpath = str(tmp_path) + "/"
+    for step in [0, 1]:
+        avaflowio.writeasc(ascpath + "pf_hflow" + str(step).zfill(4), header, numpy.full((2, 3), step + 0.5))
+    avaflowio.writeasc(ascpath + "pf_hflow_max", header, numpy.ones((2, 3)))
+
+    avaflowio.packresults(ascpath, "pf", ascpath + "pf_store.avs", "zlib", 2, True)
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["pf_hflow_max.asc", "pf_store.avs"]
+    rstore = avaflowio.ResultStore(ascpath + "pf_store.avs")
+    rsteps, data = rstore.read("hflow")
+    rstore.close()
+    assert rsteps == [0, 1]
+    numpy.testing.assert_array_equal(data, numpy.array([numpy.full((2, 3), 0.5), numpy.full((2, 3), 1.5)], dtype=numpy.float32))
+
+
+def test_paramtab(tmp_path):  # only varying parameters stored, one row per model run, read as by r.avaflow.main (fitab)
+
+    plines = {"vhrelease": 12, "flowparam": 40}
+    members = [{"vhrelease": 1.0, "flowparam": [35.0, 20.0, 0.1]}, {"vhrelease": 1.0, "flowparam": [30.0, 20.0, 0.2]}, 
+        {"vhrelease": 1.0, "flowparam": [25.0, 20.0, 0.3]}]
+    avaflowio.writeparamtab(str(tmp_path / "paramtab.bin"), plines, members, 3)
+
+    ftab = open(str(tmp_path / "paramtab.bin"), "rb")
+    assert ftab.read(4) == b"AVPT"
+    ncols, nrows = numpy.frombuffer(ftab.read(8), dtype="<i4")
+    assert (ncols, nrows) == (2, 3)
+    numpy.testing.assert_array_equal(numpy.frombuffer(ftab.read(8), dtype="<i4"), [40, 42])
+    ftab.seek(1 * ncols * 4, 1)  # row of second model run
+    numpy.testing.assert_array_equal(numpy.frombuffer(ftab.read(8), dtype="<f4"), numpy.array([30.0, 0.2], dtype=numpy.float32))
+    ftab.close()
+    assert (tmp_path / "paramtab.bin").stat().st_size == 4 + 8 + 8 + 3 * 2 * 4
+
+
+def test_inputcache(tmp_path):  # names and float32 planes of the maps in one read-only file, as mapped by r.avaflow.main (ficache)
+
+    planes = {"elev": numpy.arange(6, dtype="<f4").reshape(2, 3), "hrel": numpy.full((2, 3), -9999.0, dtype="<f4")}
+    avaflowio.writeinputcache(str(tmp_path / "inputs.bin"), ["elev", "hrel"], 2, 3, lambda mapname, binname: planes[mapname].tofile(binname))
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["inputs.bin"]
+    assert (tmp_path / "inputs.bin").stat().st_mode & 0o777 == 0o444
+    cache = (tmp_path / "inputs.bin").read_bytes()
+    assert cache[:4] == b"AVIC"
+    numpy.testing.assert_array_equal(numpy.frombuffer(cache[4:16], dtype="<i4"), [2, 2, 3])
+    assert cache[16:16 + 256].rstrip(b"\0") == b"elev" and cache[16 + 256:16 + 512].rstrip(b"\0") == b"hrel"
+    data = numpy.frombuffer(cache[16 + 512:], dtype="<f4").reshape(2, 2, 3)
+    numpy.testing.assert_array_equal(data[0], planes["elev"])
+    numpy.testing.assert_array_equal(data[1], planes["hrel"])
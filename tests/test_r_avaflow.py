@@ -0,0 +1,121 @@
+import numpy
+import pytest
+
+from conftest import loadscript
+
+
+@pytest.fixture(scope="module")
+def avaflow():
+    return loadscript("r.avaflow", session=True)
+
+
+def writeindexruns(avaflow, tmp_path):  # result rasters of two successful model runs, directories for aimec input
+
+    for aimecdir in ["depth", "pressure"]:
+        (tmp_path / "pf_results" / "pf_aimec" / aimecdir).mkdir(parents=True)
+    header = [["ncols", "3"], ["nrows", "1"], ["xllcenter", "0.00"], ["yllcenter", "0.00"], ["cellsize", "1.00"], ["NODATA_value", "-9999"]]
+    for jid, hmax in [[1, [0.0, 0.5, 2.0]], [2, [0.0, 2.0, 2.0]]]:
+        for name, data in [["_hflow_max", hmax], ["_tflow_max", [0.0, 0.0, 0.0]], ["_pflow_max", [0.0, 0.0, 0.0]], ["_hflow_fin", hmax], 
+            ["_basechange_fin", [0.0, 0.0, 0.0]]]:
+            avaflow.writeasc(str(tmp_path) + "/pf" + name + str(jid), header, numpy.array([data]))
+
+
+def test_indexaccumulator(avaflow, tmp_path, monkeypatch):  # counts of model runs exceeding thresholds, failed model runs not counted
+
+    monkeypatch.chdir(tmp_path)
+    writeindexruns(avaflow, tmp_path)
+
+    accumulator = avaflow.IndexAccumulator("pf", str(tmp_path) + "/", [1.0, 1.0, 1.0], 1, False)
+    accumulator.add(1, 1)
+    accumulator.add(3, 0)
+    accumulator.add(2, 1)
+
+    assert accumulator.nsuccess == 2
+    numpy.testing.assert_array_equal(accumulator.iii[0], [[0, 1, 2]])
+    numpy.testing.assert_array_equal(accumulator.dii, [[0, 1, 2]])
+    assert (tmp_path / "pf_results" / "pf_aimec" / "depth" / "000002.asc").exists()
+
+
+def test_indexaccumulator_change(avaflow, tmp_path, monkeypatch):  # change of impact indicator index between checks
+
+    monkeypatch.chdir(tmp_path)
+    writeindexruns(avaflow, tmp_path)
+
+    accumulator = avaflow.IndexAccumulator("pf", str(tmp_path) + "/", [1.0, 1.0, 1.0], 1, False)
+    assert accumulator.change() is None
+    accumulator.add(1, 1)
+    assert accumulator.change() is None
+    accumulator.add(2, 1)
+    assert accumulator.change() == pytest.approx(0.5)
+
+
+@pytest.mark.parametrize("design", ["random", "lhs", "halton"])
+def test_sampledesign_reproducible(avaflow, design):
+
+    dmatrix = avaflow.sampledesign(design, 20, 3, 42)
+    assert dmatrix.shape == (20, 3)
+    assert numpy.all((dmatrix >= 0) & (dmatrix < 1))
+    numpy.testing.assert_array_equal(dmatrix, avaflow.sampledesign(design, 20, 3, 42))
+
+
+def test_sampledesign_lhs_strata(avaflow):  # one sample per stratum and dimension
+
+    dmatrix = avaflow.sampledesign("lhs", 10, 4, 7)
+    for k in range(0, 4):
+        assert sorted(numpy.floor(dmatrix[:, k] * 10).astype(int)) == list(range(0, 10))
+
+
+def test_sampledesign_halton(avaflow):  # van der Corput sequences in bases 2 and 3, first point skipped
+
+    dmatrix = avaflow.sampledesign("halton", 4, 2, None)
+    numpy.testing.assert_allclose(dmatrix[:, 0], [1 / 2, 1 / 4, 3 / 4, 1 / 8])
+    numpy.testing.assert_allclose(dmatrix[:, 1], [1 / 3, 2 / 3, 1 / 9, 4 / 9])
+
+
+@pytest.mark.parametrize("links", [False, True])
+def test_resultcache_roundtrip(avaflow, tmp_path, links):  # fetched results are writable copies, or read-only hard links if requested
+
+    (tmp_path / "pf_results" / "pf_ascii").mkdir(parents=True)
+    (tmp_path / "pf_results" / "pf_ascii" / "pf_hflow_max.asc").write_text("1")
+    cache = avaflow.ResultCache(str(tmp_path / "cache"), 1000, links)
+    assert not cache.fetch("abc", str(tmp_path / "fetched"))
+
+    cache.store("abc", str(tmp_path / "pf_results"))
+    assert cache.fetch("abc", str(tmp_path / "fetched"))
+
+    fetched = tmp_path / "fetched" / "pf_ascii" / "pf_hflow_max.asc"
+    assert fetched.read_text() == "1"
+    assert (fetched.stat().st_nlink == 2) == links
+    if not links:
+        fetched.write_text("2")
+        assert (tmp_path / "cache" / "abc" / "results" / "pf_ascii" / "pf_hflow_max.asc").read_text() == "1"
+
+
+def test_roccurve_auroc(avaflow):  # 8 of 9 pairs of observed and not observed cells ranked correctly
+
+    index = numpy.array([[0.9, 0.8, 0.7], [0.6, 0.5, 0.4]])
+    observed = numpy.array([[1.0, 1.0, 0.0], [1.0, 0.0, 0.0]])
+    thresholds, fpr, tpr, auc, averages = avaflow.roccurve(index, observed, 1)
+
+    assert auc == pytest.approx(8.0 / 9.0)
+    assert list(fpr) == pytest.approx([0.0, 0.0, 0.0, 1.0 / 3.0, 1.0 / 3.0, 2.0 / 3.0, 1.0])
+    assert list(tpr) == pytest.approx([0.0, 1.0 / 3.0, 2.0 / 3.0, 2.0 / 3.0, 1.0, 1.0, 1.0])
+    assert averages is None
+
+
+def test_roccurve_ties_and_no_data(avaflow):  # tied indices form one threshold, no data cells are ignored
+
+    index = numpy.array([1.0, 1.0, 0.0, 0.0, -9999.0, 0.5])
+    observed = numpy.array([1.0, 0.0, 1.0, 0.0, 1.0, -9999.0])
+    thresholds, fpr, tpr, auc, averages = avaflow.roccurve(index, observed, 1)
+
+    assert auc == pytest.approx(0.5)
+    assert len(thresholds) == 3
+
+
+def test_roccurve_normalized_without_valid_cells(avaflow):  # neither observed nor simulated anywhere: no curve and no averages
+
+    index = numpy.zeros((3, 3))
+    observed = numpy.zeros((3, 3))
+
+    assert avaflow.roccurve(index, observed, 2) == (None, None, None, None, None)
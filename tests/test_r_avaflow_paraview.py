@@ -0,0 +1,110 @@
+import numpy
+import pytest
+
+import avaflowio
+from conftest import loadscript, writesparse
+
+
+@pytest.fixture(scope="module")
+def paraview():
+    return loadscript("r.avaflow.paraview")
+
+
+def test_datakey(paraview, tmp_path):  # key changes with content of input files and with parameters
+
+    fname = tmp_path / "pf_hflow0001.asc"
+    fname.write_text("1")
+    key = paraview.datakey([str(fname), str(tmp_path / "missing.asc")], {"hmin": 0.1})
+
+    assert key == paraview.datakey([str(fname), str(tmp_path / "missing.asc")], {"hmin": 0.1})
+    assert not key == paraview.datakey([str(fname), str(tmp_path / "missing.asc")], {"hmin": 0.2})
+    fname.write_text("12")
+    assert not key == paraview.datakey([str(fname), str(tmp_path / "missing.asc")], {"hmin": 0.1})
+
+
+def test_cachedlayer(paraview, tmp_path):  # layer computed once per key and stored as float32, outdated versions removed
+
+    calls = []
+    def compute():
+        calls.append(1)
+        return numpy.arange(6.0).reshape(2, 3) / 3
+
+    cachename = str(tmp_path / "shade")
+    layer = paraview.cachedlayer(cachename, "a", compute)
+    assert layer.dtype == numpy.float32
+    numpy.testing.assert_array_equal(paraview.cachedlayer(cachename, "a", compute), layer)
+    assert len(calls) == 1
+
+    paraview.cachedlayer(cachename, "b", compute)
+    assert len(calls) == 2
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["shade_b.npy"]
+
+
+def test_cachedlayer_uint8(paraview, tmp_path):  # alpha stored as 8 bit, same values computed and loaded
+
+    alpha = paraview.cachedlayer(str(tmp_path / "pv0001_alpha"), "a", lambda: numpy.round(255 * numpy.array([0.0, 0.35, 1.0])), numpy.uint8)
+    assert alpha.dtype == numpy.uint8
+    numpy.testing.assert_array_equal(paraview.cachedlayer(str(tmp_path / "pv0001_alpha"), "a", None), alpha)
+    assert list(alpha) == [0, 89, 255]
+
+
+@pytest.mark.parametrize("basechange", [False, True])
+def test_removestale(paraview, tmp_path, basechange):  # time steps and cached layers out of range or in other format removed
+
+    outpathf, cachepath = str(tmp_path / "data") + "/", str(tmp_path / "cache") + "/"
+    (tmp_path / "data").mkdir()
+    (tmp_path / "cache").mkdir()
+    for fname in ["data/pv0001.csv", "data/pv0002.vti", "data/pv0009.csv", "cache/pv0001_alpha_a.npy", "cache/pv0001_shade_a.npy", 
+        "cache/pv0009_alpha_a.npy", "cache/shade_a.npy", "cache/ortho_a.npy"]:
+        (tmp_path / fname).write_text("")
+
+    paraview.removestale(outpathf, cachepath, {"0001": {}, "0002": {}}, "csv", basechange)
+
+    assert sorted(path.name for path in (tmp_path / "data").iterdir()) == ["pv0001.csv"]
+    assert sorted(path.name for path in (tmp_path / "cache").iterdir()) == ["ortho_a.npy", "pv0001_alpha_a.npy"] + ["pv0001_shade_a.npy"] * basechange + ["shade_a.npy"]
+
+
+def test_readstep_sparse_as_raster(paraview, tmp_path):  # sparse snapshot read as the raster map of the time step
+
+    ascpath = str(tmp_path / "pf")
+    header = "ncols 3\nnrows 2\nxllcenter 10.00\nyllcenter 20.00\ncellsize 5.00\nNODATA_value -9999\n"
+    (tmp_path / "pf_hflow0001.asc").write_text(header + "0 2 0\n-9999 0 3\n")
+    writesparse(str(tmp_path / "pf_domain.spr"), 2, 3, [], [0, 1, 2, 4, 5], [], (10.0, 20.0, 5.0))
+    writesparse(str(tmp_path / "pf_snapshot0002.spr"), 2, 3, ["hflow"], [1, 5], [[2.0], [3.0]], (10.0, 20.0, 5.0))
+
+    assert paraview.stepfile(ascpath, "hflow", "0001") == ascpath + "_hflow0001.asc"
+    assert paraview.stepfile(ascpath, "hflow", "0002") == ascpath + "_snapshot0002.spr"
+
+    rheader, rdata = paraview.readstep(ascpath, "hflow", "0001", -1.0)
+    sheader, sdata = paraview.readstep(ascpath, "hflow", "0002", -1.0)
+    assert sheader == rheader == [10.0, 20.0, 5.0]
+    numpy.testing.assert_array_equal(sdata, rdata)
+    numpy.testing.assert_array_equal(sdata, numpy.array([[0.0, 2.0, 0.0], [-1.0, 0.0, 3.0]]))
+
+
+def test_readstep_result_store(paraview, tmp_path):  # time steps read from result store after removal of the raster maps
+
+    (tmp_path / "pf_results" / "pf_ascii").mkdir(parents=True)
+    (tmp_path / "pf_results" / "pf_files").mkdir()
+    ascpath = str(tmp_path / "pf_results" / "pf_ascii" / "pf")
+    header = [["ncols", "3"], ["nrows", "1"], ["xllcenter", "10.00"], ["yllcenter", "20.00"], ["cellsize", "5.00"], ["NODATA_value", "-9999"]]
+    avaflowio.writeasc(ascpath + "_hflow0001", header, numpy.array([[0.0, 2.0, numpy.nan]]))
+    avaflowio.packresults(str(tmp_path / "pf_results" / "pf_ascii") + "/", "pf", str(tmp_path / "pf_results" / "pf_files" / "pf_store.avs"), "zlib", 2, True)
+
+    assert paraview.stepfile(ascpath, "hflow", "0001") == str(tmp_path / "pf_results" / "pf_files" / "pf_store.avs")
+    sheader, sdata = paraview.readstep(ascpath, "hflow", "0001", -1.0)
+    assert sheader == [10.0, 20.0, 5.0]
+    numpy.testing.assert_array_equal(sdata, numpy.array([[0.0, 2.0, -1.0]]))
+    with pytest.raises(KeyError):
+        paraview.readstep(ascpath, "hflow", "0002")
+
+
+def test_writepvd(paraview, tmp_path):  # time of time steps in s, from output interval of simulation
+
+    (tmp_path / "pf_paramcomm.txt").write_text("Model\t7\nTime interval for writing output (s)\t2.50\n")
+    paraview.writepvd(str(tmp_path / "pv.pvd"), range(1, 3), paraview.readtout(str(tmp_path / "pf_paramcomm.txt")))
+
+    fpvd = (tmp_path / "pv.pvd").read_text()
+    assert '<DataSet timestep="2.50" file="pv0001.vti"/>' in fpvd
+    assert '<DataSet timestep="5.00" file="pv0002.vti"/>' in fpvd
+    assert paraview.readtout(str(tmp_path / "missing.txt")) == 1.0